@@ -0,0 +1,85 @@
+import time
+import tkinter as tk
+from typing import Optional, Callable
+
+from config import ANIMATION_FPS, ANIMATION_DURATION_MS
+
+# Кадр получает долю пройденного пути от 0 до 1
+FrameCallback = Callable[[float], None]
+DoneCallback = Callable[[], None]
+
+
+class AnimationScheduler:
+    # Анимация по прошедшему времени, а не по числу шагов: длительность одна и та же при любой скорости цикла Tk,
+    # пропущенные кадры не догоняются. Новое действие пользователя доигрывает текущую анимацию мгновенно
+    def __init__(self, root: tk.Misc, fps: int = ANIMATION_FPS, duration_ms: int = ANIMATION_DURATION_MS) -> None:
+        self.root = root
+        self.frame_s = 1.0 / max(1, fps)
+        self.duration_ms = max(1, duration_ms)
+        self._after_id: Optional[str] = None
+        self._on_frame: Optional[FrameCallback] = None
+        self._on_done: Optional[DoneCallback] = None
+        self._started = 0.0
+        self._next_frame = 0.0
+        self._last_input: Optional[float] = None
+        # Ходы идут чаще, чем длится анимация (зажатая стрелка) — анимация пропускается
+        self.rapid = False
+
+    @property
+    def active(self) -> bool:
+        return self._on_done is not None
+
+    def note_input(self) -> bool:
+        # Вызывается на каждый ход; True — ход можно анимировать
+        now = time.perf_counter()
+        self.rapid = self._last_input is not None and (now - self._last_input) * 1000.0 < self.duration_ms
+        self._last_input = now
+        return not self.rapid
+
+    def start(self, on_frame: FrameCallback, on_done: DoneCallback) -> None:
+        self.finish()
+        self._on_frame, self._on_done = on_frame, on_done
+        self._started = self._next_frame = time.perf_counter()
+        self._tick()
+
+    def _tick(self) -> None:
+        self._after_id = None
+        if self._on_frame is None:
+            return
+        now = time.perf_counter()
+        t = min(1.0, (now - self._started) * 1000.0 / self.duration_ms)
+        self._on_frame(t)
+        if t >= 1.0:
+            self._complete()
+            return
+        self._next_frame += self.frame_s
+        if self._next_frame < now:
+            # Цикл не успевает — следующий кадр через интервал от текущего момента, без серии догоняющих
+            self._next_frame = now + self.frame_s
+        end = self._started + self.duration_ms / 1000.0
+        delay_ms = int((min(self._next_frame, end) - now) * 1000.0)
+        self._after_id = self.root.after(max(1, delay_ms), self._tick)
+
+    def _complete(self) -> None:
+        on_done = self._on_done
+        self._on_frame = self._on_done = None
+        if on_done is not None:
+            on_done()
+
+    def finish(self) -> None:
+        # Перемотать текущую анимацию в конец: последний кадр и завершение сразу
+        if not self.active:
+            return
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        if self._on_frame is not None:
+            self._on_frame(1.0)
+        self._complete()
+
+    def cancel(self) -> None:
+        # Остановить без завершения (закрытие окна)
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        self._on_frame = self._on_done = None
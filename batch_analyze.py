@@ -0,0 +1,256 @@
+import argparse
+import hashlib
+import concurrent.futures
+import io
+import json
+import multiprocessing.util
+import os
+import sys
+import time
+from typing import Optional, List, Dict, Any, Iterator, Tuple
+
+import chess
+import chess.pgn
+
+from config import (
+    DEFAULT_ENGINE_MOVETIME_MS,
+    DEFAULT_ENGINE_DEPTH,
+    STABLE_STOP_DEPTHS,
+    SYZYGY_PATH,
+    BOOK_PATHS,
+    EVAL_CACHE_PATH,
+)
+from engine_handler import SearchLimits
+from engine_profiles import build_profiles
+from eval_cache import EvalCache
+from engine_pool import EnginePool
+from engine_scheduler import EngineScheduler
+from game_analysis import analyse_mainline, apply_analysis
+from tablebase import Tablebase
+from opening_book import OpeningBook
+
+
+def log_error(msg: str) -> None:
+    print(f"[BatchAnalyze ERROR] {msg}", file=sys.stderr)
+
+
+# ------------------ Рабочий процесс ------------------
+# В каждом процессе — свой движок, свои базы и свой планировщик; живут до конца пакета
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(engine_path: Optional[str], workers: int, limits: SearchLimits,
+                 syzygy_path: Optional[str], book_paths: Optional[str], cache_path: Optional[str]) -> None:
+    cache = EvalCache(cache_path) if cache_path else None
+    pool = EnginePool(size=1, engine_path=engine_path, cache=cache, profiles=build_profiles(workers))
+    _worker.update(
+        cache=cache,
+        pool=pool,
+        scheduler=EngineScheduler(pool),
+        limits=limits,
+        tablebase=Tablebase(syzygy_path),
+        book=OpeningBook(book_paths),
+    )
+    # Движок и кэш закрываются при штатном завершении процесса пулом
+    multiprocessing.util.Finalize(None, _shutdown_worker, exitpriority=10)
+
+
+def _shutdown_worker() -> None:
+    _worker['scheduler'].shutdown()
+    _worker['pool'].shutdown()
+    if _worker['cache'] is not None:
+        _worker['cache'].close()
+
+
+def _analyse_game(source: str, index: int, pgn_text: str) -> Dict[str, Any]:
+    start = time.time()
+    game = chess.pgn.read_game(io.StringIO(pgn_text))
+    result: Dict[str, Any] = {'source': source, 'index': index, 'pgn': pgn_text, 'plies': [], 'positions': 0}
+    if game is None or not _worker['pool'].available:
+        result['error'] = "движок недоступен" if game is not None else "не удалось разобрать партию"
+        return result
+
+    stats: Dict[str, int] = {}
+    results = analyse_mainline(_worker['scheduler'], game, _worker['limits'],
+                               tablebase=_worker['tablebase'], book=_worker['book'], stats=stats)
+    apply_analysis(game, results)
+
+    board = game.board()
+    for ply, (node, res) in enumerate(zip(game.mainline(), results), start=1):
+        result['plies'].append({
+            'ply': ply,
+            'move': board.san(node.move),
+            'uci': node.move.uci(),
+            'eval_cp': res['eval'],
+            'best_move': res['best_move'],
+            'eval_loss': res['eval_loss'],
+            'book': res['book'],
+            'comment': res['comment'],
+        })
+        board.push(node.move)
+
+    result['headers'] = dict(game.headers)
+    result['pgn'] = str(game)
+    # Для позиций/с — только позиции, которые действительно искал движок
+    result['positions'] = stats.get('searched', 0)
+    result['seconds'] = time.time() - start
+    return result
+
+
+# ------------------ Входные файлы ------------------
+def pgn_files(paths: List[str]) -> List[str]:
+    # Файл, указанный несколько раз (сам и через свой каталог), анализируется один раз — по первому упоминанию
+    files: List[str] = []
+    seen = set()
+
+    def add(path: str) -> None:
+        real = os.path.realpath(path)
+        if real not in seen:
+            seen.add(real)
+            files.append(path)
+
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                for name in sorted(names):
+                    if name.lower().endswith(".pgn"):
+                        add(os.path.join(root, name))
+        elif os.path.isfile(path):
+            add(path)
+        else:
+            log_error(f"Нет такого файла или каталога: {path}")
+    return files
+
+
+def output_names(paths: List[str], files: List[str]) -> Dict[str, str]:
+    # Имя вывода — путь относительно каталога-аргумента (с самим каталогом), чтобы a/games.pgn и b/games.pgn
+    # не перезаписывали друг друга. Оставшиеся совпадения различаются коротким хэшем полного пути
+    roots = [os.path.abspath(p) for p in paths if os.path.isdir(p)]
+    names: Dict[str, str] = {}
+    used = set()
+    for path in files:
+        full = os.path.abspath(path)
+        root = next((r for r in roots if full.startswith(r + os.sep)), None)
+        name = os.path.relpath(full, os.path.dirname(root)) if root else os.path.basename(full)
+        name = os.path.splitext(name)[0]
+        if name in used:
+            name += "-" + hashlib.sha1(full.encode("utf-8")).hexdigest()[:8]
+        used.add(name)
+        names[path] = name
+    return names
+
+
+def iter_games(files: List[str]) -> Iterator[Tuple[str, int, Optional[str]]]:
+    # После последней партии файла приходит (файл, число партий, None) — файл можно записывать
+    for path in files:
+        count = 0
+        with open(path, encoding="utf-8", errors="replace") as f:
+            while True:
+                game = chess.pgn.read_game(f)
+                if game is None:
+                    break
+                yield path, count, str(game)
+                count += 1
+        yield path, count, None
+
+
+# ------------------ Вывод ------------------
+def write_outputs(out_dir: str, source: str, name: str, games: List[Dict[str, Any]]) -> None:
+    base = os.path.join(out_dir, name)
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    with open(base + ".annotated.pgn", "w", encoding="utf-8") as f:
+        f.write("\n\n".join(game['pgn'] for game in games) + "\n")
+    with open(base + ".json", "w", encoding="utf-8") as f:
+        json.dump({
+            'source': source,
+            'games': [{key: game.get(key) for key in ('index', 'headers', 'positions', 'seconds', 'error', 'plies')}
+                      for game in games],
+        }, f, ensure_ascii=False, indent=1)
+
+
+def print_stats(games: int, positions: int, elapsed: float, final: bool = False) -> None:
+    elapsed = max(elapsed, 1e-6)
+    prefix = "Итого" if final else "Прогресс"
+    print(f"{prefix}: партий {games}, позиций {positions}, {elapsed:.1f} с — "
+          f"{positions / elapsed:.1f} позиций/с, {games / elapsed * 3600:.0f} партий/ч", file=sys.stderr)
+
+
+def run(args: argparse.Namespace) -> int:
+    args.workers = max(1, args.workers)
+    files = pgn_files(args.paths)
+    if not files:
+        log_error("Не найдено ни одного PGN-файла.")
+        return 1
+    os.makedirs(args.out, exist_ok=True)
+    names = output_names(args.paths, files)
+
+    limits = SearchLimits(movetime_ms=args.movetime, depth=args.depth or None, nodes=args.nodes or None,
+                          stable_depths=None if args.no_stable_stop else STABLE_STOP_DEPTHS)
+    init_args = (args.engine, args.workers, limits, args.syzygy or None, args.books or None,
+                 None if args.no_cache else args.cache)
+
+    collected: Dict[str, Dict[int, Dict[str, Any]]] = {}
+    expected: Dict[str, int] = {}
+    games_done = positions_done = 0
+    start = time.time()
+    last_report = start
+
+    def flush_finished() -> None:
+        for source in [s for s, n in expected.items() if len(collected.get(s, {})) == n]:
+            games = collected.pop(source, {})
+            write_outputs(args.out, source, names[source], [games[i] for i in sorted(games)])
+            del expected[source]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                                initargs=init_args) as executor:
+        pending = set()
+        # В работе не больше двух партий на процесс: большие базы не читаются в память целиком
+        for source, index, pgn_text in iter_games(files):
+            if pgn_text is None:
+                expected[source] = index
+                collected.setdefault(source, {})
+                continue
+            while len(pending) >= args.workers * 2:
+                finished, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for fut in finished:
+                    res = fut.result()
+                    collected.setdefault(res['source'], {})[res['index']] = res
+                    games_done += 1
+                    positions_done += res['positions']
+                flush_finished()
+                if time.time() - last_report >= 10.0:
+                    print_stats(games_done, positions_done, time.time() - start)
+                    last_report = time.time()
+            pending.add(executor.submit(_analyse_game, source, index, pgn_text))
+
+        for fut in concurrent.futures.as_completed(pending):
+            res = fut.result()
+            collected.setdefault(res['source'], {})[res['index']] = res
+            games_done += 1
+            positions_done += res['positions']
+        flush_finished()
+
+    print_stats(games_done, positions_done, time.time() - start, final=True)
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Пакетный анализ PGN без графического интерфейса.")
+    parser.add_argument("paths", nargs="+", help="PGN-файлы или каталоги с ними")
+    parser.add_argument("-o", "--out", default="analysis_out", help="каталог для результатов")
+    parser.add_argument("-j", "--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="число процессов (по движку в каждом)")
+    parser.add_argument("--engine", default=None, help="путь к UCI-движку")
+    parser.add_argument("--movetime", type=int, default=DEFAULT_ENGINE_MOVETIME_MS, help="время на позицию, мс")
+    parser.add_argument("--depth", type=int, default=DEFAULT_ENGINE_DEPTH, help="глубина (0 — только по времени)")
+    parser.add_argument("--nodes", type=int, default=0, help="предел узлов на позицию (0 — без предела)")
+    parser.add_argument("--no-stable-stop", action="store_true", help="не останавливать поиск досрочно")
+    parser.add_argument("--syzygy", default=SYZYGY_PATH, help="каталоги эндшпильных баз")
+    parser.add_argument("--books", default=BOOK_PATHS, help="дебютные книги Polyglot")
+    parser.add_argument("--cache", default=EVAL_CACHE_PATH, help="файл кэша оценок")
+    parser.add_argument("--no-cache", action="store_true", help="не использовать кэш оценок")
+    return parser
+
+
+if __name__ == "__main__":
+    sys.exit(run(build_parser().parse_args()))
@@ -0,0 +1,140 @@
+import tkinter as tk
+from typing import Optional, Callable, Dict, List, Tuple, Set
+
+import chess
+from PIL import ImageTk
+
+# (откуда, куда, цвет, толщина, пунктир)
+ArrowSpec = Tuple[int, int, str, int, Optional[tuple]]
+SquareCoords = Callable[[int], Tuple[int, int]]
+
+
+class BoardRenderer:
+    # Доска в «сохранённом» режиме: у каждой занятой клетки и у каждой стрелки свой постоянный элемент холста.
+    # Смена позиции применяется как разница — элементы двигаются и перенастраиваются, а не удаляются и создаются
+    def __init__(self, canvas: tk.Canvas, images: Dict[str, ImageTk.PhotoImage], coords: SquareCoords,
+                 square_size: int) -> None:
+        self.canvas = canvas
+        self.images = images
+        self.coords = coords
+        self.square_size = square_size
+        # Слои по порядку снизу вверх: фон, фигуры, стрелки, всё остальное (подсветки, перетаскивание, подсказки).
+        # Невидимые метки отделяют слои, чтобы новые элементы вставали на своё место
+        self._pieces_top = canvas.create_line(0, 0, 0, 0, state=tk.HIDDEN)
+        self._arrows_top = canvas.create_line(0, 0, 0, 0, state=tk.HIDDEN)
+        self._pieces: Dict[int, Tuple[int, str]] = {}
+        self._spare_pieces: List[int] = []
+        self._arrows: Dict[str, List[int]] = {}
+        self._arrow_specs: Dict[str, List[ArrowSpec]] = {}
+        self._floating: Optional[int] = None
+
+    # ------------------ Фигуры ------------------
+    def _piece_item(self, symbol: str, square: int) -> int:
+        x, y = self.coords(square)
+        image = self.images.get(symbol)
+        if self._spare_pieces:
+            item = self._spare_pieces.pop()
+            self.canvas.coords(item, x, y)
+            self.canvas.itemconfigure(item, image=image, state=tk.NORMAL)
+            return item
+        item = self.canvas.create_image(x, y, anchor=tk.NW, image=image, tags="piece")
+        self.canvas.tag_lower(item, self._pieces_top)
+        return item
+
+    def render_pieces(self, board: chess.Board, hidden: Optional[Set[int]] = None) -> None:
+        wanted = {square: piece.symbol() for square, piece in board.piece_map().items()
+                  if not hidden or square not in hidden}
+        # Ушедшие с клеток фигуры; при совпадении символа элемент просто переезжает (ход, рокировка)
+        removed: Dict[str, List[int]] = {}
+        for square, (item, symbol) in list(self._pieces.items()):
+            if wanted.get(square) != symbol:
+                removed.setdefault(symbol, []).append(item)
+                del self._pieces[square]
+
+        added: List[Tuple[int, str]] = []
+        for square, symbol in wanted.items():
+            if square in self._pieces:
+                continue
+            same = removed.get(symbol)
+            if same:
+                item = same.pop()
+                x, y = self.coords(square)
+                self.canvas.coords(item, x, y)
+                self._pieces[square] = (item, symbol)
+            else:
+                added.append((square, symbol))
+
+        # Взятые фигуры прячутся до следующего использования; их элементы получают
+        # новые фигуры (превращение, расстановка другой позиции) раньше, чем создаются новые
+        for items in removed.values():
+            for item in items:
+                self._release_piece(item)
+        for square, symbol in added:
+            self._pieces[square] = (self._piece_item(symbol, square), symbol)
+
+    def _release_piece(self, item: int) -> None:
+        self.canvas.itemconfigure(item, state=tk.HIDDEN)
+        self._spare_pieces.append(item)
+
+    def hide_square(self, square: int) -> None:
+        entry = self._pieces.pop(square, None)
+        if entry is not None:
+            self._release_piece(entry[0])
+
+    def relayout(self) -> None:
+        # Переворот доски или новый размер клетки: те же элементы, новые координаты
+        for square, (item, symbol) in self._pieces.items():
+            x, y = self.coords(square)
+            self.canvas.coords(item, x, y)
+            self.canvas.itemconfigure(item, image=self.images.get(symbol))
+        specs, self._arrow_specs = self._arrow_specs, {}
+        for layer, layer_specs in specs.items():
+            self.set_arrows(layer, layer_specs)
+
+    # ------------------ Стрелки ------------------
+    def set_arrows(self, layer: str, specs: List[ArrowSpec]) -> None:
+        if self._arrow_specs.get(layer) == specs:
+            return
+        self._arrow_specs[layer] = list(specs)
+        items = self._arrows.setdefault(layer, [])
+        half = self.square_size / 2
+        for i, (from_sq, to_sq, color, width, dash) in enumerate(specs):
+            x1, y1 = self.coords(from_sq)
+            x2, y2 = self.coords(to_sq)
+            points = (x1 + half, y1 + half, x2 + half, y2 + half)
+            if i < len(items):
+                self.canvas.coords(items[i], *points)
+                self.canvas.itemconfigure(items[i], fill=color, width=width, dash=dash or "", state=tk.NORMAL)
+            else:
+                item = self.canvas.create_line(*points, arrow=tk.LAST, fill=color, width=width, dash=dash or "",
+                                               tags=("arrow", f"{layer}_arrow"))
+                self.canvas.tag_lower(item, self._arrows_top)
+                items.append(item)
+        for item in items[len(specs):]:
+            self.canvas.itemconfigure(item, state=tk.HIDDEN)
+
+    def clear_arrows(self, *layers: str) -> None:
+        for layer in layers or list(self._arrows):
+            self.set_arrows(layer, [])
+
+    # ------------------ Перетаскивание и анимация ------------------
+    def show_floating(self, symbol: str, x: float, y: float) -> Optional[int]:
+        # Один элемент на всё: фигура под курсором или летящая в анимации
+        image = self.images.get(symbol)
+        if image is None:
+            return None
+        if self._floating is None:
+            self._floating = self.canvas.create_image(x, y, anchor=tk.NW, image=image, tags="floating")
+        else:
+            self.canvas.coords(self._floating, x, y)
+            self.canvas.itemconfigure(self._floating, image=image, state=tk.NORMAL)
+        self.canvas.tag_raise(self._floating)
+        return self._floating
+
+    def move_floating(self, x: float, y: float) -> None:
+        if self._floating is not None:
+            self.canvas.coords(self._floating, x, y)
+
+    def hide_floating(self) -> None:
+        if self._floating is not None:
+            self.canvas.itemconfigure(self._floating, state=tk.HIDDEN)
@@ -4,6 +4,12 @@ import os
 BOARD_IMG_WIDTH = 600
 BOARD_IMG_HEIGHT = 600
 SQUARE_SIZE = BOARD_IMG_WIDTH // 8
+# Доска масштабируется вместе с окном; клетка не меньше MIN_SQUARE_SIZE
+MIN_SQUARE_SIZE = 40
+# Сколько размеров спрайтов держать в памяти
+SPRITE_CACHE_SIZES = 6
+# Пауза после последнего изменения размера, после которой спрайты пересчитываются в высоком качестве
+BOARD_RESIZE_SETTLE_MS = 200
 
 # Панель информации справа
 INFO_PANEL_WIDTH = 420
@@ -19,14 +25,75 @@ PIECE_SYMBOL_TO_FILE = {
     'p': 'bp.png', 'n': 'bn.png', 'b': 'bb.png', 'r': 'br.png', 'q': 'bq.png', 'k': 'bk.png'
 }
 
-# Анимация
-ANIMATION_STEPS = 10
-ANIMATION_DELAY = 0
+# Анимация хода: длительность и частота кадров. Ходы, идущие чаще длительности, не анимируются
+ANIMATION_DURATION_MS = 150
+ANIMATION_FPS = 60
 
 # Engine defaults
 DEFAULT_ENGINE_SKILL = 20
 DEFAULT_ENGINE_MULTIPV = 3
+# Сколько линий можно выбрать в панели анализа (движок может больше — см. analyse_all_moves)
+MAX_UI_MULTIPV = 10
 DEFAULT_ENGINE_MOVETIME_MS = 2000
+# Контроль времени в игре против движка: (название, основное время, добавка за ход), мс
+TIME_CONTROLS = [
+    ("Без часов", None, 0),
+    ("1+0", 60000, 0),
+    ("3+2", 180000, 2000),
+    ("5+3", 300000, 3000),
+    ("10+5", 600000, 5000),
+    ("15+10", 900000, 10000),
+]
+DEFAULT_TIME_CONTROL = "5+3"
+# Для анализа партии можно ограничить поиск глубиной (0 — только по времени)
+DEFAULT_ENGINE_DEPTH = 0
+# Ранняя остановка: лучший ход не меняется и оценка держится в пределах STABLE_STOP_MARGIN_CP
+# STABLE_STOP_DEPTHS глубин подряд (но не раньше STABLE_STOP_MIN_DEPTH)
+STABLE_STOP_DEPTHS = 4
+STABLE_STOP_MARGIN_CP = 15
+STABLE_STOP_MIN_DEPTH = 12
+# Сколько полуходов главной линии после лучшего хода рисовать на доске
+PV_PREVIEW_PLIES = 3
+
+# Пул движков: по процессу Stockfish на пару ядер, но не больше 4
+ENGINE_POOL_SIZE = max(2, min(4, (os.cpu_count() or 2) // 2))
+# Доля оперативной памяти под хэш-таблицы всех движков пула и предел для одного движка
+ENGINE_HASH_RAM_FRACTION = 0.25
+ENGINE_MAX_HASH_MB = 4096
+
+# Кэш оценок позиций (LRU в памяти + SQLite на диске)
+EVAL_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".chessai", "eval_cache.sqlite3")
+EVAL_CACHE_SIZE = 20000
+# Позиции с повторением в истории или с таким счётчиком полуходов без взятий и ходов пешек в кэш не попадают:
+# их оценка зависит от пути, а ключ кэша — нет
+CACHE_MAX_HALFMOVE_CLOCK = 60
+
+# Индексы больших PGN-файлов (смещения и заголовки партий) — чтобы не сканировать файл при каждом открытии
+PGN_INDEX_DIR = os.path.join(os.path.expanduser("~"), ".chessai", "pgn_index")
+
+# Импорт с Lichess. Адрес можно подменить (CHESSAI_LICHESS_URL), например локальным тестовым сервером
+LICHESS_BASE_URL = os.environ.get("CHESSAI_LICHESS_URL", "https://lichess.org").rstrip("/")
+LICHESS_TOKEN = os.environ.get("CHESSAI_LICHESS_TOKEN", "")
+LICHESS_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".chessai", "lichess_cache.sqlite3")
+LICHESS_IMPORT_DIR = os.path.join(os.path.expanduser("~"), ".chessai", "lichess")
+# Таймауты (соединение, чтение) в секундах и число повторов с нарастающей паузой
+LICHESS_TIMEOUT = (5.0, 30.0)
+LICHESS_RETRIES = 4
+LICHESS_DEFAULT_MAX_GAMES = 200
+
+# Эндшпильные базы Syzygy (несколько каталогов — через os.pathsep)
+SYZYGY_PATH = os.environ.get("CHESSAI_SYZYGY", os.path.join(os.path.expanduser("~"), ".chessai", "syzygy"))
+# Сколько полуходов главной линии строить по базе
+TABLEBASE_PV_PLIES = 6
+
+# Дебютные книги Polyglot в порядке приоритета: файлы .bin или каталоги с ними, через os.pathsep
+BOOK_PATHS = os.environ.get("CHESSAI_BOOKS", os.path.join(os.path.expanduser("~"), ".chessai", "books"))
+# Сколько первых полуходов разбора партии может быть отмечено книжными без движка
+BOOK_MAX_PLIES = 20
+
+# Журнал времени запуска (одна строка на запуск) и период опроса фонового запуска движков, мс
+STARTUP_LOG_PATH = os.path.join(os.path.expanduser("~"), ".chessai", "startup.log")
+ENGINE_BOOT_POLL_MS = 100
 
 # Путь к stockfish
 STOCKFISH_PATH_WINDOWS = "./stockfish.exe"
@@ -36,6 +103,7 @@ STOCKFISH_PATH_UNIX = "./stockfish"
 BOARD_ONLY_HINTS = [
     "Подсказки:",
     "← / → : перемотка по ходам",
+    "Home / End, G : к началу, концу, к полуходу",
     "F : перевернуть доску",
     "A : проанализировать позицию",
     "T : показать угрозу",
@@ -1,10 +1,8 @@
-import subprocess
 import platform
-import threading
 import time
-from typing import Optional, List, Tuple, Dict, Any
+from typing import Optional, List, Tuple, Iterator, Callable
+import concurrent.futures
 import queue
-import re
 import os
 
 import chess
@@ -12,23 +10,142 @@ import chess
 from config import (
     STOCKFISH_PATH_WINDOWS,
     STOCKFISH_PATH_UNIX,
+    STABLE_STOP_MARGIN_CP,
+    STABLE_STOP_MIN_DEPTH,
+    CACHE_MAX_HALFMOVE_CLOCK,
 )
+from eval_cache import EvalCache
+from engine_profiles import EngineProfile, PROFILE_PLAY
+from uci_client import UCIClient, StopSignal
+from uci_info import InfoLine, MultiPVTable, parse_info_line
 
 def log_error(msg: str) -> None:
     print(f"[EngineHandler ERROR] {msg}")
 
+def _spin_option_max(option_line: Optional[str]) -> Optional[int]:
+    tokens = option_line.split() if option_line else []
+    try:
+        return int(tokens[tokens.index("max") + 1])
+    except (ValueError, IndexError):
+        return None
+
+class SearchLimits:
+    # Ограничения одного поиска; движок останавливается по первому сработавшему
+    __slots__ = ("movetime_ms", "depth", "nodes", "mate", "stable_depths", "wtime", "btime", "winc", "binc")
+
+    def __init__(self, movetime_ms: Optional[int] = None, depth: Optional[int] = None,
+                 nodes: Optional[int] = None, mate: Optional[int] = None,
+                 stable_depths: Optional[int] = None, wtime: Optional[int] = None,
+                 btime: Optional[int] = None, winc: int = 0, binc: int = 0) -> None:
+        self.movetime_ms = movetime_ms
+        self.depth = depth
+        self.nodes = nodes
+        self.mate = mate
+        self.stable_depths = stable_depths
+        self.wtime = wtime
+        self.btime = btime
+        self.winc = winc
+        self.binc = binc
+
+    @property
+    def has_clock(self) -> bool:
+        return self.wtime is not None and self.btime is not None
+
+    @property
+    def cacheable(self) -> bool:
+        # Поиск мата и игра по часам ищут не лучшую оценку позиции — кэш им не подходит
+        return not self.mate and not self.has_clock
+
+    def go_command(self, ponder: bool = False) -> str:
+        parts = ["go", "ponder"] if ponder else ["go"]
+        if self.has_clock:
+            parts.append(f"wtime {max(0, int(self.wtime))} btime {max(0, int(self.btime))} "
+                         f"winc {int(self.winc)} binc {int(self.binc)}")
+        if self.depth:
+            parts.append(f"depth {int(self.depth)}")
+        if self.nodes:
+            parts.append(f"nodes {int(self.nodes)}")
+        if self.mate:
+            parts.append(f"mate {int(self.mate)}")
+        if self.movetime_ms:
+            parts.append(f"movetime {int(self.movetime_ms)}")
+        # Без единого ограничения поиск шёл бы бесконечно — ставим время по умолчанию
+        if parts == ["go"] or parts == ["go", "ponder"]:
+            parts.append("movetime 1000")
+        return " ".join(parts)
+
+    def timeout(self) -> Optional[float]:
+        if self.movetime_ms:
+            return max(1.0, self.movetime_ms / 1000.0 + 1.0)
+        if self.has_clock:
+            # Движок сам делит своё время, но больше оставшегося на часах не потратит
+            return max(self.wtime, self.btime, 0) / 1000.0 + 2.0
+        # Поиск только по глубине или узлам может идти сколько угодно; ждём его без таймаута
+        if self.depth or self.nodes or self.mate:
+            return None
+        return 2.0
+
+    def __repr__(self) -> str:
+        return f"SearchLimits({self.go_command()}, stable_depths={self.stable_depths})"
+
+
+class StabilityStop:
+    # Следит за первой линией: лучший ход и оценка не меняются нужное число глубин — пора останавливаться
+    __slots__ = ("needed", "margin_cp", "min_depth", "depth", "move", "score", "streak")
+
+    def __init__(self, needed: int, margin_cp: int = STABLE_STOP_MARGIN_CP,
+                 min_depth: int = STABLE_STOP_MIN_DEPTH) -> None:
+        self.needed = needed
+        self.margin_cp = margin_cp
+        self.min_depth = min_depth
+        self.depth = 0
+        self.move: Optional[str] = None
+        self.score: Optional[int] = None
+        self.streak = 0
+
+    def feed(self, info: InfoLine) -> bool:
+        if info.multipv != 1 or info.bound is not None or not info.pv or not info.depth:
+            return False
+        if info.depth <= self.depth:
+            return False
+        if info.score_cp is not None:
+            score = info.score_cp
+        elif info.score_mate is not None:
+            score = 100000 - info.score_mate if info.score_mate > 0 else -100000 - info.score_mate
+        else:
+            return False
+
+        if (info.move_uci == self.move and self.score is not None
+                and abs(score - self.score) <= self.margin_cp):
+            self.streak += 1
+        else:
+            self.streak = 0
+        self.depth, self.move, self.score = info.depth, info.move_uci, score
+        return self.streak >= self.needed and self.depth >= self.min_depth
+
+
 class EngineHandler:
-    def __init__(self, engine_path: Optional[str] = None, initial_skill_level: int = 20) -> None:
+    def __init__(self, engine_path: Optional[str] = None, initial_skill_level: int = 20,
+                 cache: Optional[EvalCache] = None) -> None:
         if engine_path is None:
             self.engine_path = STOCKFISH_PATH_WINDOWS if platform.system() == "Windows" else STOCKFISH_PATH_UNIX
         else:
             self.engine_path = engine_path
 
-        self.process: Optional[subprocess.Popen] = None
-        self._reader_thread: Optional[threading.Thread] = None
-        self._out_queue: "queue.Queue[str]" = queue.Queue()
-        self._alive = threading.Event()
+        self.client: Optional[UCIClient] = None
         self.skill_level = initial_skill_level
+        self.multi_pv = 3
+        self.max_multi_pv = 5
+        self.max_threads = 1
+        self.threads = 1
+        self.hash_mb = 16
+        self.profile: Optional[EngineProfile] = None
+        self.cache = cache
+        self.current_fen: Optional[str] = None
+        # Оценка зависит от истории (повторение, правило 50 ходов) — ключ кэша без истории ей не подходит
+        self.history_sensitive = False
+        # Партия, для которой движок копит хэш; ucinewgame шлём только при её смене
+        self.game_key: Optional[object] = None
         self.is_ready = False
         self._start_engine()
 
@@ -36,218 +153,301 @@ class EngineHandler:
         if not os.path.exists(self.engine_path):
             log_error(f"Движок не найден: {self.engine_path}")
             return
-        try:
-            self.process = subprocess.Popen(
-                [self.engine_path],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
-            )
-        except Exception as e:
-            log_error(f"Ошибка запуска движка: {e}")
-            self.process = None
-            return
-
-        self._alive.set()
-        self._reader_thread = threading.Thread(target=self._reader_loop, daemon=True)
-        self._reader_thread.start()
-
-        self._send_command("uci")
-        if not self._wait_for_token("uciok", timeout=3.0):
-            log_error("Не получил uciok от движка.")
+        client = UCIClient(self.engine_path)
+        if not client.start(timeout=3.0):
+            if client.alive:
+                log_error("Не получил uciok от движка.")
+                self.client = client
             return
+        self.client = client
+        self.max_multi_pv = _spin_option_max(client.options.get("MultiPV")) or self.max_multi_pv
+        self.max_threads = _spin_option_max(client.options.get("Threads")) or self.max_threads
 
         self.set_skill_level(self.skill_level)
-        self.set_multi_pv(3)
+        self.set_multi_pv(self.multi_pv)
 
-        self._send_command("isready")
-        if not self._wait_for_token("readyok", timeout=2.0):
+        if not self.client.isready(timeout=2.0):
             log_error("Движок не ответил readyok.")
             return
 
         self.is_ready = True
 
-    def _reader_loop(self) -> None:
-        if not self.process or not self.process.stdout:
-            return
-        try:
-            while self._alive.is_set():
-                line = self.process.stdout.readline()
-                if not line:
-                    if self.process.poll() is not None:
-                        self._alive.clear()
-                        break
-                    time.sleep(0.01)
-                    continue
-                line = line.strip()
-                if line:
-                    self._out_queue.put(line)
-        except Exception as e:
-            log_error(f"Reader loop exception: {e}")
-            self._alive.clear()
-
     def _send_command(self, command: str) -> None:
-        if not self.process or not self.process.stdin:
+        if not self.client:
             return
-        try:
-            self.process.stdin.write(command + "\n")
-            self.process.stdin.flush()
-        except Exception as e:
-            log_error(f"Failed to send command '{command}': {e}")
+        self.client.send(command)
 
-    def _collect_until(self, stop_tokens: Optional[List[str]] = None, timeout: float = 2.0) -> List[str]:
-        stop_tokens = stop_tokens or []
-        collected = []
-        end_time = time.time() + timeout
-        while time.time() < end_time:
-            try:
-                line = self._out_queue.get(timeout=0.05)
-                collected.append(line)
-                for tok in stop_tokens:
-                    if tok in line:
-                        return collected
-            except queue.Empty:
-                continue
-        return collected
-
-    def _wait_for_token(self, token: str, timeout: float = 2.0) -> bool:
-        end_time = time.time() + timeout
-        while time.time() < end_time:
-            try:
-                line = self._out_queue.get(timeout=0.05)
-                if token in line:
-                    return True
-            except queue.Empty:
-                continue
-        return False
+    def _stop_search(self) -> None:
+        self._send_command("stop")
+
+    def _abandon_search(self) -> None:
+        # bestmove не пришёл и после stop — опоздавший ответ не должен достаться следующему поиску
+        if self.client:
+            self.client.abandon_search()
+
+    def stop_search(self) -> None:
+        self._stop_search()
+
+    def new_game(self, game_key: Optional[object] = None) -> None:
+        self.game_key = game_key
+        self._send_command("ucinewgame")
+
+    def _cache_usable(self) -> bool:
+        # Ослабленная игра и ходы партии против человека в общий кэш не пишутся и из него не берутся:
+        # кэш хранит только анализ в полную силу
+        if self.cache is None or self.skill_level < 20 or self.history_sensitive:
+            return False
+        return self.profile is None or self.profile.name != PROFILE_PLAY
+
+    def is_alive(self) -> bool:
+        return self.client is not None and self.client.alive and self.is_ready
 
     def set_skill_level(self, level: int) -> None:
-        if not self.process:
+        if not self.client:
             return
         level = max(0, min(20, int(level)))
         self.skill_level = level
         self._send_command(f"setoption name Skill Level value {self.skill_level}")
 
     def set_multi_pv(self, num_pvs: int) -> None:
-        if not self.process:
+        if not self.client:
             return
-        num_pvs = max(1, min(5, int(num_pvs)))
+        num_pvs = max(1, min(self.max_multi_pv, int(num_pvs)))
+        self.multi_pv = num_pvs
         self._send_command(f"setoption name MultiPV value {num_pvs}")
 
+    def apply_profile(self, profile: EngineProfile) -> bool:
+        if not self.client or not self.is_ready:
+            return False
+        self.profile = profile
+        threads = min(profile.threads, self.max_threads)
+        changed = False
+        if threads != self.threads:
+            self.threads = threads
+            self._send_command(f"setoption name Threads value {threads}")
+            changed = True
+        if profile.hash_mb != self.hash_mb:
+            self.hash_mb = profile.hash_mb
+            self._send_command(f"setoption name Hash value {profile.hash_mb}")
+            changed = True
+        # Движок перестраивает потоки и хэш до ответа readyok; поиск раньше этого запускать нельзя
+        if changed and not self.client.isready(timeout=10.0):
+            log_error(f"Движок не подтвердил профиль {profile.name}.")
+            return False
+        return True
+
     def set_position_from_fen(self, fen_string: str) -> None:
-        if not self.process:
+        if not self.client:
             return
+        self.current_fen = fen_string
+        self.history_sensitive = False
         self._send_command(f"position fen {fen_string}")
 
-    def get_analysis(self, movetime_ms: int = 1000) -> Tuple[List[Dict[str, Any]], Optional[str]]:
-        if not self.process or not self.is_ready:
-            return [], None
+    @staticmethod
+    def _position_command(board: chess.Board, extra_moves: Optional[List[str]] = None) -> str:
+        # Корень партии и все ходы от него: движок видит историю повторений, а хэш остаётся полезным
+        root_fen = board.root().fen()
+        base = "startpos" if root_fen == chess.STARTING_FEN else f"fen {root_fen}"
+        moves = [move.uci() for move in board.move_stack] + (extra_moves or [])
+        return f"position {base} moves {' '.join(moves)}" if moves else f"position {base}"
 
-        self._drain_queue_quick()
+    def set_position_from_board(self, board: chess.Board, game_key: Optional[object] = None) -> None:
+        if not self.client:
+            return
+        if game_key is not None and game_key != self.game_key:
+            self.new_game(game_key)
+        self.current_fen = board.fen()
+        self.history_sensitive = board.halfmove_clock >= CACHE_MAX_HALFMOVE_CLOCK or board.is_repetition(2)
+        self._send_command(self._position_command(board))
+
+    def get_analysis(self, movetime_ms: int = 1000, stop_event: Optional[StopSignal] = None,
+                     multipv: Optional[int] = None,
+                     limits: Optional[SearchLimits] = None) -> Tuple[List[InfoLine], Optional[str]]:
+        if not self.client or not self.is_ready:
+            return [], None
 
-        self._send_command(f"go movetime {int(movetime_ms)}")
+        if limits is None:
+            limits = SearchLimits(movetime_ms=movetime_ms)
+        if multipv is None and self.profile is not None and self.profile.multipv:
+            multipv = self.profile.multipv
+        num_pvs = self.multi_pv if multipv is None else max(1, min(self.max_multi_pv, int(multipv)))
+        fen = self.current_fen
+        use_cache = bool(fen) and limits.cacheable and self._cache_usable()
+        if use_cache:
+            cached = self.cache.lookup(fen, num_pvs, movetime_ms=limits.movetime_ms or 0,
+                                       min_depth=limits.depth, min_nodes=limits.nodes)
+            if cached is not None:
+                return cached
+
+        if num_pvs != self.multi_pv:
+            self._send_command(f"setoption name MultiPV value {num_pvs}")
+        table = MultiPVTable(num_pvs)
+        stability = StabilityStop(limits.stable_depths) if limits.stable_depths else None
+        start = time.time()
+
+        # Вызывается из потока цикла событий; к моменту bestmove все info уже разобраны
+        def on_info(line: str) -> None:
+            parsed = parse_info_line(line)
+            if parsed is None:
+                return
+            table.update(parsed)
+            if stability is not None and stability.feed(parsed):
+                self._stop_search()
+
+        search = self.client.start_search(limits.go_command(), on_info)
+        if stop_event is not None:
+            stop_event.add_callback(self._stop_search)
+        try:
+            bestmove_line = search.result(timeout=limits.timeout())
+        except concurrent.futures.TimeoutError:
+            self._stop_search()
+            try:
+                bestmove_line = search.result(timeout=1.0)
+            except concurrent.futures.TimeoutError:
+                self._abandon_search()
+                bestmove_line = None
+        finally:
+            if stop_event is not None:
+                stop_event.remove_callback(self._stop_search)
+            if num_pvs != self.multi_pv:
+                self._send_command(f"setoption name MultiPV value {self.multi_pv}")
 
-        parsed_lines: List[Dict[str, Any]] = []
         best_move: Optional[str] = None
+        parts = bestmove_line.split() if bestmove_line else []
+        if len(parts) >= 2:
+            best_move = parts[1]
+        # Прерванный поиск неполон — в кэш его не кладём; ранняя остановка по стабильности — полноценный результат
+        stopped = stop_event is not None and stop_event.is_set()
+
+        parsed_lines = table.lines()
+        if bestmove_line and not stopped and use_cache:
+            # Поиск по глубине или узлам запоминаем с фактически потраченным временем
+            spent_ms = limits.movetime_ms or int((time.time() - start) * 1000)
+            self.cache.store(fen, num_pvs, spent_ms, parsed_lines, best_move)
+        return parsed_lines, best_move
 
-        timeout = max(1.0, movetime_ms / 1000.0 + 1.0)
-        end_time = time.time() + timeout
+    def analyse_all_moves(self, movetime_ms: int = 1000,
+                          stop_event: Optional[StopSignal] = None) -> Tuple[List[InfoLine], Optional[str]]:
+        # Одна поисковая сессия с MultiPV по числу легальных ходов — оценка каждого хода позиции
+        if not self.current_fen:
+            return [], None
+        legal_count = chess.Board(self.current_fen).legal_moves.count()
+        if legal_count == 0:
+            return [], None
+        return self.get_analysis(movetime_ms=movetime_ms, stop_event=stop_event, multipv=legal_count)
 
-        score_re = re.compile(r"score (cp|mate) (-?\d+)")
-        multipv_re = re.compile(r"multipv (\d+)")
-        pv_re = re.compile(r"\bpv\b (.+)$")
+    def iter_analysis(self, stop_event: StopSignal) -> Iterator[List[InfoLine]]:
+        if not self.client or not self.is_ready:
+            return
 
-        while time.time() < end_time:
+        fen = self.current_fen
+        expected_slots = self.multi_pv
+        if fen:
             try:
-                line = self._out_queue.get(timeout=0.1)
-            except queue.Empty:
-                continue
-            if line.startswith("info"):
-                try:
-                    mpv = 1
-                    mv_uci = None
-                    score_cp = None
-                    score_mate = None
-
-                    m_mpv = multipv_re.search(line)
-                    if m_mpv:
-                        mpv = int(m_mpv.group(1))
-
-                    m_score = score_re.search(line)
-                    if m_score:
-                        if m_score.group(1) == "cp":
-                            score_cp = int(m_score.group(2))
-                        else:
-                            score_mate = int(m_score.group(2))
-
-                    m_pv = pv_re.search(line)
-                    if m_pv:
-                        pv_moves = m_pv.group(1).split()
-                        if pv_moves:
-                            mv_uci = pv_moves[0]
-
-                    parsed_lines.append({
-                        'pv': mpv,
-                        'score_cp': score_cp,
-                        'score_mate': score_mate,
-                        'move_uci': mv_uci,
-                        'raw': line
-                    })
-                except Exception:
-                    continue
-            elif line.startswith("bestmove"):
-                parts = line.split()
-                if len(parts) >= 2:
-                    best_move = parts[1]
-                break
-            else:
-                continue
-
-        parsed_lines.sort(key=lambda x: x.get('pv', 1))
-        parsed_lines = parsed_lines[:5]
-        return parsed_lines, best_move
-
-    def _drain_queue_quick(self) -> None:
+                expected_slots = max(1, min(self.multi_pv, chess.Board(fen).legal_moves.count()))
+            except ValueError:
+                pass
+            if self._cache_usable():
+                cached = self.cache.lookup(fen, self.multi_pv)
+                if cached is not None and cached[0]:
+                    yield cached[0]
+
+        # Строки info и итоговый bestmove приходят через очередь; поток спит, пока движок молчит
+        lines: "queue.Queue[Optional[str]]" = queue.Queue()
+        search = self.client.start_search("go infinite", lines.put)
+        search.add_done_callback(lambda f: lines.put(None))
+        stop_event.add_callback(self._stop_search)
+        start = time.time()
+
+        table = MultiPVTable(expected_slots)
+        finished = False
         try:
             while True:
-                self._out_queue.get_nowait()
-        except queue.Empty:
-            pass
-
-    def get_threat(self, fen_string: str, movetime_ms: int = 500) -> Optional[str]:
-        if not self.process or not self.is_ready:
+                line = lines.get()
+                if line is None:
+                    finished = True
+                    break
+                parsed = parse_info_line(line)
+                if parsed is None or not table.update(parsed):
+                    continue
+                # Отдаём снимок, когда пришла последняя линия очередной глубины
+                if parsed.multipv >= expected_slots and not stop_event.is_set():
+                    yield table.lines()
+        finally:
+            stop_event.remove_callback(self._stop_search)
+            if not finished:
+                self._stop_search()
+                try:
+                    search.result(timeout=2.0)
+                except concurrent.futures.TimeoutError:
+                    self._abandon_search()
+            bestmove_line = search.result() if search.done() else None
+            lines_final = table.lines()
+            if bestmove_line and lines_final and fen and self._cache_usable():
+                parts = bestmove_line.split()
+                best_move = parts[1] if len(parts) >= 2 else None
+                elapsed_ms = int((time.time() - start) * 1000)
+                self.cache.store(fen, self.multi_pv, elapsed_ms, lines_final, best_move)
+
+    # ------------------ Игра с обдумыванием на чужом времени ------------------
+    def set_ponder(self, enabled: bool) -> None:
+        if self.client and "Ponder" in self.client.options:
+            self._send_command(f"setoption name Ponder value {'true' if enabled else 'false'}")
+
+    def start_ponder(self, board: chess.Board, moves: List[str], limits: SearchLimits,
+                     on_info: Optional[Callable[[str], None]] = None) -> Optional["concurrent.futures.Future[Optional[str]]"]:
+        # Движок думает над позицией после предсказанного ответа соперника, пока тот думает сам
+        if not self.client or not self.is_ready:
+            return None
+        self.current_fen = None
+        self._send_command(self._position_command(board, moves))
+        return self.client.start_search(limits.go_command(ponder=True), on_info)
+
+    def ponderhit(self, search: "concurrent.futures.Future[Optional[str]]",
+                  limits: SearchLimits) -> Optional[str]:
+        # Соперник сыграл предсказанный ход: поиск продолжается уже как обычный, по часам
+        self._send_command("ponderhit")
+        try:
+            bestmove_line = search.result(timeout=limits.timeout())
+        except concurrent.futures.TimeoutError:
+            self._stop_search()
+            try:
+                bestmove_line = search.result(timeout=1.0)
+            except concurrent.futures.TimeoutError:
+                self._abandon_search()
+                bestmove_line = None
+        parts = bestmove_line.split() if bestmove_line else []
+        return parts[1] if len(parts) >= 2 else None
+
+    def cancel_ponder(self, search: "concurrent.futures.Future[Optional[str]]") -> None:
+        # Предсказание не сбылось: bestmove обдумывания отбрасываем
+        self._stop_search()
+        try:
+            search.result(timeout=2.0)
+        except concurrent.futures.TimeoutError:
+            log_error("Движок не остановил обдумывание.")
+            self._abandon_search()
+
+    def get_threat(self, board: chess.Board, movetime_ms: int = 500,
+                   stop_event: Optional[StopSignal] = None, game_key: Optional[object] = None) -> Optional[str]:
+        if not self.client or not self.is_ready:
             return None
         try:
-            board = chess.Board(fen_string)
             if board.is_game_over():
                 return None
 
-            self.set_position_from_fen(fen_string)
-            lines, best = self.get_analysis(movetime_ms=movetime_ms)
+            self.set_position_from_board(board, game_key)
+            lines, best = self.get_analysis(movetime_ms=movetime_ms, stop_event=stop_event)
             return best
         except Exception as e:
             log_error(f"Ошибка get_threat: {e}")
             return None
 
     def quit_engine(self) -> None:
-        if not self.process:
+        if not self.client:
             return
         try:
-            self._send_command("quit")
-            time.sleep(0.05)
-            if self.process.poll() is None:
-                self.process.terminate()
-            self._alive.clear()
-            self.process.wait(timeout=1.0)
-        except Exception:
-            try:
-                if self.process and self.process.poll() is None:
-                    self.process.kill()
-            except Exception:
-                pass
+            self.client.quit(timeout=1.0)
         finally:
-            self.process = None
+            self.client = None
             self.is_ready = False
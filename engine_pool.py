@@ -0,0 +1,238 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Any, Iterator
+
+from engine_handler import EngineHandler, log_error
+from eval_cache import EvalCache
+from engine_profiles import EngineProfile, build_profiles, detect_cpu_count, detect_total_ram_mb, PROFILE_INTERACTIVE
+
+from config import ENGINE_POOL_SIZE
+
+
+class EnginePool:
+    def __init__(self, size: int = ENGINE_POOL_SIZE, engine_path: Optional[str] = None,
+                 initial_skill_level: int = 20, initial_multi_pv: int = 3,
+                 cache: Optional[EvalCache] = None,
+                 profiles: Optional[Dict[str, EngineProfile]] = None, start: bool = True) -> None:
+        self.engine_path = engine_path
+        self.cache = cache
+        self.size = max(1, int(size))
+        self.skill_level = initial_skill_level
+        self.multi_pv = initial_multi_pv
+        self.max_multi_pv = 5
+        self.cpu_count = detect_cpu_count()
+        self.ram_mb = detect_total_ram_mb()
+        # Несколько пулов на одной машине (пакетный разбор в процессах) передают профили, посчитанные на всех
+        self.profiles: Dict[str, EngineProfile] = profiles or build_profiles(self.size, self.cpu_count, self.ram_mb)
+
+        self._cond = threading.Condition()
+        self._handlers: List[EngineHandler] = []
+        self._idle: List[EngineHandler] = []
+        self._closed = False
+
+        self.total_leases = 0
+        self.total_wait_s = 0.0
+        self.restarts = 0
+
+        self._started = False
+        self.booting = False
+        self.boot_seconds: Optional[float] = None
+        if start:
+            self.start()
+
+    def start(self) -> None:
+        # Запуск движков (ожидание uciok/readyok). Может идти в фоновом потоке — acquire до конца запуска ждёт
+        with self._cond:
+            if self._closed or self._started:
+                return
+            self._started = True
+            self.booting = True
+        started = time.time()
+        handlers: List[EngineHandler] = []
+        try:
+            first = self._spawn()
+            self.max_multi_pv = first.max_multi_pv
+            handlers.append(first)
+            # Движка нет — нет смысла запускать остальные
+            if first.client:
+                extra: List[Optional[EngineHandler]] = [None] * (self.size - 1)
+
+                def spawn_into(i: int) -> None:
+                    extra[i] = self._spawn()
+
+                threads = [threading.Thread(target=spawn_into, args=(i,), daemon=True) for i in range(self.size - 1)]
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+                handlers.extend(h for h in extra if h is not None and h.client)
+        finally:
+            with self._cond:
+                closed = self._closed
+                if not closed:
+                    self._handlers = handlers
+                    # Не ответившие uciok/readyok тоже в простое: acquire и check_health перезапустят их через
+                    # _ensure_healthy, а не оставят пул «доступным» без единого рабочего движка
+                    self._idle = [h for h in handlers if h.client]
+                self.booting = False
+                self.boot_seconds = time.time() - started
+                self._cond.notify_all()
+            if closed:
+                for h in handlers:
+                    try:
+                        h.quit_engine()
+                    except Exception:
+                        pass
+
+    def start_background(self) -> threading.Thread:
+        with self._cond:
+            self.booting = not self._closed and not self._started
+        thread = threading.Thread(target=self.start, daemon=True)
+        thread.start()
+        return thread
+
+    def _spawn(self) -> EngineHandler:
+        handler = EngineHandler(engine_path=self.engine_path, initial_skill_level=self.skill_level,
+                                cache=self.cache)
+        if handler.client and handler.multi_pv != self.multi_pv:
+            handler.set_multi_pv(self.multi_pv)
+        # Хэш выделяется сразу при запуске, а не на первой задаче
+        handler.apply_profile(self.profiles[PROFILE_INTERACTIVE])
+        return handler
+
+    @property
+    def available(self) -> bool:
+        return not self._closed and any(h.client for h in self._handlers)
+
+    # ------------------ Аренда движков ------------------
+    def acquire(self, timeout: Optional[float] = None) -> Optional[EngineHandler]:
+        if not self.available and not self.booting:
+            return None
+        start = time.time()
+        with self._cond:
+            while not self._idle:
+                if self._closed or (not self._handlers and not self.booting):
+                    return None
+                remaining = None if timeout is None else timeout - (time.time() - start)
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+            handler = self._idle.pop()
+            self.total_leases += 1
+            self.total_wait_s += time.time() - start
+
+        handler = self._ensure_healthy(handler)
+        if handler is not None:
+            self._sync_settings(handler)
+        return handler
+
+    def release(self, handler: Optional[EngineHandler]) -> None:
+        if handler is None:
+            return
+        with self._cond:
+            if self._closed:
+                return
+            if handler in self._handlers and handler not in self._idle:
+                self._idle.append(handler)
+                self._cond.notify()
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None) -> Iterator[Optional[EngineHandler]]:
+        handler = self.acquire(timeout=timeout)
+        try:
+            yield handler
+        finally:
+            self.release(handler)
+
+    # ------------------ Здоровье ------------------
+    def _ensure_healthy(self, handler: EngineHandler) -> Optional[EngineHandler]:
+        if handler.is_alive():
+            return handler
+        log_error("Движок в пуле не отвечает, перезапускаю.")
+        try:
+            handler.quit_engine()
+        except Exception:
+            pass
+        replacement = self._spawn()
+        with self._cond:
+            try:
+                idx = self._handlers.index(handler)
+                self._handlers[idx] = replacement
+            except ValueError:
+                self._handlers.append(replacement)
+            self.restarts += 1
+        if not replacement.is_alive():
+            log_error("Не удалось перезапустить движок.")
+            with self._cond:
+                self._handlers.remove(replacement)
+                self._cond.notify_all()
+            return None
+        return replacement
+
+    def check_health(self) -> int:
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+        healthy = []
+        for h in idle:
+            h2 = self._ensure_healthy(h)
+            if h2 is not None:
+                healthy.append(h2)
+        with self._cond:
+            self._idle.extend(healthy)
+            self._cond.notify_all()
+        return len(healthy)
+
+    # ------------------ Настройки ------------------
+    def _sync_settings(self, handler: EngineHandler) -> None:
+        if handler.skill_level != self.skill_level:
+            handler.set_skill_level(self.skill_level)
+        if handler.multi_pv != self.multi_pv:
+            handler.set_multi_pv(self.multi_pv)
+
+    def apply_profile(self, handler: EngineHandler, name: str) -> None:
+        profile = self.profiles.get(name)
+        if profile is not None and handler.profile is not profile:
+            handler.apply_profile(profile)
+
+    def set_skill_level(self, level: int) -> None:
+        self.skill_level = max(0, min(20, int(level)))
+
+    def set_multi_pv(self, num_pvs: int) -> None:
+        self.multi_pv = max(1, min(self.max_multi_pv, int(num_pvs)))
+
+    # ------------------ Статистика ------------------
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            total = len(self._handlers)
+            idle = len(self._idle)
+            alive = sum(1 for h in self._handlers if h.is_alive())
+            active = [h.profile.name for h in self._handlers if h not in self._idle and h.profile is not None]
+            return {
+                'size': total,
+                'busy': total - idle,
+                'idle': idle,
+                'alive': alive,
+                'restarts': self.restarts,
+                'leases': self.total_leases,
+                'avg_wait_ms': (self.total_wait_s / self.total_leases * 1000.0) if self.total_leases else 0.0,
+                'active_profiles': active,
+            }
+
+    def busy_fraction(self) -> float:
+        st = self.stats()
+        return st['busy'] / st['size'] if st['size'] else 0.0
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._closed = True
+            handlers = list(self._handlers)
+            self._handlers.clear()
+            self._idle.clear()
+            self._cond.notify_all()
+        for h in handlers:
+            try:
+                h.quit_engine()
+            except Exception:
+                pass
@@ -0,0 +1,103 @@
+import os
+import ctypes
+import platform
+from typing import Optional, Dict, Any
+
+from config import ENGINE_HASH_RAM_FRACTION, ENGINE_MAX_HASH_MB
+
+PROFILE_INTERACTIVE = "interactive"
+PROFILE_PLAY = "play"
+PROFILE_BATCH = "batch"
+
+PROFILE_TITLES = {
+    PROFILE_INTERACTIVE: "анализ",
+    PROFILE_PLAY: "игра",
+    PROFILE_BATCH: "разбор партии",
+}
+
+
+def log_error(msg: str) -> None:
+    print(f"[EngineProfiles ERROR] {msg}")
+
+
+def detect_cpu_count() -> int:
+    try:
+        # Учитываем привязку процесса к ядрам (taskset, контейнеры)
+        return max(1, len(os.sched_getaffinity(0)))
+    except (AttributeError, OSError):
+        return max(1, os.cpu_count() or 1)
+
+
+def detect_total_ram_mb() -> Optional[int]:
+    try:
+        if platform.system() == "Windows":
+            class MemoryStatusEx(ctypes.Structure):
+                _fields_ = [
+                    ("dwLength", ctypes.c_ulong),
+                    ("dwMemoryLoad", ctypes.c_ulong),
+                    ("ullTotalPhys", ctypes.c_ulonglong),
+                    ("ullAvailPhys", ctypes.c_ulonglong),
+                    ("ullTotalPageFile", ctypes.c_ulonglong),
+                    ("ullAvailPageFile", ctypes.c_ulonglong),
+                    ("ullTotalVirtual", ctypes.c_ulonglong),
+                    ("ullAvailVirtual", ctypes.c_ulonglong),
+                    ("ullAvailExtendedVirtual", ctypes.c_ulonglong),
+                ]
+
+            status = MemoryStatusEx()
+            status.dwLength = ctypes.sizeof(MemoryStatusEx)
+            if not ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                return None
+            return int(status.ullTotalPhys // (1024 * 1024))
+        return int(os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024))
+    except (AttributeError, ValueError, OSError) as e:
+        log_error(f"Не удалось определить объём памяти: {e}")
+        return None
+
+
+class EngineProfile:
+    # multipv=None — число линий берётся из настроек пользователя
+    __slots__ = ("name", "threads", "hash_mb", "multipv")
+
+    def __init__(self, name: str, threads: int, hash_mb: int, multipv: Optional[int] = None) -> None:
+        self.name = name
+        self.threads = max(1, int(threads))
+        self.hash_mb = max(16, int(hash_mb))
+        self.multipv = multipv
+
+    @property
+    def title(self) -> str:
+        return PROFILE_TITLES.get(self.name, self.name)
+
+    def describe(self) -> str:
+        return f"{self.title}: {self.threads} пот., {self.hash_mb} МБ"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"EngineProfile({self.name}, threads={self.threads}, hash={self.hash_mb}MB, multipv={self.multipv})"
+
+
+def _hash_per_engine(pool_size: int, ram_mb: Optional[int]) -> int:
+    if not ram_mb:
+        return 16
+    budget = int(ram_mb * ENGINE_HASH_RAM_FRACTION) // max(1, pool_size)
+    budget = max(16, min(ENGINE_MAX_HASH_MB, budget))
+    # Stockfish округляет хэш вниз до степени двойки — берём её сразу
+    return 1 << (budget.bit_length() - 1)
+
+
+def build_profiles(pool_size: int, cpu_count: Optional[int] = None,
+                   ram_mb: Optional[int] = None) -> Dict[str, EngineProfile]:
+    cores = cpu_count or detect_cpu_count()
+    ram = ram_mb if ram_mb is not None else detect_total_ram_mb()
+    # Размер хэша у всех профилей один: его смена очищает таблицу и заново выделяет память
+    hash_mb = _hash_per_engine(pool_size, ram)
+    return {
+        # Интерактивный анализ и игра обычно идут по одному, остальные движки пула в это время заняты разбором
+        PROFILE_INTERACTIVE: EngineProfile(PROFILE_INTERACTIVE, max(1, cores // 2), hash_mb),
+        PROFILE_PLAY: EngineProfile(PROFILE_PLAY, max(1, cores // 2), hash_mb, multipv=1),
+        # При разборе партии заняты все движки сразу — ядра делятся поровну
+        PROFILE_BATCH: EngineProfile(PROFILE_BATCH, max(1, cores // max(1, pool_size)), hash_mb, multipv=1),
+    }
@@ -0,0 +1,198 @@
+import heapq
+import itertools
+import threading
+from typing import Optional, List, Dict, Any, Callable, Tuple
+
+from engine_handler import EngineHandler, log_error
+from uci_client import StopSignal
+from engine_pool import EnginePool
+from engine_profiles import PROFILE_INTERACTIVE, PROFILE_PLAY, PROFILE_BATCH
+
+# Чем меньше число, тем раньше задача попадёт к движку
+PRIORITY_INTERACTIVE = 0
+PRIORITY_PLAY = 1
+PRIORITY_THREAT = 2
+PRIORITY_BATCH = 3
+
+# Какой профиль ресурсов включать на движке перед задачей данного приоритета
+PROFILE_FOR_PRIORITY = {
+    PRIORITY_INTERACTIVE: PROFILE_INTERACTIVE,
+    PRIORITY_PLAY: PROFILE_PLAY,
+    PRIORITY_THREAT: PROFILE_INTERACTIVE,
+    PRIORITY_BATCH: PROFILE_BATCH,
+}
+
+JobRunner = Callable[[EngineHandler, StopSignal], Any]
+DoneCallback = Callable[[Any], None]
+
+
+class EngineJob:
+    def __init__(self, kind: str, priority: int, fen: str, run: JobRunner) -> None:
+        self.kind = kind
+        self.priority = priority
+        self.fen = fen
+        self.run = run
+        self.state = "pending"
+        self.result: Any = None
+        self.cancel_event = StopSignal()
+        self._done_event = threading.Event()
+        self._finished = False
+        self._lock = threading.Lock()
+        self._callbacks: List[DoneCallback] = []
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.kind, self.fen
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event.is_set()
+
+    @property
+    def done(self) -> bool:
+        return self._done_event.is_set()
+
+    def cancel(self) -> None:
+        self.cancel_event.set()
+
+    def add_done_callback(self, callback: DoneCallback) -> None:
+        with self._lock:
+            if not self._finished:
+                self._callbacks.append(callback)
+                return
+        if not self.cancelled:
+            callback(self.result)
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        self._done_event.wait(timeout)
+        return self.result
+
+    def _finish(self, result: Any) -> None:
+        with self._lock:
+            self.result = result
+            self.state = "cancelled" if self.cancelled else "done"
+            self._finished = True
+            callbacks, self._callbacks = self._callbacks, []
+        if not self.cancelled:
+            for cb in callbacks:
+                try:
+                    cb(result)
+                except Exception as e:
+                    log_error(f"Ошибка в обработчике задачи {self.kind}: {e}")
+        self._done_event.set()
+
+
+class EngineScheduler:
+    def __init__(self, pool: EnginePool, workers: Optional[int] = None) -> None:
+        self.pool = pool
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[int, int, EngineJob]] = []
+        self._seq = itertools.count()
+        self._active: Dict[Tuple[str, str], EngineJob] = {}
+        self._closed = False
+        self.coalesced = 0
+
+        n_workers = max(1, workers or pool.stats()['size'])
+        self._threads = [threading.Thread(target=self._worker_loop, daemon=True) for _ in range(n_workers)]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, kind: str, priority: int, fen: str, run: JobRunner,
+               on_done: Optional[DoneCallback] = None, supersede: bool = False) -> EngineJob:
+        with self._cond:
+            existing = self._active.get((kind, fen))
+            if existing is not None and not existing.cancelled and not self._closed:
+                # Та же позиция уже в работе — не запускаем второй поиск
+                self.coalesced += 1
+                job = existing
+            else:
+                if supersede:
+                    for other in self._active.values():
+                        if other.kind == kind:
+                            other.cancel()
+                job = EngineJob(kind, priority, fen, run)
+                if self._closed:
+                    job.cancel()
+                    job._finish(None)
+                    return job
+                self._active[job.key] = job
+                heapq.heappush(self._heap, (priority, next(self._seq), job))
+                self._cond.notify()
+        if on_done is not None:
+            job.add_done_callback(on_done)
+        return job
+
+    def cancel_kind(self, kind: str) -> None:
+        with self._cond:
+            for job in self._active.values():
+                if job.kind == kind:
+                    job.cancel()
+
+    def _next_job(self, wait: bool) -> Optional[EngineJob]:
+        # Самая срочная живая задача; отменённые по дороге завершаются без движка
+        while True:
+            with self._cond:
+                while wait and not self._heap and not self._closed:
+                    self._cond.wait()
+                if self._closed or not self._heap:
+                    return None
+                _, _, job = heapq.heappop(self._heap)
+            if not job.cancelled:
+                return job
+            self._complete(job, None)
+
+    def _has_work(self) -> bool:
+        with self._cond:
+            while not self._heap and not self._closed:
+                self._cond.wait()
+            return not self._closed
+
+    def _worker_loop(self) -> None:
+        # Сначала движок, потом задача: пока рабочий ждёт свободный движок (один может быть занят партией
+        # на всё время игры), очередь продолжает пополняться и вытесняться, и освободившийся движок
+        # получает самую срочную задачу на этот момент, а не ту, что рабочий взял заранее
+        while self._has_work():
+            engine = self.pool.acquire()
+            if engine is None:
+                # Движков нет — задачи завершаются пустым результатом, как и раньше
+                job = self._next_job(wait=False)
+                if job is not None:
+                    self._complete(job, None)
+                continue
+            job, result = None, None
+            try:
+                job = self._next_job(wait=False)
+                if job is not None:
+                    self.pool.apply_profile(engine, PROFILE_FOR_PRIORITY.get(job.priority, PROFILE_INTERACTIVE))
+                    job.state = "running"
+                    result = job.run(engine, job.cancel_event)
+            except Exception as e:
+                log_error(f"Ошибка задачи {job.kind if job else '?'}: {e}")
+            finally:
+                self.pool.release(engine)
+            if job is not None:
+                self._complete(job, result)
+
+    def _complete(self, job: EngineJob, result: Any) -> None:
+        with self._cond:
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+        job._finish(result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            pending = len(self._heap)
+            running = sum(1 for job in self._active.values() if job.state == "running")
+            return {'pending': pending, 'running': running, 'coalesced': self.coalesced}
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._closed = True
+            jobs = list(self._active.values())
+            pending = [job for _, _, job in self._heap]
+            self._heap.clear()
+            self._cond.notify_all()
+        for job in jobs:
+            job.cancel()
+        for job in pending:
+            self._complete(job, None)
@@ -0,0 +1,178 @@
+import os
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Tuple
+
+import chess
+
+from config import EVAL_CACHE_PATH, EVAL_CACHE_SIZE
+from uci_info import InfoLine
+
+# Увеличивается при смене формата сохранённых линий; старые записи тогда отбрасываются
+_SCHEMA_VERSION = 3
+
+
+def log_error(msg: str) -> None:
+    print(f"[EvalCache ERROR] {msg}")
+
+
+def position_key(fen_string: str) -> str:
+    # EPD без счётчиков ходов: одна и та же позиция, достигнутая разными путями, даёт один ключ
+    try:
+        return chess.Board(fen_string).epd()
+    except ValueError:
+        return " ".join(fen_string.split()[:4])
+
+
+class EvalCache:
+    def __init__(self, path: Optional[str] = EVAL_CACHE_PATH, max_entries: int = EVAL_CACHE_SIZE) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        # Позиция -> записи по числу линий: глубокий узкий результат не закрывает более широкий
+        self._mem: "OrderedDict[str, Dict[int, Dict[str, Any]]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        if path:
+            self._open_db(path)
+
+    def _open_db(self, path: str) -> None:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            if self._db.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                self._db.execute("DROP TABLE IF EXISTS positions")
+                self._db.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS positions ("
+                " key TEXT NOT NULL,"
+                " multipv INTEGER NOT NULL,"
+                " depth INTEGER NOT NULL,"
+                " movetime_ms INTEGER NOT NULL,"
+                " data TEXT NOT NULL,"
+                " PRIMARY KEY (key, multipv))"
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            log_error(f"Не удалось открыть кэш оценок {path}: {e}")
+            self._db = None
+
+    @staticmethod
+    def _satisfies(entry: Dict[str, Any], multipv: int, movetime_ms: int,
+                   min_depth: Optional[int], min_nodes: Optional[int]) -> bool:
+        if entry['multipv'] < multipv:
+            return False
+        if min_depth or min_nodes:
+            if min_depth and entry['depth'] < min_depth:
+                return False
+            if min_nodes:
+                nodes = max((line.get('nodes') or 0 for line in entry['lines']), default=0)
+                if nodes < min_nodes:
+                    return False
+            return True
+        return entry['movetime_ms'] >= movetime_ms
+
+    @staticmethod
+    def _covers(entry: Dict[str, Any], multipv: int, depth: int) -> bool:
+        # Запись не хуже другой, если в ней не меньше линий и глубина не меньше
+        return entry['multipv'] >= multipv and entry['depth'] >= depth
+
+    def _remember(self, key: str, entries: Dict[int, Dict[str, Any]]) -> None:
+        self._mem[key] = entries
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+
+    def _load(self, key: str) -> Dict[int, Dict[str, Any]]:
+        # Вызывается под блокировкой: записи позиции из памяти, иначе с диска
+        entries = self._mem.get(key)
+        if entries is not None:
+            self._mem.move_to_end(key)
+            return entries
+        entries = {}
+        if self._db is not None:
+            try:
+                rows = self._db.execute(
+                    "SELECT multipv, depth, movetime_ms, data FROM positions WHERE key = ?", (key,)
+                ).fetchall()
+            except sqlite3.Error as e:
+                log_error(f"Ошибка чтения кэша: {e}")
+                rows = []
+            for row in rows:
+                data = json.loads(row[3])
+                entries[row[0]] = {'multipv': row[0], 'depth': row[1], 'movetime_ms': row[2],
+                                   'lines': data['lines'], 'best_move': data['best_move']}
+        if entries:
+            self._remember(key, entries)
+        return entries
+
+    def lookup(self, fen_string: str, multipv: int, movetime_ms: int = 0, min_depth: Optional[int] = None,
+               min_nodes: Optional[int] = None) -> Optional[Tuple[List[InfoLine], Optional[str]]]:
+        key = position_key(fen_string)
+        with self._lock:
+            suitable = [entry for entry in self._load(key).values()
+                        if self._satisfies(entry, multipv, movetime_ms, min_depth, min_nodes)]
+            if not suitable:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry = max(suitable, key=lambda e: (e['depth'], -e['multipv']))
+            lines = [InfoLine.from_dict(line) for line in entry['lines'] if line['multipv'] <= multipv]
+            return lines, entry['best_move']
+
+    def store(self, fen_string: str, multipv: int, movetime_ms: int,
+              lines: List[InfoLine], best_move: Optional[str]) -> None:
+        key = position_key(fen_string)
+        clean_lines = [line.to_dict() for line in lines]
+        depth = max((line.depth or 0 for line in lines), default=0)
+        entry = {'multipv': multipv, 'depth': depth, 'movetime_ms': int(movetime_ms),
+                 'lines': clean_lines, 'best_move': best_move}
+        with self._lock:
+            # Одно правило для памяти и диска: результат отбрасывается, только если уже есть запись
+            # не уже и не мельче; новый вытесняет записи, которые сам покрывает
+            entries = self._load(key)
+            if any(self._covers(old, multipv, depth) and (old['multipv'], old['depth']) != (multipv, depth)
+                   for old in entries.values()):
+                return
+            for m in [m for m, old in entries.items() if self._covers(entry, m, old['depth'])]:
+                del entries[m]
+            entries[multipv] = entry
+            self._remember(key, entries)
+            if self._db is None:
+                return
+            try:
+                # То же правило на диске: файл может дописывать другой процесс (batch_analyze)
+                covered = self._db.execute(
+                    "SELECT 1 FROM positions WHERE key = ? AND multipv >= ? AND depth >= ? "
+                    "AND NOT (multipv = ? AND depth = ?)", (key, multipv, depth, multipv, depth)
+                ).fetchone()
+                if covered:
+                    self._mem.pop(key, None)
+                    return
+                self._db.execute(
+                    "DELETE FROM positions WHERE key = ? AND multipv <= ? AND depth <= ?", (key, multipv, depth)
+                )
+                self._db.execute(
+                    "INSERT OR REPLACE INTO positions (key, multipv, depth, movetime_ms, data) VALUES (?, ?, ?, ?, ?)",
+                    (key, multipv, depth, int(movetime_ms),
+                     json.dumps({'lines': clean_lines, 'best_move': best_move})),
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                log_error(f"Ошибка записи в кэш: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'entries': len(self._mem), 'hits': self.hits, 'misses': self.misses}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                try:
+                    self._db.close()
+                except sqlite3.Error:
+                    pass
+                self._db = None
@@ -0,0 +1,174 @@
+import math
+import threading
+from typing import Optional, List, Dict, Any, Callable, Tuple
+
+import chess
+import chess.pgn
+
+from engine_handler import EngineHandler, SearchLimits
+from uci_client import StopSignal
+from uci_info import InfoLine
+from engine_scheduler import EngineScheduler, EngineJob, PRIORITY_BATCH
+from tablebase import Tablebase
+from opening_book import OpeningBook
+from config import BOOK_MAX_PLIES
+
+ProgressCallback = Callable[[int, int], None]
+
+MATE_SCORE_CP = 10000
+BOOK_MOVE_COMMENT = "Книжный ход."
+
+
+def classify_eval_loss(eval_loss: float) -> str:
+    if eval_loss > 250:
+        return " (Зевок ??)"
+    if eval_loss > 120:
+        return " (Ошибка ?)"
+    if eval_loss > 60:
+        return " (Неточность ?!)"
+    return ""
+
+
+def stm_score(line: Optional[InfoLine]) -> Optional[int]:
+    if line is None:
+        return None
+    if line.score_cp is not None:
+        return line.score_cp
+    if line.score_mate is not None:
+        return MATE_SCORE_CP if line.score_mate > 0 else -MATE_SCORE_CP
+    return None
+
+
+def analyse_position(engine: Optional[EngineHandler], board: chess.Board, limits: SearchLimits,
+                     stop_event: Optional[StopSignal] = None, game_key: Optional[object] = None) -> Optional[InfoLine]:
+    terminal = terminal_position_score(board)
+    if terminal is not None:
+        return terminal
+    if engine is None:
+        return None
+    engine.set_position_from_board(board, game_key)
+    lines, _ = engine.get_analysis(stop_event=stop_event, limits=limits)
+    return lines[0] if lines else None
+
+
+def terminal_position_score(board: chess.Board) -> Optional[InfoLine]:
+    if board.is_checkmate():
+        return InfoLine(score_mate=0)
+    if board.is_game_over():
+        return InfoLine(score_cp=0)
+    return None
+
+
+def annotate_ply(board: chess.Board, before: Optional[InfoLine], after: Optional[InfoLine]) -> Dict[str, Any]:
+    result: Dict[str, Any] = {'eval': None, 'comment': None, 'best_move': None, 'eval_loss': None, 'book': False}
+    score_before = stm_score(before)
+    if score_before is None or not before.move_uci:
+        return result
+
+    # Оценка до хода в пользу белых — её же рисует график
+    white_pov = score_before if board.turn == chess.WHITE else -score_before
+    result['eval'] = white_pov
+    result['best_move'] = before.move_uci
+    if before.score_cp is None:
+        return result
+
+    best_move_san = "N/A"
+    try:
+        engine_move = chess.Move.from_uci(before.move_uci)
+        if board.is_legal(engine_move):
+            best_move_san = board.san(engine_move)
+    except Exception:
+        pass
+
+    score_after = stm_score(after)
+    if score_after is not None:
+        # После хода оценка дана с точки зрения соперника
+        eval_loss = score_before + score_after
+        result['eval_loss'] = eval_loss
+        comment = f"[%eval {white_pov/100.0:.2f}] Лучший ход был {best_move_san}."
+        result['comment'] = comment + classify_eval_loss(eval_loss)
+    return result
+
+
+def analyse_mainline(scheduler: EngineScheduler, game: chess.pgn.Game, limits: SearchLimits,
+                     on_progress: Optional[ProgressCallback] = None,
+                     tablebase: Optional[Tablebase] = None,
+                     book: Optional[OpeningBook] = None,
+                     stats: Optional[Dict[str, int]] = None) -> List[Dict[str, Any]]:
+    nodes = list(game.mainline())
+    if not nodes:
+        return []
+
+    # Первые ходы из дебютной книги не анализируются: позиции до них движку не нужны
+    book_plies = 0
+    if book is not None and book.available:
+        book_plies = book.book_plies(game.board(), [node.move for node in nodes], BOOK_MAX_PLIES)
+
+    # Каждая позиция ищется один раз: позиция после хода i — это позиция до хода i + 1
+    # Доски хранят историю ходов: движок получает "position ... moves ..." и видит повторения
+    boards: List[chess.Board] = []
+    board = game.board()
+    for node in nodes:
+        boards.append(board.copy())
+        board.push(node.move)
+    boards.append(board.copy())
+    game_key = id(game)
+    total = len(boards)
+
+    positions: List[Optional[InfoLine]] = [None] * total
+    lock = threading.Lock()
+    done = [0]
+
+    def mark_done() -> None:
+        with lock:
+            done[0] += 1
+            finished = done[0]
+        if on_progress:
+            on_progress(finished, total)
+
+    # Позиции партии уходят в планировщик с фоновым приоритетом и делятся между всеми движками пула;
+    # интерактивные задачи обгоняют их в очереди
+    jobs: List[Tuple[int, EngineJob]] = []
+    for i, pos_board in enumerate(boards):
+        if i < book_plies:
+            mark_done()
+            continue
+        known = terminal_position_score(pos_board)
+        if known is None and tablebase is not None:
+            # Позиции из эндшпильной базы оцениваются точно и без движка
+            tb_lines = tablebase.probe(pos_board)
+            known = tb_lines[0] if tb_lines else None
+        if known is not None:
+            positions[i] = known
+            mark_done()
+            continue
+
+        def run(engine: EngineHandler, cancel: StopSignal, b: chess.Board = pos_board) -> Optional[InfoLine]:
+            return analyse_position(engine, b, limits, stop_event=cancel, game_key=game_key)
+
+        jobs.append((i, scheduler.submit("batch", PRIORITY_BATCH, pos_board.fen(), run,
+                                         on_done=lambda _result: mark_done())))
+
+    if stats is not None:
+        # Сколько позиций ушло движку; книжные, матовые/патовые и найденные в базе не считаются
+        stats['searched'] = len(jobs)
+        stats['book'] = book_plies
+        stats['known'] = total - book_plies - len(jobs)
+
+    for i, job in jobs:
+        positions[i] = job.wait()
+
+    book_results = [{'eval': None, 'comment': BOOK_MOVE_COMMENT, 'best_move': None, 'eval_loss': None, 'book': True}
+                    for _ in range(book_plies)]
+    return book_results + [annotate_ply(boards[i], positions[i], positions[i + 1])
+                           for i in range(book_plies, len(nodes))]
+
+
+def apply_analysis(game: chess.pgn.Game, results: List[Dict[str, Any]]) -> List[float]:
+    # Ходы без оценки (книжные, неудачный поиск) остаются на графике пропуском, номера ходов не сдвигаются
+    evaluation_history: List[float] = []
+    for node, res in zip(game.mainline(), results):
+        evaluation_history.append(res['eval'] if res['eval'] is not None else math.nan)
+        if res['comment']:
+            node.comment = res['comment']
+    return evaluation_history
@@ -0,0 +1,400 @@
+import functools
+import io
+import json
+import os
+import re
+import socket
+import sqlite3
+import threading
+from typing import Optional, List, Dict, Any, Tuple, Iterator, Callable
+from urllib.parse import urlparse
+
+import chess.pgn
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import (
+    LICHESS_BASE_URL,
+    LICHESS_TOKEN,
+    LICHESS_CACHE_PATH,
+    LICHESS_IMPORT_DIR,
+    LICHESS_TIMEOUT,
+    LICHESS_RETRIES,
+    LICHESS_DEFAULT_MAX_GAMES,
+)
+from uci_client import StopSignal
+
+KIND_GAME = "game"
+KIND_USER = "user"
+KIND_TOURNAMENT = "tournament"
+KIND_SWISS = "swiss"
+KIND_STUDY = "study"
+
+KIND_TITLES = {
+    KIND_GAME: "партия",
+    KIND_USER: "партии игрока",
+    KIND_TOURNAMENT: "турнир",
+    KIND_SWISS: "швейцарский турнир",
+    KIND_STUDY: "исследование",
+}
+
+_GAME_ID = re.compile(r"^[A-Za-z0-9]{8}(?:[A-Za-z0-9]{4})?$")
+_LICHESS_HOSTS = ("lichess.org", "www.lichess.org")
+# Разделы сайта, имя которых выглядит как 8-символьный ID партии
+_SITE_PAGES = {
+    "training", "practice", "streamer", "analysis", "insights", "features", "calendar", "settings",
+    "password", "timeline",
+}
+
+ProgressCallback = Callable[[int], None]
+
+
+def log_error(msg: str) -> None:
+    print(f"[Lichess ERROR] {msg}")
+
+
+def parse_lichess_url(text: str, base_url: str = LICHESS_BASE_URL) -> Optional[Tuple[str, str]]:
+    # https://lichess.org/abcdEFGH[/white] — партия, /@/name — игрок, /tournament|swiss|study/ID — турнир или исследование
+    text = text.strip()
+    parsed = urlparse(text if "://" in text else "https://" + text)
+    host = (parsed.hostname or "").lower()
+    if host not in _LICHESS_HOSTS and host != (urlparse(base_url).hostname or "").lower():
+        return None
+    parts = [part for part in parsed.path.split("/") if part]
+    if len(parts) >= 2 and parts[0] == "@":
+        return KIND_USER, parts[1]
+    if len(parts) >= 2 and parts[0] in (KIND_TOURNAMENT, KIND_SWISS, KIND_STUDY):
+        return parts[0], parts[1]
+    # Партия — только /ID или /ID/white|black, а не раздел сайта с подходящим по длине именем
+    game_path = len(parts) == 1 or (len(parts) == 2 and parts[1] in ("white", "black"))
+    if game_path and _GAME_ID.match(parts[0]) and parts[0] not in _SITE_PAGES:
+        # 12-символьный ID — ссылка игрока на свою партию; общий ID партии — первые 8 символов
+        return KIND_GAME, parts[0][:8]
+    return None
+
+
+def split_pgn(text: str) -> List[str]:
+    stream = io.StringIO(text)
+    games: List[str] = []
+    while True:
+        game = chess.pgn.read_game(stream)
+        if game is None:
+            return games
+        games.append(str(game))
+
+
+def _abort(response: requests.Response) -> None:
+    # close() из другого потока не будит заблокированное чтение, а shutdown сокета — будит
+    sock = getattr(getattr(response.raw, "_connection", None), "sock", None)
+    if sock is not None:
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class LichessCache:
+    # PGN партий по ID и состав источников (игрок, турнир) — повторный импорт берёт уже скачанное с диска
+    def __init__(self, path: Optional[str] = LICHESS_CACHE_PATH) -> None:
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path:
+            self._open_db(path)
+
+    def _open_db(self, path: str) -> None:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(
+                "CREATE TABLE IF NOT EXISTS games (id TEXT PRIMARY KEY, pgn TEXT NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS source_games (source TEXT NOT NULL, game_id TEXT NOT NULL,"
+                " created_at INTEGER NOT NULL, PRIMARY KEY (source, game_id));"
+                "CREATE TABLE IF NOT EXISTS sources (source TEXT PRIMARY KEY, synced_until INTEGER NOT NULL,"
+                " complete INTEGER NOT NULL);"
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            log_error(f"Не удалось открыть кэш партий {path}: {e}")
+            self._db = None
+
+    def game(self, game_id: str) -> Optional[str]:
+        if self._db is None:
+            return None
+        with self._lock:
+            row = self._db.execute("SELECT pgn FROM games WHERE id = ?", (game_id,)).fetchone()
+        return row[0] if row else None
+
+    def store(self, source: Optional[str], games: List[Tuple[str, int, str]]) -> None:
+        # games: (ID, время начала партии в мс, PGN)
+        if self._db is None or not games:
+            return
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO games VALUES (?, ?)",
+                                 [(game_id, pgn) for game_id, _, pgn in games])
+            if source is not None:
+                self._db.executemany("INSERT OR REPLACE INTO source_games VALUES (?, ?, ?)",
+                                     [(source, game_id, created) for game_id, created, _ in games])
+            self._db.commit()
+
+    def source_state(self, source: str) -> Optional[Tuple[int, bool]]:
+        if self._db is None:
+            return None
+        with self._lock:
+            row = self._db.execute("SELECT synced_until, complete FROM sources WHERE source = ?", (source,)).fetchone()
+        return (row[0], bool(row[1])) if row else None
+
+    def set_source_state(self, source: str, synced_until: int, complete: bool) -> None:
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?)", (source, synced_until, int(complete)))
+            self._db.commit()
+
+    def forget_older(self, source: str, created_before: int) -> None:
+        # Между новыми и старыми партиями источника образовался пропуск — старые больше не считаются его частью
+        if self._db is None:
+            return
+        with self._lock:
+            self._db.execute("DELETE FROM source_games WHERE source = ? AND created_at < ?", (source, created_before))
+            self._db.commit()
+
+    def source_games(self, source: str, limit: Optional[int] = None) -> List[str]:
+        if self._db is None:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT g.pgn FROM source_games s JOIN games g ON g.id = s.game_id WHERE s.source = ?"
+                " ORDER BY s.created_at DESC LIMIT ?", (source, -1 if limit is None else int(limit))).fetchall()
+        return [row[0] for row in rows]
+
+    def source_range(self, source: str) -> Tuple[int, Optional[int]]:
+        if self._db is None:
+            return 0, None
+        with self._lock:
+            row = self._db.execute("SELECT COUNT(*), MIN(created_at) FROM source_games WHERE source = ?",
+                                   (source,)).fetchone()
+        return row[0], row[1]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class LichessClient:
+    # Одна сессия на всё приложение: соединения переиспользуются, сбои и 429 повторяются с паузой
+    def __init__(self, base_url: str = LICHESS_BASE_URL, cache: Optional[LichessCache] = None,
+                 token: str = LICHESS_TOKEN, timeout: Tuple[float, float] = LICHESS_TIMEOUT,
+                 retries: int = LICHESS_RETRIES) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.cache = cache if cache is not None else LichessCache()
+        self.timeout = timeout
+        self.downloaded = 0
+        self.cache_hits = 0
+        retry = Retry(total=retries, backoff_factor=1.0, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset({"GET"}), respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = "ChessAI"
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def _get(self, path: str, params: Optional[Dict[str, Any]] = None, accept: str = "application/json",
+             stream: bool = False) -> requests.Response:
+        response = self.session.get(self.base_url + path, params=params, headers={"Accept": accept},
+                                    timeout=self.timeout, stream=stream)
+        response.raise_for_status()
+        return response
+
+    def _stream_lines(self, path: str, params: Dict[str, Any], accept: str,
+                      stop: StopSignal) -> Iterator[bytes]:
+        # Отмена обрывает соединение — чтение прерывается сразу, а не по таймауту.
+        # chunk_size=None: строки отдаются по мере прихода фрагментов, а не после заполнения буфера
+        response = self._get(path, params, accept, stream=True)
+        abort = functools.partial(_abort, response)
+        stop.add_callback(abort)
+        try:
+            for line in response.iter_lines(chunk_size=None):
+                if stop.is_set():
+                    return
+                yield line
+        except (requests.RequestException, OSError, AttributeError, ValueError):
+            if not stop.is_set():
+                raise
+        finally:
+            stop.remove_callback(abort)
+            response.close()
+
+    def _stream_games(self, path: str, params: Dict[str, Any], stop: StopSignal) -> Iterator[Tuple[str, int, str]]:
+        params = dict(params, pgnInJson="true", clocks="true", evals="true", opening="true")
+        for line in self._stream_lines(path, params, "application/x-ndjson", stop):
+            if not line.strip():
+                continue
+            data = json.loads(line)
+            if data.get("id") and data.get("pgn"):
+                self.downloaded += 1
+                yield data["id"], int(data.get("createdAt") or 0), data["pgn"].strip()
+
+    def game(self, game_id: str) -> Optional[str]:
+        cached = self.cache.game(game_id)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+        pgn = self._get(f"/game/export/{game_id}", {"clocks": "true", "evals": "true"},
+                        "application/x-chess-pgn").text.strip()
+        if pgn:
+            self.downloaded += 1
+            self.cache.store(None, [(game_id, 0, pgn)])
+        return pgn or None
+
+    def user_games(self, username: str, max_games: int, stop: StopSignal,
+                   on_progress: Optional[ProgressCallback] = None) -> List[str]:
+        source = f"{KIND_USER}:{username.lower()}"
+        state = self.cache.source_state(source)
+
+        # Новые партии после прошлого импорта, от свежих к старым
+        params: Dict[str, Any] = {"max": max_games}
+        if state is not None:
+            params["since"] = state[0] + 1
+        fetched = self._fetch_into_cache(f"/api/games/user/{username}", params, source, stop, on_progress)
+        if stop.is_set():
+            return []
+        newest = max((created for _, created, _ in fetched), default=state[0] if state else 0)
+        complete = state[1] if state else len(fetched) < max_games
+        if state is not None and len(fetched) >= max_games:
+            # Новых партий не меньше предела — между ними и кэшем мог остаться пропуск
+            self.cache.forget_older(source, min(created for _, created, _ in fetched))
+            complete = False
+        self.cache.set_source_state(source, newest, complete)
+
+        # Если в кэше меньше, чем просили, — догружаем более старые
+        count, oldest = self.cache.source_range(source)
+        if count < max_games and not complete and oldest:
+            older = self._fetch_into_cache(f"/api/games/user/{username}",
+                                           {"max": max_games - count, "until": oldest - 1},
+                                           source, stop, on_progress, already=len(fetched))
+            if not stop.is_set() and len(older) < max_games - count:
+                self.cache.set_source_state(source, newest, True)
+        return self.cache.source_games(source, max_games)
+
+    def event_games(self, kind: str, event_id: str, stop: StopSignal,
+                    on_progress: Optional[ProgressCallback] = None) -> List[str]:
+        # Завершённый турнир не меняется: после полной загрузки он читается только из кэша
+        source = f"{kind}:{event_id}"
+        state = self.cache.source_state(source)
+        if state is not None and state[1]:
+            games = self.cache.source_games(source)
+            self.cache_hits += len(games)
+            return games[::-1]
+        info = self._get(f"/api/{kind}/{event_id}").json()
+        finished = bool(info.get("isFinished")) or info.get("status") == "finished"
+        fetched = self._fetch_into_cache(f"/api/{kind}/{event_id}/games", {}, source, stop, on_progress)
+        if stop.is_set():
+            return []
+        self.cache.set_source_state(source, max((c for _, c, _ in fetched), default=0), finished)
+        return [pgn for _, _, pgn in fetched]
+
+    def study_games(self, study_id: str, stop: StopSignal,
+                    on_progress: Optional[ProgressCallback] = None) -> List[str]:
+        # Главы исследования не имеют ID партий и редактируются — их не кэшируем
+        lines = []
+        chapters = 0
+        for line in self._stream_lines(f"/api/study/{study_id}.pgn", {"clocks": "true", "comments": "true"},
+                                       "application/x-chess-pgn", stop):
+            lines.append(line.decode("utf-8", errors="replace"))
+            if line.startswith(b"[Event "):
+                chapters += 1
+                if on_progress is not None:
+                    on_progress(chapters)
+        return [] if stop.is_set() else split_pgn("\n".join(lines))
+
+    def _fetch_into_cache(self, path: str, params: Dict[str, Any], source: str, stop: StopSignal,
+                          on_progress: Optional[ProgressCallback], already: int = 0) -> List[Tuple[str, int, str]]:
+        fetched: List[Tuple[str, int, str]] = []
+        batch: List[Tuple[str, int, str]] = []
+        try:
+            for game in self._stream_games(path, params, stop):
+                fetched.append(game)
+                batch.append(game)
+                if len(batch) >= 50:
+                    self.cache.store(source, batch)
+                    batch = []
+                if on_progress is not None:
+                    on_progress(already + len(fetched))
+        finally:
+            # Скачанное до обрыва остаётся в кэше
+            self.cache.store(source, batch)
+        return fetched
+
+    def close(self) -> None:
+        self.session.close()
+        self.cache.close()
+
+
+class LichessImport:
+    # Фоновая загрузка одного источника в PGN-файл; по форме — как PgnScanner: start/cancel/done/count/error
+    def __init__(self, client: LichessClient, kind: str, ident: str,
+                 max_games: int = LICHESS_DEFAULT_MAX_GAMES, out_dir: str = LICHESS_IMPORT_DIR) -> None:
+        self.client = client
+        self.kind = kind
+        self.ident = ident
+        self.max_games = max_games
+        self.out_dir = out_dir
+        self.count = 0
+        self.path: Optional[str] = None
+        self.error: Optional[str] = None
+        self.done = threading.Event()
+        self._stop = StopSignal()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="lichess-import")
+
+    @property
+    def title(self) -> str:
+        return f"{KIND_TITLES.get(self.kind, self.kind)} {self.ident}"
+
+    @property
+    def cancelled(self) -> bool:
+        return self._stop.is_set()
+
+    def start(self) -> "LichessImport":
+        self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        self._stop.set()
+
+    def _on_progress(self, count: int) -> None:
+        self.count = count
+
+    def _fetch(self) -> List[str]:
+        if self.kind == KIND_GAME:
+            pgn = self.client.game(self.ident)
+            return [pgn] if pgn else []
+        if self.kind == KIND_USER:
+            return self.client.user_games(self.ident, self.max_games, self._stop, self._on_progress)
+        if self.kind in (KIND_TOURNAMENT, KIND_SWISS):
+            return self.client.event_games(self.kind, self.ident, self._stop, self._on_progress)
+        if self.kind == KIND_STUDY:
+            return self.client.study_games(self.ident, self._stop, self._on_progress)
+        raise ValueError(f"неизвестный источник {self.kind}")
+
+    def _run(self) -> None:
+        try:
+            games = self._fetch()
+            if games and not self.cancelled:
+                os.makedirs(self.out_dir, exist_ok=True)
+                safe_ident = re.sub(r"[^A-Za-z0-9_-]", "_", self.ident)
+                path = os.path.join(self.out_dir, f"{self.kind}-{safe_ident}.pgn")
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write("\n\n".join(games) + "\n")
+                self.path = path
+            self.count = len(games)
+        except (requests.RequestException, OSError, ValueError) as e:
+            self.error = str(e)
+            log_error(f"Ошибка импорта ({self.title}): {e}")
+        finally:
+            self.done.set()
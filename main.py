@@ -1,78 +1,97 @@
+# Первым — чтобы замер времени запуска включал все импорты
+from startup_timing import StartupTimer
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox, simpledialog, Toplevel
-from PIL import Image, ImageTk, ImageDraw, ImageFont
+from PIL import ImageTk
 import chess
 import chess.pgn
 import os
 import threading
 import queue
-import io
-import requests
-import pygame
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from typing import Optional, Any, List, Dict
+import sqlite3
+from typing import Optional, Any, List, Dict, TYPE_CHECKING
 import random
+import math
 import config
 
-from engine_handler import EngineHandler
+from engine_pool import EnginePool
+from eval_cache import EvalCache
+from engine_profiles import PROFILE_INTERACTIVE
+from engine_handler import EngineHandler, SearchLimits
+from uci_client import StopSignal
+from uci_info import InfoLine
+from engine_scheduler import (
+    EngineScheduler,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_PLAY,
+    PRIORITY_THREAT,
+)
+from game_analysis import analyse_mainline, apply_analysis
+from play_session import PlaySession, GameClock, format_clock
+from tablebase import Tablebase
+from opening_book import OpeningBook
+from pgn_index import PgnIndex, GameEntry, read_game_at
+from pgn_browser import PgnBrowserWindow
+from move_list import MoveListModel
+from position_table import PositionTable
+from board_renderer import BoardRenderer
+from animation import AnimationScheduler
+from sprite_cache import SpriteCache
+
+# matplotlib, requests (через lichess_import) и pygame подгружаются при первом использовании
+if TYPE_CHECKING:
+    from lichess_import import LichessClient, LichessImport
 
 from config import (
     BOARD_IMG_WIDTH,
     BOARD_IMG_HEIGHT,
     SQUARE_SIZE,
+    MIN_SQUARE_SIZE,
+    BOARD_RESIZE_SETTLE_MS,
     INFO_PANEL_WIDTH,
     EVAL_BAR_HEIGHT,
     ASSETS_DIR,
-    IMAGE_DIR,
-    PIECE_DIR,
     SOUND_DIR,
-    PIECE_SYMBOL_TO_FILE,
-    ANIMATION_STEPS,
-    ANIMATION_DELAY,
     DEFAULT_ENGINE_MOVETIME_MS,
+    DEFAULT_ENGINE_DEPTH,
+    STABLE_STOP_DEPTHS,
     DEFAULT_ENGINE_MULTIPV,
+    MAX_UI_MULTIPV,
     DEFAULT_ENGINE_SKILL,
-    BOARD_ONLY_HINTS
+    PV_PREVIEW_PLIES,
+    TIME_CONTROLS,
+    DEFAULT_TIME_CONTROL,
+    LICHESS_DEFAULT_MAX_GAMES,
+    BOARD_ONLY_HINTS,
+    ENGINE_BOOT_POLL_MS
 )
 
 # ---------- Небольшие утилиты ----------
 def ensure_assets_exist() -> bool:
     return os.path.isdir(ASSETS_DIR)
 
-def make_placeholder_piece(symbol: str, size: int = SQUARE_SIZE) -> ImageTk.PhotoImage:
-    img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(img)
-    try:
-        fnt = ImageFont.truetype("DejaVuSans-Bold.ttf", size // 2)
-    except Exception:
-        fnt = ImageFont.load_default()
-    try:
-        bbox = draw.textbbox((0, 0), symbol, font=fnt)
-        w, h = bbox[2] - bbox[0], bbox[3] - bbox[1]
-    except Exception:
-        try:
-            w, h = fnt.getsize(symbol)
-        except Exception:
-            w, h = size // 2, size // 2
-
-    draw.rectangle([(0, 0), (size, size)], fill=(240, 240, 240, 255))
-    draw.text(((size - w) / 2, (size - h) / 2), symbol, font=fnt, fill="black")
-    return ImageTk.PhotoImage(img)
-
 # ---------- Приложение ----------
 class ChessAnalyzerApp:
-    def __init__(self, root: tk.Tk) -> None:
+    def __init__(self, root: tk.Tk, timer: Optional[StartupTimer] = None) -> None:
         self.root = root
+        self.startup_timer = timer or StartupTimer()
         self.root.title("ChessAI")
-        self.root.minsize(BOARD_IMG_WIDTH + 20, BOARD_IMG_HEIGHT + 120)
+        self.root.minsize(MIN_SQUARE_SIZE * 8 + INFO_PANEL_WIDTH + 30, MIN_SQUARE_SIZE * 8 + 120)
 
         self.piece_images: Dict[str, ImageTk.PhotoImage] = {}
+        self.square_size = SQUARE_SIZE
+        self.board_origin = (0, 0)
+        self._resize_job: Optional[str] = None
         self.current_game_node: Optional[chess.pgn.GameNode] = None
+        self.positions = PositionTable()
+        self.move_list = MoveListModel(self.positions)
+        self._scrubbing = False
+        self.selected_move_row: Optional[int] = None
         self.board_state: chess.Board = chess.Board()
         self.board_orientation_white_pov: bool = True
 
-        self.is_animating = False
+        self.animator = AnimationScheduler(self.root)
+        self._analysis_after: Optional[str] = None
         self.is_dragging = False
         self.drag_from_square: Optional[int] = None
         self.drag_image_id: Optional[int] = None
@@ -81,22 +100,38 @@ class ChessAnalyzerApp:
         self.game_mode: str = "analysis"
         self.user_color: Optional[bool] = None
         self.evaluation_history: List[float] = []
+        self.play_session: Optional[PlaySession] = None
+        self.game_clock: Optional[GameClock] = None
+        self.pending_engine_move: Optional[chess.Move] = None
 
         self.engine_skill_var = tk.IntVar(value=DEFAULT_ENGINE_SKILL)
         self.engine_multipv_var = tk.IntVar(value=DEFAULT_ENGINE_MULTIPV)
         self.engine_time_var = tk.IntVar(value=DEFAULT_ENGINE_MOVETIME_MS)
+        self.engine_depth_var = tk.IntVar(value=DEFAULT_ENGINE_DEPTH)
+        self.engine_stable_stop_var = tk.BooleanVar(value=True)
 
         self.board_only_mode = False
         self.hints_overlay_id = None
 
-        self.init_sound()
-
-        self.engine = EngineHandler(initial_skill_level=self.engine_skill_var.get())
-        if not self.engine.process:
-            messagebox.showwarning("Ошибка движка", "Stockfish не найден. Анализ будет недоступен.")
+        # None — звук ещё не пробовали включать
+        self.sound_enabled: Optional[bool] = None
+        self.move_sound = None
+        self.capture_sound = None
+
+        self.eval_cache = EvalCache()
+        self.tablebase = Tablebase()
+        self.opening_book = OpeningBook()
+        self.lichess_client: Optional["LichessClient"] = None
+        # Движки запускаются в фоне после показа окна; задачи, пришедшие раньше, ждут в очереди планировщика
+        self.engine_pool = EnginePool(initial_skill_level=self.engine_skill_var.get(),
+                                      initial_multi_pv=self.engine_multipv_var.get(),
+                                      cache=self.eval_cache, start=False)
+        self.engine_scheduler = EngineScheduler(self.engine_pool, workers=self.engine_pool.size)
 
         self.analysis_queue: queue.Queue = queue.Queue()
         self.threat_move_obj: Optional[chess.Move] = None
+        self.analysis_lines: List[InfoLine] = []
+        self.analysis_fen: Optional[str] = None
 
         self.load_assets()
 
@@ -114,11 +149,59 @@ class ChessAnalyzerApp:
         self.update_board_display()
         self.update_info_panel()
         self.process_analysis_queue()
+        self.startup_timer.mark("окно")
+        self.board_canvas.bind("<Expose>", self._on_first_frame)
+
+        self.engine_pool.start_background()
+        self.update_engine_status()
+        self.root.after(ENGINE_BOOT_POLL_MS, self._poll_engine_boot)
 
         self.prompt_color_and_start()
 
-    def init_sound(self) -> None:
+    # ------------------ Запуск ------------------
+    def _on_first_frame(self, event: Optional[Any] = None) -> None:
+        self.board_canvas.unbind("<Expose>")
+        self.startup_timer.mark("первый кадр")
+        self._report_startup()
+
+    def _poll_engine_boot(self) -> None:
+        if self.engine_pool.booting:
+            self.root.after(ENGINE_BOOT_POLL_MS, self._poll_engine_boot)
+            return
+        self.startup_timer.mark("движок")
+        self.update_engine_status()
+        self._report_startup()
+        if not self.engine_pool.available:
+            messagebox.showwarning("Ошибка движка", "Stockfish не найден. Анализ будет недоступен.")
+            return
+        max_lines = min(MAX_UI_MULTIPV, self.engine_pool.max_multi_pv)
+        self.multipv_spinbox.config(to=max_lines)
+        self.multipv_label.config(text=f"Количество строк (1-{max_lines}):")
+        self.update_pool_status()
+        if self.game_mode == "analysis" and not self.board_state.is_game_over():
+            self.request_analysis_current_pos()
+
+    def _report_startup(self) -> None:
+        timer = self.startup_timer
+        if timer.get("первый кадр") is None or timer.get("движок") is None:
+            return
+        print(f"[Startup] {timer.report()}")
+        timer.save()
+
+    def update_engine_status(self) -> None:
+        if self.engine_pool.booting:
+            self.engine_status_label.config(text="Движок: запуск…", foreground="gray40")
+        elif self.engine_pool.available:
+            self.engine_status_label.config(text="Движок: готов", foreground="dark green")
+        else:
+            self.engine_status_label.config(text="Движок: недоступен", foreground="firebrick")
+
+    def init_sound(self) -> bool:
+        # pygame загружается при первом звуке, а не при старте
+        if self.sound_enabled is not None:
+            return self.sound_enabled
         try:
+            import pygame
             pygame.mixer.init()
             self.move_sound = pygame.mixer.Sound(os.path.join(SOUND_DIR, "move.wav")) if os.path.exists(os.path.join(SOUND_DIR, "move.wav")) else None
             self.capture_sound = pygame.mixer.Sound(os.path.join(SOUND_DIR, "capture.wav")) if os.path.exists(os.path.join(SOUND_DIR, "capture.wav")) else None
@@ -126,31 +209,12 @@ class ChessAnalyzerApp:
         except Exception as e:
             self.sound_enabled = False
             print(f"Sound init error: {e}")
+        return self.sound_enabled
 
     def load_assets(self) -> None:
-        try:
-            board_img_path = os.path.join(IMAGE_DIR, "board.png")
-            if os.path.exists(board_img_path):
-                pil_board_image = Image.open(board_img_path).resize((BOARD_IMG_WIDTH, BOARD_IMG_HEIGHT), Image.LANCZOS)
-                self.board_bg_image = ImageTk.PhotoImage(pil_board_image)
-            else:
-                self.board_bg_image = None
-        except Exception:
-            self.board_bg_image = None
-
-        for sym in list("PNBRQKpnbrqk"):
-            self.piece_images[sym] = None
-        for symbol, filename in PIECE_SYMBOL_TO_FILE.items():
-            color_folder = "white" if symbol.isupper() else "black"
-            path = os.path.join(PIECE_DIR, color_folder, filename)
-            if os.path.exists(path):
-                try:
-                    img = Image.open(path).resize((SQUARE_SIZE, SQUARE_SIZE), Image.LANCZOS)
-                    self.piece_images[symbol] = ImageTk.PhotoImage(img)
-                except Exception:
-                    self.piece_images[symbol] = make_placeholder_piece(symbol.upper() if symbol.isupper() else symbol.lower())
-            else:
-                self.piece_images[symbol] = make_placeholder_piece(symbol.upper() if symbol.isupper() else symbol.lower())
+        self.sprites = SpriteCache()
+        pieces, self.board_bg_image = self.sprites.get(self.square_size)
+        self.piece_images.update(pieces)
 
     def create_widgets(self) -> None:
         self.main_frame = ttk.Frame(self.root, padding=8)
@@ -159,12 +223,20 @@ class ChessAnalyzerApp:
         left_frame = ttk.Frame(self.main_frame)
         left_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 10))
 
+        # Кнопки и шкала оценки упаковываются первыми: при уменьшении окна сжимается доска, а не они
+        board_controls_frame = ttk.Frame(left_frame)
+        board_controls_frame.pack(side=tk.BOTTOM, fill=tk.X)
         self.board_canvas = tk.Canvas(left_frame, width=BOARD_IMG_WIDTH, height=BOARD_IMG_HEIGHT, bg="grey20", highlightthickness=0)
-        self.board_canvas.pack()
-        if hasattr(self, 'board_bg_image') and self.board_bg_image:
-            self.board_canvas.create_image(0, 0, anchor=tk.NW, image=self.board_bg_image)
+        self.board_canvas.pack(fill=tk.BOTH, expand=True)
+        self.board_bg_item: Optional[int] = None
+        if self.board_bg_image:
+            self.board_bg_item = self.board_canvas.create_image(0, 0, anchor=tk.NW, image=self.board_bg_image)
+        self.board_renderer = BoardRenderer(self.board_canvas, self.piece_images, self.get_square_coords,
+                                            self.square_size)
+        self.hint_overlay_items: List[int] = []
+        self.board_canvas.bind("<Configure>", self.on_board_resize)
 
-        self.create_board_controls(left_frame)
+        self.create_board_controls(board_controls_frame)
 
         self.info_panel = ttk.Frame(self.main_frame, width=INFO_PANEL_WIDTH)
         self.info_panel.pack(side=tk.RIGHT, fill=tk.BOTH, expand=False)
@@ -181,7 +253,7 @@ class ChessAnalyzerApp:
         self.menu_bar.add_cascade(label="Файл", menu=file_menu)
         file_menu.add_command(label="Загрузить PGN...", command=self.load_pgn)
         file_menu.add_command(label="Загрузить FEN...", command=self.load_fen_dialog)
-        file_menu.add_command(label="Загрузить по URL (Lichess)...", command=self.load_from_url)
+        file_menu.add_command(label="Загрузить с Lichess...", command=self.load_from_url)
         file_menu.add_separator()
         file_menu.add_command(label="Сохранить PGN с аннотациями...", command=self.save_pgn_with_annotations)
         file_menu.add_separator()
@@ -191,6 +263,7 @@ class ChessAnalyzerApp:
         self.menu_bar.add_cascade(label="Игра", menu=game_menu)
         game_menu.add_command(label="Новая игра с движком", command=self.start_new_game_vs_engine)
         game_menu.add_command(label="Режим: Только доска (Space)", command=self.toggle_board_only)
+        game_menu.add_command(label="Перейти к полуходу... (G)", command=self.jump_to_ply_dialog)
 
         self.prev_move_button = ttk.Button(pgn_controls_frame, text="<", command=self.prev_move_action, state=tk.DISABLED)
         self.prev_move_button.pack(side=tk.LEFT, padx=2)
@@ -200,6 +273,18 @@ class ChessAnalyzerApp:
         self.flip_board_button.pack(side=tk.LEFT, padx=6)
         self.copy_fen_button = ttk.Button(pgn_controls_frame, text="Копировать FEN", command=self.export_fen_to_clipboard)
         self.copy_fen_button.pack(side=tk.LEFT, padx=6)
+        self.clock_label = ttk.Label(pgn_controls_frame, text="", font=("Arial", 12, "bold"))
+        self.clock_label.pack(side=tk.RIGHT, padx=6)
+        self.engine_status_label = ttk.Label(pgn_controls_frame, text="")
+        self.engine_status_label.pack(side=tk.RIGHT, padx=6)
+
+        # Ползунок по полуходам текущей линии: переход к любому ходу берёт готовую позицию из таблицы
+        scrub_frame = ttk.Frame(parent)
+        scrub_frame.pack(fill=tk.X)
+        self.ply_scale = ttk.Scale(scrub_frame, from_=0, to=0, orient=tk.HORIZONTAL, command=self.on_ply_scrub)
+        self.ply_scale.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(2, 6))
+        self.ply_label = ttk.Label(scrub_frame, text="0/0", width=9, anchor=tk.E)
+        self.ply_label.pack(side=tk.RIGHT, padx=2)
 
         self.eval_bar_canvas = tk.Canvas(parent, height=EVAL_BAR_HEIGHT, bg="dim gray", highlightthickness=0)
         self.eval_bar_canvas.pack(fill=tk.X, pady=(6, 0))
@@ -214,9 +299,15 @@ class ChessAnalyzerApp:
         self.notebook.add(analysis_tab, text="Анализ")
         self.create_analysis_tab(analysis_tab)
 
+        # График строится при первом открытии вкладки — matplotlib долго импортируется
         self.graph_tab = ttk.Frame(self.notebook)
         self.notebook.add(self.graph_tab, text="График")
-        self.create_graph_tab(self.graph_tab)
+        self.graph_canvas = None
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_notebook_tab_changed)
+
+    def on_notebook_tab_changed(self, event: Optional[Any] = None) -> None:
+        if self.graph_canvas is None and self.notebook.select() == str(self.graph_tab):
+            self.create_graph_tab(self.graph_tab)
 
     def create_analysis_tab(self, parent):
         self.game_info_label = ttk.Label(parent, text="Партия не загружена", wraplength=INFO_PANEL_WIDTH - 20, justify=tk.LEFT)
@@ -251,8 +342,10 @@ class ChessAnalyzerApp:
 
         multipv_frame = ttk.Frame(engine_settings_frame)
         multipv_frame.pack(fill=tk.X, pady=(6, 0))
-        ttk.Label(multipv_frame, text="Количество строк (1-5):").pack(side=tk.LEFT)
-        self.multipv_spinbox = ttk.Spinbox(multipv_frame, from_=1, to=5, textvariable=self.engine_multipv_var, width=3, command=self.update_engine_multipv)
+        max_lines = min(MAX_UI_MULTIPV, self.engine_pool.max_multi_pv)
+        self.multipv_label = ttk.Label(multipv_frame, text=f"Количество строк (1-{max_lines}):")
+        self.multipv_label.pack(side=tk.LEFT)
+        self.multipv_spinbox = ttk.Spinbox(multipv_frame, from_=1, to=max_lines, textvariable=self.engine_multipv_var, width=3, command=self.update_engine_multipv)
         self.multipv_spinbox.pack(side=tk.LEFT, padx=6)
 
         time_frame = ttk.Frame(engine_settings_frame)
@@ -261,6 +354,21 @@ class ChessAnalyzerApp:
         self.time_spinbox = ttk.Spinbox(time_frame, from_=200, to=10000, increment=100, textvariable=self.engine_time_var, width=8)
         self.time_spinbox.pack(side=tk.LEFT, padx=6)
 
+        depth_frame = ttk.Frame(engine_settings_frame)
+        depth_frame.pack(fill=tk.X, pady=(6, 0))
+        ttk.Label(depth_frame, text="Глубина анализа партии (0 — по времени):").pack(side=tk.LEFT)
+        self.depth_spinbox = ttk.Spinbox(depth_frame, from_=0, to=60, textvariable=self.engine_depth_var, width=3)
+        self.depth_spinbox.pack(side=tk.LEFT, padx=6)
+        ttk.Checkbutton(engine_settings_frame, text="Останавливать поиск, когда лучший ход устоялся",
+                        variable=self.engine_stable_stop_var).pack(anchor=tk.W, pady=(6, 0))
+
+        self.pool_status_label = ttk.Label(engine_settings_frame, text="", foreground="gray25")
+        self.pool_status_label.pack(anchor=tk.W, pady=(6, 0))
+        ram_text = f"{self.engine_pool.ram_mb // 1024} ГБ" if self.engine_pool.ram_mb else "неизвестно"
+        hardware_text = (f"Ядер: {self.engine_pool.cpu_count}, ОЗУ: {ram_text}, "
+                         f"хэш на движок: {self.engine_pool.profiles[PROFILE_INTERACTIVE].hash_mb} МБ")
+        ttk.Label(engine_settings_frame, text=hardware_text, foreground="gray25").pack(anchor=tk.W)
+
         eval_frame = ttk.LabelFrame(parent, text="Лучшие ходы", padding=6)
         eval_frame.pack(fill=tk.X, padx=6, pady=6)
         columns = ('#1', '#2', '#3')
@@ -277,6 +385,9 @@ class ChessAnalyzerApp:
         self.game_status_label.pack(anchor=tk.NW, fill=tk.X, pady=6, padx=6)
 
     def create_graph_tab(self, parent):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
         self.fig = Figure(figsize=(4, 3), dpi=100)
         self.ax = self.fig.add_subplot(111)
         self.ax.set_title("Оценка партии")
@@ -294,6 +405,10 @@ class ChessAnalyzerApp:
         self.root.bind("<space>", lambda e: self.toggle_board_only())
         self.root.bind("<Left>", lambda e: self.prev_move_action())
         self.root.bind("<Right>", lambda e: self.next_move_action())
+        self.root.bind("<Home>", lambda e: self.jump_to_ply(0))
+        self.root.bind("<End>", lambda e: self.jump_to_ply(len(self.move_list.nodes) - 1))
+        self.root.bind("g", lambda e: self.jump_to_ply_dialog())
+        self.root.bind("G", lambda e: self.jump_to_ply_dialog())
         self.root.bind("f", lambda e: self.flip_board())
         self.root.bind("F", lambda e: self.flip_board())
         self.root.bind("a", lambda e: self.request_analysis_current_pos())
@@ -313,12 +428,19 @@ class ChessAnalyzerApp:
         for text, val in (("Белыми", "white"), ("Черными", "black"), ("Случайно", "random"), ("Только анализ", "analysis")):
             ttk.Radiobutton(win, text=text, value=val, variable=choice).pack(anchor="w", padx=12)
 
+        tc_frame = ttk.Frame(win)
+        tc_frame.pack(fill=tk.X, padx=12, pady=(6, 0))
+        ttk.Label(tc_frame, text="Контроль времени:").pack(side=tk.LEFT)
+        time_control = tk.StringVar(value=DEFAULT_TIME_CONTROL)
+        ttk.Combobox(tc_frame, textvariable=time_control, state="readonly", width=10,
+                     values=[name for name, _, _ in TIME_CONTROLS]).pack(side=tk.LEFT, padx=6)
+
         btns = ttk.Frame(win)
         btns.pack(fill=tk.X, pady=12, padx=12)
-        ttk.Button(btns, text="OK", command=lambda: self._apply_start_choice(choice.get(), win)).pack(side=tk.RIGHT)
+        ttk.Button(btns, text="OK", command=lambda: self._apply_start_choice(choice.get(), win, time_control.get())).pack(side=tk.RIGHT)
         ttk.Button(btns, text="Отмена", command=win.destroy).pack(side=tk.RIGHT, padx=(0, 6))
 
-    def _apply_start_choice(self, val: str, dialog: Toplevel) -> None:
+    def _apply_start_choice(self, val: str, dialog: Toplevel, time_control: str = DEFAULT_TIME_CONTROL) -> None:
         dialog.destroy()
         if val == "analysis":
             self.reset_to_new_game(chess.pgn.Game())
@@ -335,71 +457,131 @@ class ChessAnalyzerApp:
         self.board_orientation_white_pov = (self.user_color == chess.WHITE)
         self.update_board_display()
         self.game_mode = "play_engine"
+        self.start_play_session(time_control)
+
+    def start_play_session(self, time_control: str) -> None:
+        if self.engine_pool.booting:
+            # Партия начнётся, как только движки запустятся
+            self.root.after(ENGINE_BOOT_POLL_MS, lambda: self._start_play_when_ready(time_control))
+            return
+        if not self.engine_pool.available:
+            return
+        base_ms, increment_ms = next(((base, inc) for name, base, inc in TIME_CONTROLS if name == time_control), (None, 0))
+        self.game_clock = GameClock(base_ms, increment_ms) if base_ms else None
+
+        def on_engine_move(fen: str, best_move_uci: str) -> None:
+            self.root.after(0, lambda: self.apply_engine_move(fen, best_move_uci))
+
+        self.play_session = PlaySession(self.engine_pool, not self.user_color, on_engine_move,
+                                        clock=self.game_clock, movetime_ms=self.engine_time_var.get(),
+                                        book=self.opening_book)
+        if self.game_clock is not None:
+            self.game_clock.start(self.board_state.turn)
+            self.update_clock_display()
         if self.board_state.turn != self.user_color:
-            self.root.after(500, self.make_engine_move)
+            self.play_session.request_move(self.board_state)
+
+    def _start_play_when_ready(self, time_control: str) -> None:
+        if self.game_mode == "play_engine" and self.play_session is None:
+            self.start_play_session(time_control)
+
+    def end_play_session(self) -> None:
+        if self.play_session is not None:
+            self.play_session.close()
+            self.play_session = None
+        if self.game_clock is not None:
+            self.game_clock.stop()
+        self.pending_engine_move = None
+
+    def update_clock_display(self) -> None:
+        clock = self.game_clock
+        if clock is None:
+            self.clock_label.config(text="")
+            return
+        white, black = clock.remaining_ms(chess.WHITE), clock.remaining_ms(chess.BLACK)
+        self.clock_label.config(text=f"Б {format_clock(white)}  |  Ч {format_clock(black)}")
+        if self.play_session is None:
+            return
+        flagged = clock.flagged()
+        if flagged is not None:
+            self.end_play_session()
+            self.game_mode = "analysis"
+            loser = "Белые" if flagged == chess.WHITE else "Черные"
+            self.game_status_label.config(text=f"ВРЕМЯ ИСТЕКЛО! {loser} проиграли.", foreground="red")
+            return
+        self.root.after(100, self.update_clock_display)
 
     # ------------------ Отрисовка ------------------
     def update_board_display(self, move_to_animate: Optional[chess.Move] = None, captured: bool = False,
                              is_reverse_animation: bool = False, animated_piece_symbol: Optional[str] = None) -> None:
         if self.is_animating:
             return
-        self.board_canvas.delete("piece", "arrow", "threat_arrow", "hint_overlay")
         self.clear_highlighted_squares()
         self.threat_move_obj = None
 
         if move_to_animate and animated_piece_symbol:
-            self.is_animating = True
+            self.board_renderer.clear_arrows()
             self.animate_move(move_to_animate, captured, is_reverse_animation, animated_piece_symbol)
         else:
             self._draw_all_pieces()
             self._draw_move_arrows()
-            if self.board_only_mode:
-                self._draw_board_hints()
+            self._show_board_hints(self.board_only_mode)
 
     def _draw_all_pieces(self) -> None:
-        self.board_canvas.delete("piece")
-        for sq_idx in chess.SQUARES:
-            if self.is_dragging and self.drag_from_square == sq_idx:
-                continue
-            piece = self.board_state.piece_at(sq_idx)
-            if piece:
-                symbol = piece.symbol()
-                img = self.piece_images.get(symbol)
-                x, y = self.get_square_coords(sq_idx)
-                if img:
-                    self.board_canvas.create_image(x, y, anchor=tk.NW, image=img, tags=("piece", f"piece_at_{sq_idx}"))
-                else:
-                    self.board_canvas.create_text(x + SQUARE_SIZE/2, y + SQUARE_SIZE/2, text=symbol, font=("Arial", 18), tags=("piece", f"piece_at_{sq_idx}"))
+        # Перерисовываются только клетки, на которых что-то изменилось
+        hidden = {self.drag_from_square} if self.is_dragging and self.drag_from_square is not None else None
+        self.board_renderer.render_pieces(self.board_state, hidden)
 
     def _draw_move_arrows(self) -> None:
-        self.board_canvas.delete("arrow")
-        if self.current_game_node and self.current_game_node.move:
-            move = self.current_game_node.move
-            self.draw_arrow(move.from_square, move.to_square, color="#3366CC", width=3, tag="last_move_arrow")
+        # Каждый слой стрелок переиспользует свои элементы; одинаковый набор стрелок не трогает холст
+        renderer = self.board_renderer
+        last_move = self.current_game_node.move if self.current_game_node else None
+        renderer.set_arrows("last_move", [(last_move.from_square, last_move.to_square, "#3366CC", 3, None)]
+                            if last_move else [])
 
         best_moves = self.get_best_moves_from_treeview()
-        if best_moves:
+        renderer.set_arrows("best_move", [(m.from_square, m.to_square, "#228B22", 4, None) for m in best_moves[:1]])
+        renderer.set_arrows("alt_move", [(m.from_square, m.to_square, "#FFA500", 2, None) for m in best_moves[1:]])
+        renderer.set_arrows("pv", self._pv_continuation_arrows())
+
+        threat = self.threat_move_obj
+        renderer.set_arrows("threat", [(threat.from_square, threat.to_square, "#FF0000", 4, None)] if threat else [])
+
+    def _pv_continuation_arrows(self) -> List[tuple]:
+        # Продолжение главной линии после лучшего хода — тонкими пунктирными стрелками
+        if not self.analysis_lines or self.analysis_fen != self.board_state.fen():
+            return []
+        arrows = []
+        pv = self.analysis_lines[0].pv
+        board = self.board_state.copy(stack=False)
+        for i, move_uci in enumerate(pv[:PV_PREVIEW_PLIES + 1]):
             try:
-                self.draw_arrow(best_moves[0].from_square, best_moves[0].to_square, color="#228B22", width=4, tag="best_move_arrow")
-            except Exception:
-                pass
-            for i, move in enumerate(best_moves[1:], start=1):
-                try:
-                    self.draw_arrow(move.from_square, move.to_square, color="#FFA500", width=2, tag=f"alt_move_arrow_{i}")
-                except Exception:
-                    pass
-
-        if self.threat_move_obj:
-            self.draw_arrow(self.threat_move_obj.from_square, self.threat_move_obj.to_square, color="#FF0000", width=4, tag="threat_arrow")
-
-    def _draw_board_hints(self):
-        w = 220
-        h = len(BOARD_ONLY_HINTS) * 16 + 12
-        x = BOARD_IMG_WIDTH - w - 8
-        y = BOARD_IMG_HEIGHT - h - 8
-        self.board_canvas.create_rectangle(x, y, x + w, y + h, fill="#111111", outline="#444444", width=1, stipple="gray25", tags="hint_overlay")
-        for i, line in enumerate(BOARD_ONLY_HINTS):
-            self.board_canvas.create_text(x + 8, y + 8 + i * 16, anchor="nw", text=line, font=("Arial", 9), fill="white", tags="hint_overlay")
+                move = board.parse_uci(move_uci)
+            except ValueError:
+                break
+            if i > 0:
+                color = "#7FBF7F" if board.turn == self.board_state.turn else "#BF7F7F"
+                arrows.append((move.from_square, move.to_square, color, 2, (4, 3)))
+            board.push(move)
+        return arrows
+
+    def _show_board_hints(self, visible: bool) -> None:
+        # Подсказки рисуются один раз и дальше только показываются или прячутся
+        if not self.hint_overlay_items:
+            if not visible:
+                return
+            w = 220
+            h = len(BOARD_ONLY_HINTS) * 16 + 12
+            x = self.board_origin[0] + self.square_size * 8 - w - 8
+            y = self.board_origin[1] + self.square_size * 8 - h - 8
+            self.hint_overlay_items.append(self.board_canvas.create_rectangle(
+                x, y, x + w, y + h, fill="#111111", outline="#444444", width=1, stipple="gray25", tags="hint_overlay"))
+            for i, line in enumerate(BOARD_ONLY_HINTS):
+                self.hint_overlay_items.append(self.board_canvas.create_text(
+                    x + 8, y + 8 + i * 16, anchor="nw", text=line, font=("Arial", 9), fill="white", tags="hint_overlay"))
+        self.board_canvas.itemconfigure("hint_overlay", state=tk.NORMAL if visible else tk.HIDDEN)
+        if visible:
+            self.board_canvas.tag_raise("hint_overlay")
 
     # ------------------ Логика загрузки/анализ ------------------
     def update_info_panel(self) -> None:
@@ -417,54 +599,88 @@ class ChessAnalyzerApp:
             self.populate_moves_listbox()
             self.check_game_status()
 
-            if not self.board_state.is_game_over() and self.game_mode == "analysis" and self.engine and self.engine.process:
-                self.request_analysis_current_pos()
+            if not self.board_state.is_game_over() and self.game_mode == "analysis" and self.engine_pool.available:
+                self.schedule_analysis()
             else:
                 self.update_eval_bar(None, None)
         else:
             self.game_info_label.config(text="Партия не загружена")
             self.moves_listbox.delete(0, tk.END)
+            self.move_list.reset()
+            self.selected_move_row = None
+            self.update_ply_scrubber()
             self.update_eval_bar(None, None)
             self.update_evaluation_graph()
 
     def populate_moves_listbox(self) -> None:
-        self.moves_listbox.delete(0, tk.END)
-        self.move_nodes_in_listbox = []
-
-        game_root_node = self.current_game_node.game()
-        board_for_san = game_root_node.board()
-
-        self.moves_listbox.insert(tk.END, "--- Начало ---")
-        self.move_nodes_in_listbox.append(game_root_node)
-
-        for node in game_root_node.mainline():
-            san_move = board_for_san.san(node.move)
-            display_text = ""
-            if board_for_san.turn == chess.WHITE:
-                display_text = f"{board_for_san.fullmove_number}. {san_move}"
-            else:
-                display_text = f"{board_for_san.fullmove_number}... {san_move}"
-
-            nags = "".join([{1: '!', 2: '?', 3: '!!', 4: '??', 5: '!?', 6: '?!'}.get(nag, '') for nag in node.nags])
-            if nags:
-                display_text += f" {nags}"
+        # Строки перестраиваются только с места, где линия разошлась со списком; иначе меняется одно выделение
+        change = self.move_list.sync(self.current_game_node)
+        if change is not None:
+            start, texts = change
+            self.moves_listbox.delete(start, tk.END)
+            if texts:
+                self.moves_listbox.insert(tk.END, *texts)
+            self.moves_listbox.selection_clear(0, tk.END)
+            self.selected_move_row = None
+        self.select_move_row(self.move_list.row_of(self.current_game_node))
+        self.update_ply_scrubber()
+
+    def update_ply_scrubber(self) -> None:
+        last_ply = max(0, len(self.move_list.nodes) - 1)
+        ply = self.move_list.row_of(self.current_game_node) or 0
+        # set() у ttk.Scale вызывает command — не принимаем это за действие пользователя
+        self._scrubbing = True
+        try:
+            self.ply_scale.configure(to=max(1, last_ply))
+            self.ply_scale.set(ply)
+        finally:
+            self._scrubbing = False
+        self.ply_label.config(text=f"{ply}/{last_ply}")
 
-            if node.comment:
-                display_text += f" ({node.comment[:40]})" if len(node.comment) > 40 else f" ({node.comment})"
+    def on_ply_scrub(self, value: str) -> None:
+        if not self._scrubbing:
+            self.jump_to_ply(int(round(float(value))))
 
-            self.moves_listbox.insert(tk.END, display_text)
-            self.move_nodes_in_listbox.append(node)
-            board_for_san.push(node.move)
+    def jump_to_ply(self, ply: int) -> None:
+        target_node = self.move_list.node_at(max(0, min(ply, len(self.move_list.nodes) - 1)))
+        if target_node is not None and target_node is not self.current_game_node:
+            self._set_active_node(target_node)
 
+    def jump_to_ply_dialog(self) -> None:
+        last_ply = len(self.move_list.nodes) - 1
+        if last_ply < 1:
+            return
+        ply = simpledialog.askinteger("Перейти к полуходу", f"Номер полухода (0-{last_ply}):",
+                                      initialvalue=self.move_list.row_of(self.current_game_node) or 0,
+                                      minvalue=0, maxvalue=last_ply, parent=self.root)
+        if ply is not None:
+            self.jump_to_ply(ply)
+
+    def refresh_move_rows(self, nodes: Optional[List[chess.pgn.GameNode]] = None) -> None:
+        # После правки аннотаций меняются только строки с изменившимся текстом
+        for row, text in self.move_list.refresh(nodes):
+            self.moves_listbox.delete(row)
+            self.moves_listbox.insert(row, text)
+        self.moves_listbox.selection_clear(0, tk.END)
+        self.selected_move_row = None
+        self.select_move_row(self.move_list.row_of(self.current_game_node))
+
+    def select_move_row(self, row: Optional[int]) -> None:
+        if row == self.selected_move_row:
+            return
         try:
-            idx_to_select = self.move_nodes_in_listbox.index(self.current_game_node)
-            self.moves_listbox.selection_clear(0, tk.END)
-            self.moves_listbox.selection_set(idx_to_select)
-            self.moves_listbox.see(idx_to_select)
-        except (ValueError, tk.TclError):
+            if self.selected_move_row is not None:
+                self.moves_listbox.selection_clear(self.selected_move_row)
+            if row is not None:
+                self.moves_listbox.selection_set(row)
+                self.moves_listbox.see(row)
+        except tk.TclError:
             pass
+        self.selected_move_row = row
 
     def update_evaluation_graph(self) -> None:
+        if self.graph_canvas is None:
+            return
         self.ax.clear()
         self.ax.grid(True)
         self.ax.set_title("Оценка партии")
@@ -476,7 +692,8 @@ class ChessAnalyzerApp:
             self.ax.plot(plies, self.evaluation_history, marker='o', linestyle='-')
             self.ax.axhline(0, color='black', linewidth=0.8, linestyle='--')
 
-            max_abs_eval = max(abs(e) for e in self.evaluation_history) if self.evaluation_history else 100
+            known_evals = [abs(e) for e in self.evaluation_history if not math.isnan(e)]
+            max_abs_eval = max(known_evals) if known_evals else 100
             display_max = min(max_abs_eval + 100, 1000)
             self.ax.set_ylim(-display_max, display_max)
         else:
@@ -488,64 +705,43 @@ class ChessAnalyzerApp:
 
     def load_pgn(self) -> None:
         filepath = filedialog.askopenfilename(title="Открыть PGN", filetypes=(("PGN files", "*.pgn"), ("All files", "*.*")))
-        if not filepath:
-            return
+        if filepath:
+            self.open_pgn_file(filepath)
 
+    def open_pgn_file(self, filepath: str) -> None:
+        # Индекс файла хранится на диске: при повторном открытии сканирования нет, окно открывается сразу.
+        # Новый файл сканируется в фоне; окно выбора открывается, как только найдена вторая партия
         try:
-            with open(filepath, 'r', encoding='utf-8-sig') as pgn_file:
-                pgn_text = pgn_file.read()
-
-            pgn_io = io.StringIO(pgn_text)
-            games = []
-            while True:
-                offset = pgn_io.tell()
-                headers = chess.pgn.read_headers(pgn_io)
-                if headers is None:
-                    break
-                games.append((headers, offset))
+            index = PgnIndex(filepath).open()
+        except (OSError, sqlite3.Error) as e:
+            messagebox.showerror("Ошибка загрузки PGN", f"Произошла ошибка: {e}")
+            return
 
-            if not games:
+        def wait_for_games() -> None:
+            count = index.count()
+            if count > 1:
+                PgnBrowserWindow(self.root, index, lambda entry: self.load_game_from_file(filepath, entry))
+            elif not index.complete:
+                self.root.after(50, wait_for_games)
+            elif index.scanner is not None and index.scanner.error:
+                index.close()
+                messagebox.showerror("Ошибка загрузки PGN", f"Произошла ошибка: {index.scanner.error}")
+            elif not count:
+                index.close()
                 messagebox.showerror("Ошибка PGN", "Не найдено ни одной партии в файле.")
-                return
-
-            if len(games) == 1:
-                self.load_game_from_pgn(pgn_text, 0)
             else:
-                self.show_pgn_selection_window(pgn_text, games)
+                found = index.entry(index.query(limit=1)[0][0])
+                index.close()
+                self.load_game_from_file(filepath, GameEntry(found[0], found[1], {}))
 
-        except Exception as e:
-            messagebox.showerror("Ошибка загрузки PGN", f"Произошла ошибка: {e}")
+        wait_for_games()
 
-    def show_pgn_selection_window(self, pgn_text: str, games: List[tuple]) -> None:
-        win = Toplevel(self.root)
-        win.title("Выберите партию")
-
-        tree = ttk.Treeview(win, columns=('white', 'black', 'result'), show='headings')
-        tree.heading('white', text='Белые')
-        tree.heading('black', text='Черные')
-        tree.heading('result', text='Результат')
-
-        for i, (headers, offset) in enumerate(games):
-            tree.insert('', 'end', values=(headers.get("White", "?"), headers.get("Black", "?"), headers.get("Result", "*")), iid=i)
-
-        tree.pack(padx=10, pady=10, fill="both", expand=True)
-
-        def on_load():
-            selected_item = tree.selection()
-            if selected_item:
-                game_index = int(selected_item[0])
-                offset = games[game_index][1]
-                self.load_game_from_pgn(pgn_text, offset)
-                win.destroy()
-
-        load_button = ttk.Button(win, text="Загрузить", command=on_load)
-        load_button.pack(pady=10)
-        tree.bind("<Double-1>", lambda e: on_load())
-
-    def load_game_from_pgn(self, pgn_text: str, offset: int) -> None:
-        pgn_io = io.StringIO(pgn_text)
-        pgn_io.seek(offset)
-        game = chess.pgn.read_game(pgn_io)
+    def load_game_from_file(self, filepath: str, entry: GameEntry) -> None:
+        try:
+            game = read_game_at(filepath, entry.offset, entry.length)
+        except OSError as e:
+            messagebox.showerror("Ошибка загрузки PGN", f"Произошла ошибка: {e}")
+            return
         if game:
             self.reset_to_new_game(game, preserve_orientation=True)
         else:
@@ -565,25 +761,66 @@ class ChessAnalyzerApp:
                 messagebox.showerror("Ошибка FEN", "Неверная строка FEN.")
 
     def load_from_url(self) -> None:
-        url = simpledialog.askstring("Загрузить по URL", "Введите URL партии с Lichess:", parent=self.root)
-        if not url or "lichess.org" not in url:
-            if url:
-                messagebox.showerror("Ошибка", "Поддерживаются только URL с lichess.org")
+        url = simpledialog.askstring("Загрузить с Lichess",
+                                     "URL партии, профиля (lichess.org/@/имя), турнира или исследования:",
+                                     parent=self.root)
+        if not url:
             return
-
-        game_id = url.split('/')[-1].split('?')[0]
-        if len(game_id) < 8:
-            messagebox.showerror("Ошибка URL", "Неверный ID партии в URL.")
+        # requests импортируется только здесь, при первом импорте с Lichess
+        from lichess_import import LichessClient, LichessImport, parse_lichess_url, KIND_USER
+        source = parse_lichess_url(url)
+        if source is None:
+            messagebox.showerror("Ошибка URL", "Поддерживаются только ссылки на партии, игроков, турниры и исследования lichess.org")
             return
 
-        api_url = f"https://lichess.org/game/export/{game_id}"
-        try:
-            response = requests.get(api_url, headers={'Accept': 'application/x-chess-pgn'})
-            response.raise_for_status()
-            pgn_text = response.text
-            self.load_game_from_pgn(pgn_text, 0)
-        except requests.RequestException as e:
-            messagebox.showerror("Ошибка сети", f"Не удалось загрузить партию: {e}")
+        kind, ident = source
+        max_games = LICHESS_DEFAULT_MAX_GAMES
+        if kind == KIND_USER:
+            max_games = simpledialog.askinteger("Партии игрока", f"Сколько последних партий {ident} загрузить?",
+                                                initialvalue=LICHESS_DEFAULT_MAX_GAMES, minvalue=1, maxvalue=100000,
+                                                parent=self.root)
+            if not max_games:
+                return
+        if self.lichess_client is None:
+            self.lichess_client = LichessClient()
+        job = LichessImport(self.lichess_client, kind, ident, max_games).start()
+        self.show_import_progress(job)
+
+    def show_import_progress(self, job: "LichessImport") -> None:
+        # Загрузка идёт в фоне; окно показывает число партий и позволяет её прервать
+        win = Toplevel(self.root)
+        win.title("Импорт с Lichess")
+        win.transient(self.root)
+        ttk.Label(win, text=f"Загрузка: {job.title}").pack(padx=16, pady=(12, 4), anchor=tk.W)
+        status_label = ttk.Label(win, text="Соединение...")
+        status_label.pack(padx=16, pady=4, anchor=tk.W)
+        progress = ttk.Progressbar(win, mode="indeterminate", length=280)
+        progress.pack(padx=16, pady=4)
+        progress.start(15)
+
+        def on_cancel() -> None:
+            job.cancel()
+            win.destroy()
+
+        ttk.Button(win, text="Отмена", command=on_cancel).pack(pady=(4, 12))
+        win.protocol("WM_DELETE_WINDOW", on_cancel)
+
+        def poll() -> None:
+            if not win.winfo_exists():
+                return
+            if not job.done.is_set():
+                status_label.config(text=f"Получено партий: {job.count}")
+                win.after(100, poll)
+                return
+            win.destroy()
+            if job.error:
+                messagebox.showerror("Ошибка сети", f"Не удалось загрузить {job.title}: {job.error}")
+            elif job.path is None:
+                messagebox.showinfo("Импорт с Lichess", "Партий не найдено.")
+            else:
+                self.open_pgn_file(job.path)
+
+        poll()
 
     def save_pgn_with_annotations(self) -> None:
         if not self.current_game_node:
@@ -614,8 +851,13 @@ class ChessAnalyzerApp:
         messagebox.showinfo("FEN Скопирован", "Текущий FEN скопирован в буфер обмена.")
 
     def reset_to_new_game(self, game_node: chess.pgn.GameNode, preserve_orientation: bool = True) -> None:
+        self.stop_live_analysis()
+        self.end_play_session()
+        self.game_clock = None
+        self.clock_label.config(text="")
         self.current_game_node = game_node
-        self.board_state = game_node.board()
+        self.positions.reset(game_node.game())
+        self.board_state = self.positions.board(game_node)
         if not preserve_orientation:
             self.board_orientation_white_pov = True
         self.game_mode = "analysis"
@@ -643,6 +885,7 @@ class ChessAnalyzerApp:
 
         captured = self.board_state.is_capture(move) or self.board_state.is_en_passant(move)
         animated_piece_symbol = self.get_animated_piece_symbol(move)
+        mover = self.board_state.turn
 
         if self.current_game_node is None:
             game = chess.pgn.Game()
@@ -654,44 +897,58 @@ class ChessAnalyzerApp:
         self._set_active_node(new_node, is_forward_move=True, move_to_animate=move,
                               captured=captured, animated_piece_symbol=animated_piece_symbol)
 
-        if self.game_mode == "play_engine" and not self.board_state.is_game_over():
-            self.root.after(500, self.make_engine_move)
-
-    def make_engine_move(self) -> None:
-        if self.is_animating or self.board_state.is_game_over() or not self.engine or not self.engine.process:
+        if self.game_mode != "play_engine" or self.play_session is None:
+            return
+        if self.board_state.is_game_over():
+            self.end_play_session()
+            return
+        if mover == self.user_color:
+            # Часы переключаются сразу, а движок получает позицию, не дожидаясь конца анимации
+            if self.game_clock is not None:
+                self.game_clock.press(mover)
+            self.play_session.request_move(self.board_state)
+
+    def apply_engine_move(self, fen: str, best_move_uci: str) -> None:
+        if self.game_mode != "play_engine" or self.board_state.fen() != fen:
             return
+        try:
+            move = chess.Move.from_uci(best_move_uci)
+        except ValueError:
+            return
+        if not self.board_state.is_legal(move):
+            return
+        if self.is_animating:
+            # Ответ пришёл раньше, чем доигралась анимация хода человека
+            self.pending_engine_move = move
+            return
+        self.make_user_move(move)
 
-        def find_and_make_move():
-            _, best_move_uci = self.engine.get_analysis(movetime_ms=self.engine_time_var.get())
-            if best_move_uci:
-                try:
-                    move = chess.Move.from_uci(best_move_uci)
-                except Exception:
-                    return
-                if self.board_state.is_legal(move):
-                    self.root.after(0, lambda: self.make_user_move(move))
+    def check_puzzle_move(self, user_move: chess.Move) -> None:
+        fen = self.board_state.fen()
+        board = self.board_state.copy()
+        game_key = self.current_game_key()
+        movetime = self.engine_time_var.get()
 
-        threading.Thread(target=find_and_make_move, daemon=True).start()
+        def find_best(engine: EngineHandler, cancel: StopSignal) -> Optional[str]:
+            engine.set_position_from_board(board, game_key)
+            _, best_move_uci = engine.get_analysis(movetime_ms=movetime, stop_event=cancel)
+            return best_move_uci
 
-    def check_puzzle_move(self, user_move: chess.Move) -> None:
-        def check_in_thread():
-            _, best_move_uci = self.engine.get_analysis(movetime_ms=self.engine_time_var.get())
+        def show_result(best_move_uci: Optional[str]) -> None:
             try:
                 best_move = chess.Move.from_uci(best_move_uci)
             except Exception:
                 best_move = None
 
-            def show_result():
-                if best_move and user_move == best_move:
-                    messagebox.showinfo("Правильно!", f"Отличный ход! {self.board_state.san(user_move)}")
-                    self.make_user_move(user_move)
-                else:
-                    bm = self.board_state.san(best_move) if best_move else "N/A"
-                    messagebox.showwarning("Неверно", f"Неправильный ход. Лучшим ходом был {bm}.")
-
-            self.root.after(0, show_result)
+            if best_move and user_move == best_move:
+                messagebox.showinfo("Правильно!", f"Отличный ход! {self.board_state.san(user_move)}")
+                self.make_user_move(user_move)
+            else:
+                bm = self.board_state.san(best_move) if best_move else "N/A"
+                messagebox.showwarning("Неверно", f"Неправильный ход. Лучшим ходом был {bm}.")
 
-        threading.Thread(target=check_in_thread, daemon=True).start()
+        self.engine_scheduler.submit("puzzle", PRIORITY_PLAY, fen, find_best,
+                                     on_done=lambda r: self.root.after(0, lambda: show_result(r)))
 
     # ------------------ Полный анализ партии ------------------
     def start_full_game_analysis(self) -> None:
@@ -710,93 +967,54 @@ class ChessAnalyzerApp:
 
         threading.Thread(target=self._run_full_game_analysis, daemon=True).start()
 
+    def game_analysis_limits(self) -> SearchLimits:
+        # Время остаётся верхней границей, даже если задана глубина
+        depth = self.engine_depth_var.get()
+        return SearchLimits(movetime_ms=self.engine_time_var.get(), depth=depth or None,
+                            stable_depths=STABLE_STOP_DEPTHS if self.engine_stable_stop_var.get() else None)
+
     def _run_full_game_analysis(self) -> None:
         game = self.current_game_node.game()
-        nodes = list(game.mainline())
-        total_moves = len(nodes)
-        self.evaluation_history = []
-
-        board = game.board()
-
-        for i, node in enumerate(nodes):
-            fen_before = board.fen()
-            if self.engine and self.engine.process:
-                self.engine.set_position_from_fen(fen_before)
-                analysis_before, _ = self.engine.get_analysis(movetime_ms=self.engine_time_var.get())
-            else:
-                analysis_before = []
-
-            if analysis_before and analysis_before[0].get('move_uci'):
-                score_obj = analysis_before[0]
-                score_cp = score_obj.get('score_cp')
-
-                best_move_san = "N/A"
-                try:
-                    engine_move = chess.Move.from_uci(score_obj.get('move_uci'))
-                    if board.is_legal(engine_move):
-                        best_move_san = board.san(engine_move)
-                except Exception:
-                    pass
-
-                board.push(node.move)
-
-                if score_cp is not None:
-                    current_player_score = score_cp if board.turn != chess.WHITE else -score_cp
-                    self.evaluation_history.append(current_player_score)
-
-                    fen_after = board.fen()
-                    if self.engine and self.engine.process:
-                        self.engine.set_position_from_fen(fen_after)
-                        analysis_after, _ = self.engine.get_analysis(movetime_ms=max(200, self.engine_time_var.get() // 4))
-                    else:
-                        analysis_after = []
-
-                    if analysis_after and analysis_after[0].get('score_cp') is not None:
-                        score_after_cp = analysis_after[0]['score_cp']
-                        next_player_score = score_after_cp if board.turn == chess.WHITE else -score_after_cp
-
-                        eval_loss = current_player_score - (-next_player_score)
-
-                        comment = f"[%eval {current_player_score/100.0:.2f}] Лучший ход был {best_move_san}."
-
-                        if eval_loss > 250: comment += " (Зевок ??)"
-                        elif eval_loss > 120: comment += " (Ошибка ?)"
-                        elif eval_loss > 60: comment += " (Неточность ?!)"
-
-                        node.comment = comment
-                else:
-                    mate_score = 10000 if score_obj.get('score_mate', 0) > 0 else -10000
-                    self.evaluation_history.append(mate_score if board.turn != chess.WHITE else -mate_score)
-            else:
-                board.push(node.move)
 
-            progress = (i + 1) / total_moves * 100
+        def on_progress(done: int, total: int) -> None:
+            progress = done / total * 100
             self.root.after(0, lambda p=progress: self.progress_bar.config(value=p))
 
+        results = analyse_mainline(self.engine_scheduler, game, self.game_analysis_limits(),
+                                   on_progress=on_progress, tablebase=self.tablebase,
+                                   book=self.opening_book)
+
         def finish_analysis():
+            self.evaluation_history = apply_analysis(game, results)
             self.analysis_progress_win.destroy()
-            self.populate_moves_listbox()
+            self.refresh_move_rows()
             self.update_evaluation_graph()
             messagebox.showinfo("Анализ завершен", "Анализ партии окончен. Результаты добавлены в комментарии и на график.")
 
         self.root.after(0, finish_analysis)
 
     def show_threat(self) -> None:
-        if self.is_animating or self.board_state.is_game_over():
+        if self.is_animating or self.board_state.is_game_over() or not self.engine_pool.available:
             return
 
-        def get_threat_in_thread():
-            if not self.engine or not self.engine.process:
+        fen = self.board_state.fen()
+        board = self.board_state.copy()
+        game_key = self.current_game_key()
+
+        def find_threat(engine: EngineHandler, cancel: StopSignal) -> Optional[str]:
+            return engine.get_threat(board, stop_event=cancel, game_key=game_key)
+
+        def on_threat(threat_uci: Optional[str]) -> None:
+            if not threat_uci or self.board_state.fen() != fen:
                 return
-            threat_uci = self.engine.get_threat(self.board_state.fen())
-            if threat_uci:
-                try:
-                    m = self.board_state.parse_uci(threat_uci)
-                    self.threat_move_obj = m
-                    self.root.after(0, self._draw_move_arrows)
-                except Exception:
-                    self.threat_move_obj = None
-        threading.Thread(target=get_threat_in_thread, daemon=True).start()
+            try:
+                self.threat_move_obj = self.board_state.parse_uci(threat_uci)
+                self._draw_move_arrows()
+            except Exception:
+                self.threat_move_obj = None
+
+        self.engine_scheduler.submit("threat", PRIORITY_THREAT, fen, find_threat,
+                                     on_done=lambda r: self.root.after(0, lambda: on_threat(r)))
 
     # ------------------ Взаимодействие с мышью ------------------
     def on_mouse_move(self, event: tk.Event) -> None:
@@ -815,12 +1033,11 @@ class ChessAnalyzerApp:
         self.board_canvas.configure(cursor="hand2" if can_move_now else "arrow")
 
         if self.is_dragging and self.drag_image_id is not None:
-            x = event.x - SQUARE_SIZE // 2
-            y = event.y - SQUARE_SIZE // 2
-            self.board_canvas.coords(self.drag_image_id, x, y)
+            self.board_renderer.move_floating(event.x - self.square_size // 2, event.y - self.square_size // 2)
 
     def on_mouse_down(self, event: tk.Event) -> None:
-        if self.is_animating or self.board_state.is_game_over():
+        self.animator.finish()
+        if self.board_state.is_game_over():
             return
         if self.game_mode == "play_engine" and self.board_state.turn != self.user_color:
             return
@@ -837,21 +1054,16 @@ class ChessAnalyzerApp:
         self.is_dragging = True
         self.drag_from_square = sq
         self.highlight_legal_moves(sq)
-        symbol = piece.symbol()
-        img = self.piece_images.get(symbol)
-        if img:
-            x = event.x - SQUARE_SIZE // 2
-            y = event.y - SQUARE_SIZE // 2
-            self.drag_image_id = self.board_canvas.create_image(x, y, image=img, anchor=tk.NW, tags="dragging")
-            self.board_canvas.delete(f"piece_at_{sq}")
+        self.drag_image_id = self.board_renderer.show_floating(piece.symbol(), event.x - self.square_size // 2,
+                                                               event.y - self.square_size // 2)
+        if self.drag_image_id is not None:
+            self.board_renderer.hide_square(sq)
         self.board_canvas.configure(cursor="hand2")
 
     def on_mouse_drag(self, event: tk.Event) -> None:
         if not self.is_dragging or self.drag_image_id is None:
             return
-        x = event.x - SQUARE_SIZE // 2
-        y = event.y - SQUARE_SIZE // 2
-        self.board_canvas.coords(self.drag_image_id, x, y)
+        self.board_renderer.move_floating(event.x - self.square_size // 2, event.y - self.square_size // 2)
 
     def on_mouse_up(self, event: tk.Event) -> None:
         if self.is_dragging:
@@ -874,7 +1086,7 @@ class ChessAnalyzerApp:
         self.is_dragging = False
         self.drag_from_square = None
         if self.drag_image_id is not None:
-            self.board_canvas.delete(self.drag_image_id)
+            self.board_renderer.hide_floating()
         self.drag_image_id = None
         self.clear_highlighted_squares()
         self.board_canvas.configure(cursor="arrow")
@@ -917,14 +1129,12 @@ class ChessAnalyzerApp:
             self._set_active_node(target_node, is_forward_move=False, move_to_animate=move_to_undo, animated_piece_symbol=animated_piece)
 
     def on_move_select_from_listbox(self, event: tk.Event) -> None:
-        if self.is_animating or not event.widget.curselection():
+        if not event.widget.curselection():
             return
 
-        selected_idx = event.widget.curselection()[0]
-        if 0 <= selected_idx < len(self.move_nodes_in_listbox):
-            target_node = self.move_nodes_in_listbox[selected_idx]
-            if target_node != self.current_game_node:
-                self._set_active_node(target_node)
+        target_node = self.move_list.node_at(event.widget.curselection()[0])
+        if target_node is not None and target_node != self.current_game_node:
+            self._set_active_node(target_node)
 
     def show_annotation_menu(self, event: tk.Event) -> None:
         selection = self.moves_listbox.curselection()
@@ -935,7 +1145,7 @@ class ChessAnalyzerApp:
         if selected_idx == 0:
             return
 
-        node_to_annotate = self.move_nodes_in_listbox[selected_idx]
+        node_to_annotate = self.move_list.node_at(selected_idx)
 
         menu = tk.Menu(self.root, tearoff=0)
         nags = {
@@ -953,92 +1163,170 @@ class ChessAnalyzerApp:
 
     def add_nag_annotation(self, node: chess.pgn.GameNode, nag_code: int) -> None:
         node.nags.add(nag_code)
-        self.populate_moves_listbox()
+        self.refresh_move_rows([node])
 
     def add_text_comment(self, node: chess.pgn.GameNode) -> None:
         comment = simpledialog.askstring("Комментарий", "Введите ваш комментарий:", initialvalue=node.comment, parent=self.root)
         if comment is not None:
             node.comment = comment
-            self.populate_moves_listbox()
+            self.refresh_move_rows([node])
 
     def clear_annotations(self, node: chess.pgn.GameNode) -> None:
         node.nags.clear()
         node.comment = ""
-        self.populate_moves_listbox()
+        self.refresh_move_rows([node])
 
     # ------------------ Анализ текущей позиции ------------------
+    def schedule_analysis(self) -> None:
+        # При быстрой перемотке движок не запускается на каждой промежуточной позиции — только на той, где остановились
+        if self._analysis_after is not None:
+            self.root.after_cancel(self._analysis_after)
+            self._analysis_after = None
+        if self.animator.rapid:
+            self._analysis_after = self.root.after(self.animator.duration_ms, self._run_scheduled_analysis)
+        else:
+            self.request_analysis_current_pos()
+
+    def _run_scheduled_analysis(self) -> None:
+        self._analysis_after = None
+        self.animator.rapid = False
+        self.request_analysis_current_pos()
+
     def request_analysis_current_pos(self) -> None:
-        if self.is_animating or not self.engine or not self.engine.process or self.board_state.is_game_over():
+        if self.is_animating or self.board_state.is_game_over():
             return
 
-        self.clear_evaluation_display()
         current_fen = self.board_state.fen()
-        threading.Thread(target=self._run_engine_analysis, args=(current_fen,), daemon=True).start()
+        # Эндшпиль из базы: точный ответ сразу, движок не нужен
+        tb_lines = self.tablebase.probe(self.board_state, multipv=self.engine_multipv_var.get())
+        if tb_lines:
+            self.stop_live_analysis()
+            self.clear_evaluation_display()
+            self.analysis_queue.put((tb_lines, current_fen))
+            return
+        if not self.engine_pool.available:
+            return
 
-    def _run_engine_analysis(self, fen_string: str) -> None:
-        try:
-            self.engine.set_position_from_fen(fen_string)
-            analysis_lines, _ = self.engine.get_analysis(movetime_ms=self.engine_time_var.get())
-            self.analysis_queue.put((analysis_lines, fen_string))
-        except Exception as e:
-            print("Engine analysis error:", e)
+        self.clear_evaluation_display()
+        board = self.board_state.copy()
+        game_key = self.current_game_key()
+
+        def stream(engine: EngineHandler, cancel: StopSignal) -> None:
+            engine.set_position_from_board(board, game_key)
+            for analysis_lines in engine.iter_analysis(cancel):
+                self.analysis_queue.put((analysis_lines, current_fen))
+
+        # Новый запрос вытесняет анализ предыдущей позиции, повтор для той же позиции склеивается
+        self.engine_scheduler.submit("analysis", PRIORITY_INTERACTIVE, current_fen, stream, supersede=True)
+
+    def current_game_key(self) -> Optional[int]:
+        # Одна и та же партия — один ключ: движки не сбрасывают хэш при переходе между её ходами
+        return id(self.current_game_node.game()) if self.current_game_node is not None else None
+
+    def stop_live_analysis(self) -> None:
+        self.engine_scheduler.cancel_kind("analysis")
 
     def process_analysis_queue(self) -> None:
+        latest_lines = None
         try:
-            analysis_lines, analyzed_fen = self.analysis_queue.get_nowait()
-
-            if self.board_state.fen() != analyzed_fen or self.is_animating:
-                self.root.after(100, self.process_analysis_queue); return
-
-            if analysis_lines:
-                for item in self.eval_tree.get_children():
-                    self.eval_tree.delete(item)
-
-                for line in analysis_lines:
-                    move_uci = line.get('move_uci')
-                    if not move_uci or move_uci == "(none)":
-                        continue
-
-                    try:
-                        move = self.board_state.parse_uci(move_uci)
-                        move_san = self.board_state.san(move)
-
-                        eval_text = ""
-                        if line.get('score_mate') is not None:
-                            mate_val = line['score_mate'] if self.board_state.turn == chess.WHITE else -line['score_mate']
-                            eval_text = f"Мат в {abs(line['score_mate'])}"
-                        elif line.get('score_cp') is not None:
-                            cp_val = line['score_cp'] if self.board_state.turn == chess.WHITE else -line['score_cp']
-                            eval_text = f"{cp_val / 100.0:+.2f}"
-
-                        self.eval_tree.insert('', 'end', values=(line['pv'], move_san, eval_text))
-                    except Exception:
-                        continue
-
-                first_line = analysis_lines[0]
-                self.update_eval_bar(first_line.get('score_cp'), first_line.get('score_mate'))
-                self._draw_move_arrows()
-
+            while True:
+                analysis_lines, analyzed_fen = self.analysis_queue.get_nowait()
+                if analyzed_fen == self.board_state.fen():
+                    latest_lines = analysis_lines
         except queue.Empty:
             pass
+
+        try:
+            if latest_lines and not self.is_animating:
+                self.show_analysis_lines(latest_lines)
         finally:
-            self.root.after(100, self.process_analysis_queue)
+            self.update_pool_status()
+            self.root.after(50, self.process_analysis_queue)
+
+    def show_analysis_lines(self, analysis_lines: List[InfoLine]) -> None:
+        for item in self.eval_tree.get_children():
+            self.eval_tree.delete(item)
+        self.analysis_lines = analysis_lines
+        self.analysis_fen = self.board_state.fen()
+
+        for line in analysis_lines:
+            move_uci = line.move_uci
+            if not move_uci or move_uci == "(none)":
+                continue
+
+            try:
+                move = self.board_state.parse_uci(move_uci)
+                move_san = self.board_state.san(move)
+
+                eval_text = ""
+                if line.source == "tablebase" and line.wdl is not None:
+                    if line.wdl[1] == 1000:
+                        eval_text = "Ничья (база)"
+                    else:
+                        white_wins = (line.wdl[0] == 1000) == (self.board_state.turn == chess.WHITE)
+                        eval_text = "Белые выигр. (база)" if white_wins else "Черные выигр. (база)"
+                elif line.score_mate is not None:
+                    eval_text = f"Мат в {abs(line.score_mate)}"
+                elif line.score_cp is not None:
+                    cp_val = line.score_cp if self.board_state.turn == chess.WHITE else -line.score_cp
+                    eval_text = f"{cp_val / 100.0:+.2f}"
+
+                self.eval_tree.insert('', 'end', values=(line.multipv, move_san, eval_text))
+            except Exception:
+                continue
+
+        # Движок даёт оценку за сторону, которая ходит; полоса рисуется в пользу белых
+        first_line = analysis_lines[0]
+        sign = 1 if self.board_state.turn == chess.WHITE else -1
+        score_cp = first_line.score_cp
+        score_mate = first_line.score_mate
+        self.update_eval_bar(score_cp * sign if score_cp is not None else None,
+                             score_mate * sign if score_mate is not None else None)
+        self._draw_move_arrows()
+
+    def update_pool_status(self) -> None:
+        if self.engine_pool.booting:
+            self.pool_status_label.config(text="Движки: запуск…")
+            return
+        if not self.engine_pool.available:
+            self.pool_status_label.config(text="Движки: недоступны")
+            return
+        st = self.engine_pool.stats()
+        text = f"Движки: занято {st['busy']} из {st['size']}"
+        profiles = self.engine_pool.profiles
+        active = sorted(set(st['active_profiles']))
+        if active:
+            text += " (" + "; ".join(profiles[name].describe() for name in active) + ")"
+        pending = self.engine_scheduler.stats()['pending']
+        if pending:
+            text += f", в очереди: {pending}"
+        if st['restarts']:
+            text += f", перезапусков: {st['restarts']}"
+        cache_hits = self.eval_cache.stats()['hits']
+        if cache_hits:
+            text += f", из кэша: {cache_hits}"
+        if self.tablebase.hits:
+            text += f", из базы: {self.tablebase.hits}"
+        self.pool_status_label.config(text=text)
 
     # ------------------ Координаты ------------------
     def get_square_coords(self, square_index: int) -> tuple[int, int]:
         file = chess.square_file(square_index)
         rank = chess.square_rank(square_index)
         if self.board_orientation_white_pov:
-            x, y = file * SQUARE_SIZE, (7 - rank) * SQUARE_SIZE
+            col, row = file, 7 - rank
         else:
-            x, y = (7 - file) * SQUARE_SIZE, rank * SQUARE_SIZE
-        return x, y
+            col, row = 7 - file, rank
+        return self.board_origin[0] + col * self.square_size, self.board_origin[1] + row * self.square_size
 
     def get_square_from_coords(self, x: int, y: int) -> Optional[int]:
-        if x < 0 or y < 0 or x >= BOARD_IMG_WIDTH or y >= BOARD_IMG_HEIGHT:
+        x -= self.board_origin[0]
+        y -= self.board_origin[1]
+        board_px = self.square_size * 8
+        if x < 0 or y < 0 or x >= board_px or y >= board_px:
             return None
-        file = int(x // SQUARE_SIZE)
-        rank = int(y // SQUARE_SIZE)
+        file = int(x // self.square_size)
+        rank = int(y // self.square_size)
         if self.board_orientation_white_pov:
             file, rank = file, 7 - rank
         else:
@@ -1052,13 +1340,22 @@ class ChessAnalyzerApp:
                          move_to_animate: Optional[chess.Move] = None, captured: bool = False,
                          animated_piece_symbol: Optional[str] = None) -> None:
 
-        if self.is_animating or target_node is None:
+        if target_node is None:
+            return
+        # Новое действие не ждёт анимацию предыдущего хода — она доигрывается мгновенно.
+        # Если при этом применился отложенный ход движка, цель перехода устарела
+        node_before = self.current_game_node
+        self.animator.finish()
+        if self.current_game_node is not node_before:
             return
 
+        self.stop_live_analysis()
         self.current_game_node = target_node
-        self.board_state = self.current_game_node.board()
+        self.board_state = self.positions.board(target_node)
 
-        if move_to_animate:
+        if move_to_animate and not self.animator.note_input():
+            self._finalize_animation_and_update(played_sound=True)
+        elif move_to_animate:
             self.update_board_display(move_to_animate=move_to_animate, captured=captured,
                                       is_reverse_animation=(not is_forward_move),
                                       animated_piece_symbol=animated_piece_symbol)
@@ -1072,52 +1369,45 @@ class ChessAnalyzerApp:
         start_x, start_y = self.get_square_coords(from_sq)
         end_x, end_y = self.get_square_coords(to_sq)
 
-        animated_image = self.piece_images.get(piece_symbol)
-        if not animated_image:
+        animating_piece_id = self.board_renderer.show_floating(piece_symbol, start_x, start_y)
+        if animating_piece_id is None:
             self._finalize_animation_and_update(); return
 
-        animating_piece_id = self.board_canvas.create_image(start_x, start_y, anchor=tk.NW, image=animated_image, tags="anim_piece")
-        self.board_canvas.tag_raise(animating_piece_id)
-
-        self.board_canvas.delete(f"piece_at_{from_sq}")
+        self.board_renderer.hide_square(from_sq)
         if not is_reverse_animation and captured:
-            self.board_canvas.delete(f"piece_at_{to_sq}")
+            self.board_renderer.hide_square(to_sq)
 
-        dx, dy = (end_x - start_x) / ANIMATION_STEPS, (end_y - start_y) / ANIMATION_STEPS
+        def frame(t: float) -> None:
+            self.board_renderer.move_floating(start_x + (end_x - start_x) * t, start_y + (end_y - start_y) * t)
 
-        def animation_step(step):
-            if step <= ANIMATION_STEPS:
-                self.board_canvas.move(animating_piece_id, dx, dy)
-                self.root.after(ANIMATION_DELAY, lambda: animation_step(step + 1))
-            else:
-                self.board_canvas.delete(animating_piece_id)
-                self._finalize_animation_and_update(played_sound=is_reverse_animation, captured=captured)
+        def done() -> None:
+            self.board_renderer.hide_floating()
+            self._finalize_animation_and_update(played_sound=is_reverse_animation, captured=captured)
+
+        self.animator.start(frame, done)
 
-        animation_step(1)
+    @property
+    def is_animating(self) -> bool:
+        return self.animator.active
 
     def _finalize_animation_and_update(self, played_sound: bool = False, captured: bool = False) -> None:
-        self.is_animating = False
         if not played_sound: self.play_sound(captured)
         self.update_board_display()
         self.update_info_panel()
         self.update_navigation_buttons()
+        if self.pending_engine_move is not None:
+            move, self.pending_engine_move = self.pending_engine_move, None
+            if self.board_state.is_legal(move):
+                self.make_user_move(move)
 
     def play_sound(self, captured: bool) -> None:
-        if not getattr(self, "sound_enabled", False): return
+        if not self.init_sound(): return
         try:
             sound = self.capture_sound if captured else self.move_sound
             if sound: sound.play()
         except Exception as e:
             print(f"Ошибка воспроизведения звука: {e}")
 
-    def draw_arrow(self, from_sq: int, to_sq: int, color: str, width: int, tag: str) -> None:
-        x1, y1 = self.get_square_coords(from_sq)
-        x2, y2 = self.get_square_coords(to_sq)
-        center_offset = SQUARE_SIZE / 2
-        self.board_canvas.create_line(x1 + center_offset, y1 + center_offset,
-                                      x2 + center_offset, y2 + center_offset,
-                                      arrow=tk.LAST, fill=color, width=width, tags=(tag, "arrow"))
-
     def update_navigation_buttons(self) -> None:
         if self.current_game_node:
             self.prev_move_button.config(state=tk.NORMAL if self.current_game_node.parent else tk.DISABLED)
@@ -1127,25 +1417,65 @@ class ChessAnalyzerApp:
             self.next_move_button.config(state=tk.DISABLED)
 
     def flip_board(self) -> None:
-        if self.is_animating: return
+        self.animator.finish()
         self.board_orientation_white_pov = not self.board_orientation_white_pov
         self.clear_highlighted_squares()
         self.selected_square_for_move = None
+        self.board_renderer.relayout()
         self.update_board_display()
 
+    # ------------------ Размер доски ------------------
+    def on_board_resize(self, event: tk.Event) -> None:
+        square_size = max(MIN_SQUARE_SIZE, min(event.width, event.height) // 8)
+        origin = ((event.width - square_size * 8) // 2, (event.height - square_size * 8) // 2)
+        origin = (max(0, origin[0]), max(0, origin[1]))
+        if square_size != self.square_size or origin != self.board_origin:
+            # Пока край окна тянут — быстрый фильтр; качественные спрайты, когда размер устоится
+            self.apply_board_size(square_size, origin, quality=False)
+        if self._resize_job is not None:
+            self.root.after_cancel(self._resize_job)
+        self._resize_job = self.root.after(BOARD_RESIZE_SETTLE_MS, self._settle_board_size)
+
+    def _settle_board_size(self) -> None:
+        self._resize_job = None
+        if self.is_animating or self.is_dragging:
+            self._resize_job = self.root.after(BOARD_RESIZE_SETTLE_MS, self._settle_board_size)
+            return
+        self.apply_board_size(self.square_size, self.board_origin, quality=True)
+
+    def apply_board_size(self, square_size: int, origin: tuple, quality: bool) -> None:
+        pieces, board_image = self.sprites.get(square_size, quality)
+        self.square_size = square_size
+        self.board_origin = origin
+        # Словарь общий с BoardRenderer — обновляется на месте
+        self.piece_images.update(pieces)
+        self.board_bg_image = board_image
+        if self.board_bg_item is not None and board_image is not None:
+            self.board_canvas.itemconfigure(self.board_bg_item, image=board_image)
+            self.board_canvas.coords(self.board_bg_item, *origin)
+        self.board_renderer.square_size = square_size
+        self.board_renderer.relayout()
+        if self.hint_overlay_items:
+            # Подсказки и подсветки привязаны к размеру — строятся заново
+            self.board_canvas.delete("hint_overlay")
+            self.hint_overlay_items = []
+            self._show_board_hints(self.board_only_mode)
+        if self.selected_square_for_move is not None:
+            self.highlight_legal_moves(self.selected_square_for_move)
+
     # ------------------ Подсветки ------------------
     def highlight_legal_moves(self, from_square: int) -> None:
         self.clear_highlighted_squares()
         x, y = self.get_square_coords(from_square)
-        self.board_canvas.create_rectangle(x, y, x + SQUARE_SIZE, y + SQUARE_SIZE, outline="#FFD700", width=4, tags="highlight_selected")
+        self.board_canvas.create_rectangle(x, y, x + self.square_size, y + self.square_size, outline="#FFD700", width=4, tags="highlight_selected")
 
         for move in self.board_state.legal_moves:
             if move.from_square == from_square:
                 to_x, to_y = self.get_square_coords(move.to_square)
-                radius = SQUARE_SIZE / 6
+                radius = self.square_size / 6
                 fill_color = "#FF6060" if self.board_state.is_capture(move) else "#A0A0A0"
-                self.board_canvas.create_oval(to_x + SQUARE_SIZE/2 - radius, to_y + SQUARE_SIZE/2 - radius,
-                                              to_x + SQUARE_SIZE/2 + radius, to_y + SQUARE_SIZE/2 + radius,
+                self.board_canvas.create_oval(to_x + self.square_size/2 - radius, to_y + self.square_size/2 - radius,
+                                              to_x + self.square_size/2 + radius, to_y + self.square_size/2 + radius,
                                               fill=fill_color, outline="", tags="highlight")
 
     def clear_highlighted_squares(self) -> None:
@@ -1154,7 +1484,8 @@ class ChessAnalyzerApp:
     def clear_evaluation_display(self) -> None:
         for item in self.eval_tree.get_children():
             self.eval_tree.delete(item)
-        self.board_canvas.delete("best_move_arrow", "alt_move_arrow")
+        self.analysis_lines = []
+        self.board_renderer.clear_arrows("best_move", "alt_move", "pv")
 
     def get_best_moves_from_treeview(self) -> List[chess.Move]:
         moves = []
@@ -1229,12 +1560,12 @@ class ChessAnalyzerApp:
         self.eval_bar_canvas.tag_raise(self.eval_text)
 
     def update_engine_skill(self, event: Optional[Any] = None) -> None:
-        if self.engine and self.engine.process:
-            self.engine.set_skill_level(self.engine_skill_var.get())
+        self.engine_pool.set_skill_level(self.engine_skill_var.get())
 
     def update_engine_multipv(self, event: Optional[Any] = None) -> None:
-        if self.engine and self.engine.process:
-            self.engine.set_multi_pv(self.engine_multipv_var.get())
+        self.engine_pool.set_multi_pv(self.engine_multipv_var.get())
+        if self.engine_pool.available:
+            self.stop_live_analysis()
             self.request_analysis_current_pos()
 
     # ------------------ Режим "только доска" ------------------
@@ -1246,14 +1577,14 @@ class ChessAnalyzerApp:
                 self.menu_bar.entryconfig("Файл", state="disabled")
             except Exception:
                 pass
-            self._draw_board_hints()
+            self._show_board_hints(True)
         else:
             self.info_panel.pack(side=tk.RIGHT, fill=tk.BOTH, expand=False)
             try:
                 self.menu_bar.entryconfig("Файл", state="normal")
             except Exception:
                 pass
-            self.board_canvas.delete("hint_overlay")
+            self._show_board_hints(False)
         self.update_board_display()
 
     # ------------------ Помощь ------------------
@@ -1262,6 +1593,8 @@ class ChessAnalyzerApp:
             "Горячие клавиши:",
             "Space — режим только доски (toggle)",
             "← / → — перемотка ходов",
+            "Home / End — к началу / концу линии",
+            "G — перейти к полуходу",
             "F — перевернуть доску",
             "A — анализ текущей позиции",
             "T — показать угрозу"
@@ -1270,17 +1603,29 @@ class ChessAnalyzerApp:
 
     # ------------------ Закрытие ------------------
     def on_closing(self) -> None:
-        self.is_animating = False
-        if self.engine and self.engine.process:
-            self.engine.quit_engine()
-        if hasattr(self, "sound_enabled") and self.sound_enabled and pygame.mixer.get_init():
-            pygame.mixer.quit()
+        self.animator.cancel()
+        if self._analysis_after is not None:
+            self.root.after_cancel(self._analysis_after)
+        self.end_play_session()
+        self.engine_scheduler.shutdown()
+        self.engine_pool.shutdown()
+        self.eval_cache.close()
+        self.tablebase.close()
+        self.opening_book.close()
+        if self.lichess_client is not None:
+            self.lichess_client.close()
+        if self.sound_enabled:
+            import pygame
+            if pygame.mixer.get_init():
+                pygame.mixer.quit()
         self.root.destroy()
 
 if __name__ == "__main__":
+    timer = StartupTimer()
+    timer.mark("импорт")
     root = tk.Tk()
     if not ensure_assets_exist():
         messagebox.showwarning("Внимание", f"Директория ассетов '{ASSETS_DIR}' не найдена. Некоторые ресурсы будут заменены заглушками.")
-    app = ChessAnalyzerApp(root)
+    app = ChessAnalyzerApp(root, timer)
     root.mainloop()
 
@@ -0,0 +1,121 @@
+from typing import Optional, List, Dict, Tuple
+
+import chess
+import chess.pgn
+
+from position_table import PositionTable
+
+START_ROW_TEXT = "--- Начало ---"
+NAG_SYMBOLS = {1: '!', 2: '?', 3: '!!', 4: '??', 5: '!?', 6: '?!'}
+COMMENT_PREVIEW_CHARS = 40
+
+# (первая изменившаяся строка, новые тексты строк с неё до конца)
+RowsChange = Tuple[int, List[str]]
+
+
+def move_label(board: chess.Board, move: chess.Move) -> str:
+    # board — позиция до хода
+    san_move = board.san(move)
+    if board.turn == chess.WHITE:
+        return f"{board.fullmove_number}. {san_move}"
+    return f"{board.fullmove_number}... {san_move}"
+
+
+def decorate(label: str, node: chess.pgn.GameNode) -> str:
+    text = label
+    nags = "".join(NAG_SYMBOLS.get(nag, '') for nag in node.nags)
+    if nags:
+        text += f" {nags}"
+    if node.comment:
+        comment = node.comment
+        text += f" ({comment[:COMMENT_PREVIEW_CHARS]})" if len(comment) > COMMENT_PREVIEW_CHARS else f" ({comment})"
+    return text
+
+
+class MoveListModel:
+    # Строки списка ходов для текущей линии партии: путь от начала до выбранного узла и его главное продолжение.
+    # SAN считается один раз на узел; навигация внутри линии строки не трогает
+    def __init__(self, positions: Optional[PositionTable] = None) -> None:
+        self.positions = positions
+        self.game: Optional[chess.pgn.Game] = None
+        self.nodes: List[chess.pgn.GameNode] = []
+        self.texts: List[str] = []
+        self._rows: Dict[chess.pgn.GameNode, int] = {}
+        self._labels: Dict[chess.pgn.GameNode, str] = {}
+
+    def reset(self) -> None:
+        self.game = None
+        self.nodes, self.texts = [], []
+        self._rows.clear()
+        self._labels.clear()
+
+    def row_of(self, node: Optional[chess.pgn.GameNode]) -> Optional[int]:
+        return self._rows.get(node) if node is not None else None
+
+    def node_at(self, row: int) -> Optional[chess.pgn.GameNode]:
+        return self.nodes[row] if 0 <= row < len(self.nodes) else None
+
+    @staticmethod
+    def _line_through(node: chess.pgn.GameNode) -> List[chess.pgn.GameNode]:
+        line: List[chess.pgn.GameNode] = []
+        walker: Optional[chess.pgn.GameNode] = node
+        while walker is not None:
+            line.append(walker)
+            walker = walker.parent
+        line.reverse()
+        while node.variations:
+            node = node.variations[0]
+            line.append(node)
+        return line
+
+    def sync(self, current: chess.pgn.GameNode) -> Optional[RowsChange]:
+        # None — узел уже в списке, меняется только выделение
+        if current in self._rows:
+            return None
+        game = current.game()
+        if game is not self.game:
+            self.reset()
+            self.game = game
+
+        line = self._line_through(current)
+        start = 0
+        while start < min(len(line), len(self.nodes)) and line[start] is self.nodes[start]:
+            start += 1
+        for node in self.nodes[start:]:
+            self._rows.pop(node, None)
+
+        texts: List[str] = []
+        board: Optional[chess.Board] = None
+        for row in range(start, len(line)):
+            node = line[row]
+            self._rows[node] = row
+            if row == 0:
+                texts.append(START_ROW_TEXT)
+                continue
+            label = self._labels.get(node)
+            if label is None:
+                if board is None:
+                    board = (self.positions.board(node.parent, stack=False) if self.positions is not None
+                             else node.parent.board())
+                label = self._labels[node] = move_label(board, node.move)
+            if board is not None:
+                board.push(node.move)
+            texts.append(decorate(label, node))
+
+        self.nodes = line
+        self.texts = self.texts[:start] + texts
+        return start, texts
+
+    def refresh(self, nodes: Optional[List[chess.pgn.GameNode]] = None) -> List[Tuple[int, str]]:
+        # Пересчитать NAG и комментарии; возвращаются только строки, текст которых изменился
+        rows = range(1, len(self.nodes)) if nodes is None else [self._rows[n] for n in nodes if n in self._rows]
+        changed: List[Tuple[int, str]] = []
+        for row in rows:
+            if row == 0:
+                continue
+            node = self.nodes[row]
+            text = decorate(self._labels[node], node)
+            if text != self.texts[row]:
+                self.texts[row] = text
+                changed.append((row, text))
+        return changed
@@ -0,0 +1,91 @@
+import os
+import random
+import threading
+from typing import Optional, List, Tuple, Dict
+
+import chess
+import chess.polyglot
+
+from config import BOOK_PATHS
+
+
+def log_error(msg: str) -> None:
+    print(f"[OpeningBook ERROR] {msg}")
+
+
+def _book_files(paths: str) -> List[str]:
+    # Порядок в списке — приоритет; каталог раскрывается в свои .bin по алфавиту
+    files: List[str] = []
+    for entry in paths.split(os.pathsep):
+        if os.path.isdir(entry):
+            files.extend(os.path.join(entry, name) for name in sorted(os.listdir(entry)) if name.endswith(".bin"))
+        elif os.path.isfile(entry):
+            files.append(entry)
+    return files
+
+
+class OpeningBook:
+    def __init__(self, paths: Optional[str] = BOOK_PATHS) -> None:
+        self._readers: List[chess.polyglot.MemoryMappedReader] = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        for path in _book_files(paths) if paths else []:
+            try:
+                self._readers.append(chess.polyglot.open_reader(path))
+            except (OSError, ValueError) as e:
+                log_error(f"Не удалось открыть книгу {path}: {e}")
+
+    @property
+    def available(self) -> bool:
+        return bool(self._readers)
+
+    def _entries(self, board: chess.Board) -> List[Tuple[chess.Move, int, int]]:
+        # Ход из нескольких книг берёт вес из самой приоритетной; порядок — по приоритету книги, затем по весу
+        if not self._readers:
+            return []
+        merged: Dict[chess.Move, Tuple[int, int]] = {}
+        with self._lock:
+            for priority, reader in enumerate(self._readers):
+                try:
+                    for entry in reader.find_all(board):
+                        if entry.move not in merged and entry.weight > 0:
+                            merged[entry.move] = (priority, entry.weight)
+                except (OSError, ValueError) as e:
+                    log_error(f"Ошибка чтения книги: {e}")
+        ranked = sorted(merged.items(), key=lambda item: (item[1][0], -item[1][1]))
+        return [(move, priority, weight) for move, (priority, weight) in ranked]
+
+    def moves(self, board: chess.Board) -> List[Tuple[chess.Move, int]]:
+        return [(move, weight) for move, _, weight in self._entries(board)]
+
+    def is_book_move(self, board: chess.Board, move: chess.Move) -> bool:
+        return any(book_move == move for book_move, _, _ in self._entries(board))
+
+    def choose(self, board: chess.Board, rng: Optional[random.Random] = None) -> Optional[chess.Move]:
+        # Случайный ход с вероятностью по весу — движок не играет каждый раз один и тот же дебют.
+        # Выбираем среди ходов самой приоритетной книги, которая знает позицию
+        entries = self._entries(board)
+        if not entries:
+            return None
+        top_priority = entries[0][1]
+        candidates = [(move, weight) for move, priority, weight in entries if priority == top_priority]
+        moves, weights = zip(*candidates)
+        self.hits += 1
+        return (rng or random).choices(moves, weights=weights, k=1)[0]
+
+    def book_plies(self, game_board: chess.Board, moves: List[chess.Move], max_plies: int) -> int:
+        # Сколько первых полуходов партии сыграно по книге
+        board = game_board.copy(stack=False)
+        count = 0
+        for move in moves[:max_plies]:
+            if not self.is_book_move(board, move):
+                break
+            board.push(move)
+            count += 1
+        return count
+
+    def close(self) -> None:
+        with self._lock:
+            for reader in self._readers:
+                reader.close()
+            self._readers = []
@@ -0,0 +1,220 @@
+import tkinter as tk
+from tkinter import ttk, Toplevel
+from typing import Optional, Callable, List, Tuple
+
+from pgn_index import PgnIndex, GameFilter, GameEntry
+
+# (столбец индекса, заголовок, ширина)
+BROWSER_COLUMNS = (
+    ("white", "Белые", 150),
+    ("black", "Черные", 150),
+    ("white_elo", "Эло б.", 55),
+    ("black_elo", "Эло ч.", 55),
+    ("result", "Результат", 70),
+    ("date", "Дата", 85),
+    ("eco", "ECO", 45),
+    ("event", "Турнир", 160),
+)
+RESULT_CHOICES = ("", "1-0", "0-1", "1/2-1/2", "*")
+
+
+class PgnBrowserWindow:
+    # Виртуальный список: в Treeview только видимые строки, остальное — запросы к индексу по смещению
+    def __init__(self, parent: tk.Misc, index: PgnIndex, on_select: Callable[[GameEntry], None]) -> None:
+        self.index = index
+        self.on_select = on_select
+        self.game_filter = GameFilter()
+        self.order_by = "id"
+        self.descending = False
+        self.top = 0
+        self.total = 0
+        self.page_size = 20
+        self.selected_id: Optional[int] = None
+        self._filter_job: Optional[str] = None
+        self._poll_job: Optional[str] = None
+
+        self.win = Toplevel(parent)
+        self.win.title("Выберите партию")
+        self.win.geometry("900x560")
+        self._build_filters()
+
+        frame = ttk.Frame(self.win)
+        frame.pack(padx=10, pady=(0, 6), fill=tk.BOTH, expand=True)
+        self.tree = ttk.Treeview(frame, columns=[c[0] for c in BROWSER_COLUMNS], show='headings',
+                                 selectmode='browse', height=self.page_size)
+        for column, title, width in BROWSER_COLUMNS:
+            self.tree.heading(column, text=title, command=lambda c=column: self.sort_by(c))
+            self.tree.column(column, width=width, stretch=column in ("white", "black", "event"))
+        self.scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        bottom = ttk.Frame(self.win)
+        bottom.pack(padx=10, pady=(0, 10), fill=tk.X)
+        self.status_label = ttk.Label(bottom, text="")
+        self.status_label.pack(side=tk.LEFT)
+        ttk.Button(bottom, text="Загрузить", command=self._load_selected).pack(side=tk.RIGHT)
+
+        self.tree.bind("<Double-1>", lambda e: self._load_selected())
+        self.tree.bind("<Return>", lambda e: self._load_selected())
+        self.tree.bind("<<TreeviewSelect>>", self._on_tree_select)
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll_rows(-3 if e.delta > 0 else 3))
+        self.tree.bind("<Button-4>", lambda e: self.scroll_rows(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_rows(3))
+        self.tree.bind("<Up>", lambda e: self.move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self.move_selection(1))
+        self.tree.bind("<Prior>", lambda e: self.move_selection(-self.page_size))
+        self.tree.bind("<Next>", lambda e: self.move_selection(self.page_size))
+        self.tree.bind("<Home>", lambda e: self.move_selection(-self.total))
+        self.tree.bind("<End>", lambda e: self.move_selection(self.total))
+        self.win.protocol("WM_DELETE_WINDOW", self.close)
+
+        self._poll_scan()
+
+    def _build_filters(self) -> None:
+        bar = ttk.Frame(self.win)
+        bar.pack(padx=10, pady=10, fill=tk.X)
+        self.player_var = tk.StringVar()
+        self.eco_var = tk.StringVar()
+        self.result_var = tk.StringVar()
+        self.min_elo_var = tk.StringVar()
+        self.date_from_var = tk.StringVar()
+        self.date_to_var = tk.StringVar()
+        fields = (
+            ("Игрок:", ttk.Entry(bar, textvariable=self.player_var, width=16)),
+            ("ECO:", ttk.Entry(bar, textvariable=self.eco_var, width=5)),
+            ("Результат:", ttk.Combobox(bar, textvariable=self.result_var, values=RESULT_CHOICES,
+                                        width=7, state="readonly")),
+            ("Эло от:", ttk.Entry(bar, textvariable=self.min_elo_var, width=6)),
+            ("Дата с:", ttk.Entry(bar, textvariable=self.date_from_var, width=10)),
+            ("по:", ttk.Entry(bar, textvariable=self.date_to_var, width=10)),
+        )
+        for label, widget in fields:
+            ttk.Label(bar, text=label).pack(side=tk.LEFT, padx=(6, 2))
+            widget.pack(side=tk.LEFT)
+        for var in (self.player_var, self.eco_var, self.result_var, self.min_elo_var,
+                    self.date_from_var, self.date_to_var):
+            var.trace_add("write", lambda *_: self._schedule_filter())
+
+    # ------------------ Фильтр и сортировка ------------------
+    def _schedule_filter(self) -> None:
+        # Запрос уходит, когда пользователь перестал печатать, а не на каждую букву
+        if self._filter_job is not None:
+            self.win.after_cancel(self._filter_job)
+        self._filter_job = self.win.after(250, self.apply_filter)
+
+    def apply_filter(self) -> None:
+        self._filter_job = None
+        try:
+            min_elo = int(self.min_elo_var.get()) if self.min_elo_var.get().strip() else None
+        except ValueError:
+            min_elo = None
+        self.game_filter = GameFilter(self.player_var.get(), self.eco_var.get(), self.result_var.get(), min_elo,
+                                      self.date_from_var.get(), self.date_to_var.get())
+        self.top = 0
+        self.refresh(recount=True)
+
+    def sort_by(self, column: str) -> None:
+        if self.order_by == column:
+            self.descending = not self.descending
+        else:
+            self.order_by, self.descending = column, column in ("white_elo", "black_elo", "date")
+        for name, title, _ in BROWSER_COLUMNS:
+            arrow = (" ▼" if self.descending else " ▲") if name == self.order_by else ""
+            self.tree.heading(name, text=title + arrow)
+        self.top = 0
+        self.refresh()
+
+    # ------------------ Виртуальная прокрутка ------------------
+    def refresh(self, recount: bool = False) -> None:
+        if recount:
+            self.total = self.index.count(self.game_filter)
+        self.top = max(0, min(self.top, self.total - self.page_size))
+        rows = self.index.query(self.game_filter, self.order_by, self.descending,
+                                limit=self.page_size, offset=self.top)
+        self._show_rows(rows)
+        if self.total > 0:
+            self.scrollbar.set(self.top / self.total, min(1.0, (self.top + self.page_size) / self.total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        self._update_status()
+
+    def _show_rows(self, rows: List[Tuple]) -> None:
+        self.tree.delete(*self.tree.get_children())
+        for row in rows:
+            values = ["" if value is None else value for value in row[1:]]
+            self.tree.insert('', 'end', iid=str(row[0]), values=values)
+        # Выделение привязано к партии, а не к строке окна — переживает прокрутку
+        if self.selected_id is not None and self.tree.exists(str(self.selected_id)):
+            self.tree.selection_set(str(self.selected_id))
+            self.tree.focus(str(self.selected_id))
+
+    def _update_status(self) -> None:
+        text = f"Партий: {self.total}"
+        if not self.index.complete:
+            text += f", просмотрено {self.index.scanner.progress * 100:.0f}%"
+        self.status_label.config(text=text)
+
+    def _on_scrollbar(self, action: str, amount: str, unit: Optional[str] = None) -> None:
+        if action == "moveto":
+            self.top = int(float(amount) * self.total)
+            self.refresh()
+        elif action == "scroll":
+            step = self.page_size if unit == "pages" else 1
+            self.scroll_rows(int(amount) * step)
+
+    def scroll_rows(self, delta: int) -> str:
+        self.top += delta
+        self.refresh()
+        return "break"
+
+    def move_selection(self, delta: int) -> str:
+        page = self.tree.get_children()
+        current = self.top + page.index(self.tree.focus()) if self.tree.focus() in page else self.top - 1
+        target = max(0, min(self.total - 1, current + delta))
+        if target < self.top:
+            self.top = target
+        elif target >= self.top + self.page_size:
+            self.top = target - self.page_size + 1
+        self.refresh()
+        page = self.tree.get_children()
+        if 0 <= target - self.top < len(page):
+            item = page[target - self.top]
+            self.selected_id = int(item)
+            self.tree.selection_set(item)
+            self.tree.focus(item)
+        return "break"
+
+    def _on_tree_select(self, _event: tk.Event) -> None:
+        selection = self.tree.selection()
+        if selection:
+            self.selected_id = int(selection[0])
+
+    def _on_resize(self, event: tk.Event) -> None:
+        # Строк в окне ровно столько, сколько помещается по высоте
+        row_height = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        page_size = max(1, (event.height - row_height) // row_height)
+        if page_size != self.page_size:
+            self.page_size = page_size
+            self.refresh()
+
+    def _poll_scan(self) -> None:
+        # Пока файл сканируется, список и счётчик дополняются
+        complete = self.index.complete
+        self.refresh(recount=True)
+        self._poll_job = None if complete else self.win.after(300, self._poll_scan)
+
+    def _load_selected(self) -> None:
+        found = self.index.entry(self.selected_id) if self.selected_id is not None else None
+        if found is None:
+            return
+        self.close()
+        self.on_select(GameEntry(found[0], found[1], {}))
+
+    def close(self) -> None:
+        for job in (self._filter_job, self._poll_job):
+            if job is not None:
+                self.win.after_cancel(job)
+        self.index.close(finish_scan=True)
+        self.win.destroy()
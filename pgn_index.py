@@ -0,0 +1,390 @@
+import hashlib
+import io
+import mmap
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional, List, Dict, Callable, Tuple
+
+import chess.pgn
+
+from config import PGN_INDEX_DIR
+
+# Заголовки, которые показываются в окне выбора партии; остальные читаются вместе с самой партией
+INDEX_HEADERS = ("Event", "Date", "White", "Black", "Result", "WhiteElo", "BlackElo", "ECO")
+
+_TAG_LINE = re.compile(rb'\[([A-Za-z0-9_]+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+# Начало следующей партии — строка, которая начинается с тега. "[%clk ...]" из перенесённых комментариев не подходит
+_NEXT_GAME = re.compile(rb'\n\[[A-Za-z0-9_]+\s+"')
+
+BatchCallback = Callable[[List["GameEntry"]], None]
+
+
+def log_error(msg: str) -> None:
+    print(f"[PgnIndex ERROR] {msg}")
+
+
+class GameEntry:
+    __slots__ = ("offset", "length", "headers")
+
+    def __init__(self, offset: int, length: int, headers: Dict[str, str]) -> None:
+        self.offset = offset
+        self.length = length
+        self.headers = headers
+
+    def get(self, name: str, default: str = "?") -> str:
+        return self.headers.get(name, default)
+
+
+def _decode(raw: bytes) -> str:
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return raw.decode("latin-1")
+
+
+def _scan_headers(mm: mmap.mmap, pos: int, size: int) -> Tuple[Dict[str, str], int]:
+    headers: Dict[str, str] = {}
+    while pos < size and mm[pos:pos + 1] == b"[":
+        eol = mm.find(b"\n", pos)
+        if eol < 0:
+            eol = size
+        match = _TAG_LINE.match(mm, pos, eol)
+        if match and match.group(1).decode("ascii") in INDEX_HEADERS:
+            headers[match.group(1).decode("ascii")] = _decode(match.group(2)).replace('\\"', '"')
+        pos = eol + 1
+    return headers, pos
+
+
+class PgnScanner:
+    # Проходит файл через mmap в фоновом потоке и отдаёт смещения партий пачками, пока идёт сканирование
+    def __init__(self, path: str, on_batch: BatchCallback, batch_size: int = 500,
+                 batch_interval_s: float = 0.1) -> None:
+        self.path = path
+        self.on_batch = on_batch
+        self.batch_size = batch_size
+        self.batch_interval_s = batch_interval_s
+        self.size = 0
+        self.scanned = 0
+        self.count = 0
+        self.error: Optional[str] = None
+        self.done = threading.Event()
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="pgn-scan")
+
+    @property
+    def progress(self) -> float:
+        return self.scanned / self.size if self.size else 1.0
+
+    def start(self) -> "PgnScanner":
+        self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def _run(self) -> None:
+        try:
+            with open(self.path, "rb") as f:
+                self.size = os.fstat(f.fileno()).st_size
+                if self.size:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        self._scan(mm)
+        except (OSError, ValueError) as e:
+            self.error = str(e)
+            log_error(f"Ошибка чтения {self.path}: {e}")
+        finally:
+            self.scanned = self.size
+            self.done.set()
+
+    def _scan(self, mm: mmap.mmap) -> None:
+        size = self.size
+        pos = 3 if mm[:3] == b"\xef\xbb\xbf" else 0
+        batch: List[GameEntry] = []
+        last_flush = time.time()
+        while pos < size and not self._cancel.is_set():
+            if mm[pos:pos + 1] != b"[":
+                # До следующего тега — пустые строки или партия без заголовков
+                nxt = _NEXT_GAME.search(mm, pos)
+                end = nxt.start() + 1 if nxt else size
+                if mm[pos:end].strip():
+                    batch.append(GameEntry(pos, end - pos, {}))
+                pos = end
+                continue
+            start = pos
+            headers, pos = _scan_headers(mm, pos, size)
+            nxt = _NEXT_GAME.search(mm, pos)
+            end = nxt.start() + 1 if nxt else size
+            batch.append(GameEntry(start, end - start, headers))
+            pos = end
+            self.scanned = pos
+            if len(batch) >= self.batch_size or time.time() - last_flush >= self.batch_interval_s:
+                self._flush(batch)
+                batch = []
+                last_flush = time.time()
+        self._flush(batch)
+
+    def _flush(self, batch: List[GameEntry]) -> None:
+        if batch:
+            self.count += len(batch)
+            self.on_batch(batch)
+
+
+def read_game_at(path: str, offset: int, length: int) -> Optional[chess.pgn.Game]:
+    # С диска читается только байтовый диапазон одной партии
+    with open(path, "rb") as f:
+        f.seek(offset)
+        raw = f.read(length)
+    return chess.pgn.read_game(io.StringIO(_decode(raw)))
+
+
+# ------------------ Постоянный индекс ------------------
+_INDEX_VERSION = 1
+_SORT_COLUMNS = ("id", "white", "black", "white_elo", "black_elo", "result", "date", "eco", "event")
+# Ключ сортировки без NULL: сравнение кортежей (ключ, id) для постраничного перехода NULL не выдерживает
+_SORT_KEYS = {column: "id" if column == "id" else
+              f"IFNULL({column}, {0 if column.endswith('_elo') else repr('')})" for column in _SORT_COLUMNS}
+# Прыжок к странице дальше этого от известной строки идёт через OFFSET (по индексу, без сортировки)
+_KEYSET_MAX_DISTANCE = 1000
+
+
+def _elo(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def _index_path(pgn_path: str, index_dir: str) -> str:
+    digest = hashlib.sha1(os.path.abspath(pgn_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(index_dir, f"{os.path.basename(pgn_path)}.{digest}.sqlite3")
+
+
+class GameFilter:
+    __slots__ = ("player", "eco", "result", "min_elo", "date_from", "date_to")
+
+    def __init__(self, player: str = "", eco: str = "", result: str = "", min_elo: Optional[int] = None,
+                 date_from: str = "", date_to: str = "") -> None:
+        self.player = player.strip()
+        self.eco = eco.strip().upper()
+        self.result = result.strip()
+        self.min_elo = min_elo
+        self.date_from = date_from.strip()
+        self.date_to = date_to.strip()
+
+    def where(self) -> Tuple[str, List[object]]:
+        clauses: List[str] = []
+        params: List[object] = []
+        if self.player:
+            clauses.append("(white LIKE ? OR black LIKE ?)")
+            params += [f"%{self.player}%"] * 2
+        if self.eco:
+            clauses.append("eco LIKE ?")
+            params.append(f"{self.eco}%")
+        if self.result:
+            clauses.append("result = ?")
+            params.append(self.result)
+        if self.min_elo:
+            clauses.append("(white_elo >= ? OR black_elo >= ?)")
+            params += [self.min_elo] * 2
+        # Даты PGN в формате ГГГГ.ММ.ДД сравниваются как строки
+        if self.date_from:
+            clauses.append("date >= ?")
+            params.append(self.date_from)
+        if self.date_to:
+            clauses.append("date <= ?")
+            params.append(self.date_to + "\uffff")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+class PgnIndex:
+    # Смещения и заголовки партий в SQLite рядом с кэшем; повторное открытие того же файла не сканирует его
+    def __init__(self, pgn_path: str, index_dir: str = PGN_INDEX_DIR) -> None:
+        self.pgn_path = pgn_path
+        self.db_path = _index_path(pgn_path, index_dir)
+        self.scanner: Optional[PgnScanner] = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self._scan_finished = False
+        self._close_after_scan = False
+        # Первая и последняя строки последней выданной страницы: (запрос, позиция, ключ, id)
+        self._anchors: List[Tuple[Tuple, int, object, int]] = []
+        try:
+            os.makedirs(index_dir, exist_ok=True)
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        except (OSError, sqlite3.Error) as e:
+            # Без доступа к каталогу индекс живёт только до закрытия окна
+            log_error(f"Не удалось открыть индекс {self.db_path}: {e}")
+            self._db = sqlite3.connect(":memory:", check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=OFF")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.commit()
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _fingerprint(self) -> str:
+        st = os.stat(self.pgn_path)
+        return f"{_INDEX_VERSION}:{st.st_size}:{st.st_mtime_ns}"
+
+    @property
+    def complete(self) -> bool:
+        return self.scanner is None or self.scanner.done.is_set()
+
+    def open(self) -> "PgnIndex":
+        fingerprint = self._fingerprint()
+        with self._lock:
+            if self._meta("fingerprint") == fingerprint and self._meta("complete") == "1":
+                # Индексы, добавленные после построения этого файла индекса
+                self._create_indexes()
+                return self
+            # Файл изменился или прошлое сканирование не дошло до конца — строим индекс заново
+            self._db.executescript(
+                "DROP TABLE IF EXISTS games;"
+                "CREATE TABLE games (id INTEGER PRIMARY KEY, offset INTEGER NOT NULL, length INTEGER NOT NULL,"
+                " white TEXT, black TEXT, white_elo INTEGER, black_elo INTEGER,"
+                " result TEXT, date TEXT, eco TEXT, event TEXT);"
+            )
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('fingerprint', ?)", (fingerprint,))
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('complete', '0')")
+            self._db.commit()
+        self.scanner = PgnScanner(self.pgn_path, self._store_batch)
+        threading.Thread(target=self._finish_when_done, daemon=True).start()
+        self.scanner.start()
+        return self
+
+    def _store_batch(self, batch: List[GameEntry]) -> None:
+        rows = [(e.offset, e.length, e.headers.get("White"), e.headers.get("Black"),
+                 _elo(e.headers.get("WhiteElo")), _elo(e.headers.get("BlackElo")), e.headers.get("Result"),
+                 e.headers.get("Date"), e.headers.get("ECO"), e.headers.get("Event")) for e in batch]
+        with self._lock:
+            # Окно закрыто, а сканер не успел остановиться — база уже закрыта
+            if self._closed:
+                return
+            self._anchors = []
+            self._db.executemany(
+                "INSERT INTO games (offset, length, white, black, white_elo, black_elo, result, date, eco, event)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._db.commit()
+
+    def _finish_when_done(self) -> None:
+        scanner = self.scanner
+        scanner.done.wait()
+        with self._lock:
+            self._scan_finished = True
+            if self._closed:
+                return
+            if not scanner.error and not scanner.cancelled:
+                # Индексы строятся один раз после сканирования: вставка без них быстрее
+                self._create_indexes()
+                self._db.execute("INSERT OR REPLACE INTO meta VALUES ('complete', '1')")
+                self._db.commit()
+            if self._close_after_scan:
+                self._closed = True
+                self._db.close()
+
+    def _create_indexes(self) -> None:
+        # Фильтры по дате и рейтингу, плюс (ключ, id) для каждого столбца сортировки — без полной сортировки
+        statements = ["CREATE INDEX IF NOT EXISTS games_date ON games(date)",
+                      "CREATE INDEX IF NOT EXISTS games_white_elo ON games(white_elo)"]
+        statements += [f"CREATE INDEX IF NOT EXISTS games_sort_{column} ON games({key}, id)"
+                       for column, key in _SORT_KEYS.items() if column != "id"]
+        self._db.executescript(";".join(statements) + ";")
+
+    def count(self, game_filter: Optional[GameFilter] = None) -> int:
+        where, params = (game_filter or GameFilter()).where()
+        with self._lock:
+            return self._db.execute(f"SELECT COUNT(*) FROM games{where}", params).fetchone()[0]
+
+    def query(self, game_filter: Optional[GameFilter] = None, order_by: str = "id", descending: bool = False,
+              limit: int = 50, offset: int = 0) -> List[Tuple]:
+        where, params = (game_filter or GameFilter()).where()
+        key = _SORT_KEYS.get(order_by, "id")
+        limit, offset = max(0, int(limit)), max(0, int(offset))
+        signature = (where, tuple(params), key, descending)
+        with self._lock:
+            # Прокрутка рядом с уже показанной страницей: продолжаем от её крайней строки по индексу,
+            # а не пропускаем offset строк с начала
+            anchor = min((a for a in self._anchors if a[0] == signature),
+                         key=lambda a: abs(a[1] - offset), default=None)
+            if anchor is not None and abs(anchor[1] - offset) <= _KEYSET_MAX_DISTANCE:
+                rows = self._query_from(anchor, where, params, key, descending, limit, offset)
+            else:
+                rows = self._select(where, params, key, descending, limit, offset)
+            if rows:
+                self._anchors = [(signature, offset, rows[0][-1], rows[0][0]),
+                                 (signature, offset + len(rows) - 1, rows[-1][-1], rows[-1][0])]
+            return [row[:-1] for row in rows]
+
+    def _select(self, where: str, params: List[object], key: str, descending: bool, limit: int, offset: int,
+                extra: str = "", extra_params: Tuple = (), order: Optional[str] = None) -> List[Tuple]:
+        direction = "DESC" if descending else "ASC"
+        conditions = ([where[len(" WHERE "):]] if where else []) + ([extra] if extra else [])
+        sql_where = (" WHERE " + " AND ".join(conditions)) if conditions else ""
+        return self._db.execute(
+            f"SELECT id, white, black, white_elo, black_elo, result, date, eco, event, {key} FROM games"
+            f"{sql_where} ORDER BY {order or key + ' ' + direction + ', id'} {direction} LIMIT ? OFFSET ?",
+            list(params) + list(extra_params) + [limit, offset],
+        ).fetchall()
+
+    def _select_after(self, where: str, params: List[object], key: str, descending: bool, limit: int,
+                      bound: Tuple[object, int], inclusive: bool) -> List[Tuple]:
+        # Строки за (ключ, id) в порядке сортировки. Сравнение кортежей SQLite ищет по индексу только по первому
+        # столбцу, поэтому два запроса: тот же ключ и id дальше, затем ключ строго дальше — оба поиском по индексу
+        anchor_key, anchor_id = bound
+        op = (">" if not descending else "<") + ("=" if inclusive else "")
+        if key == "id":
+            return self._select(where, params, key, descending, limit, 0, f"id {op} ?", (anchor_id,), order="id")
+        rows = self._select(where, params, key, descending, limit, 0, f"{key} = ? AND id {op} ?",
+                            (anchor_key, anchor_id), order="id")
+        if len(rows) < limit:
+            rows += self._select(where, params, key, descending, limit - len(rows), 0,
+                                 f"{key} {op[0]} ?", (anchor_key,))
+        return rows
+
+    def _query_from(self, anchor: Tuple[Tuple, int, object, int], where: str, params: List[object], key: str,
+                    descending: bool, limit: int, offset: int) -> List[Tuple]:
+        _, position, anchor_key, anchor_id = anchor
+        bound = (anchor_key, anchor_id)
+        # Небольшой пропуск от якоря читается и отбрасывается — это дешевле OFFSET от начала
+        if offset >= position:
+            skip = offset - position
+            return self._select_after(where, params, key, descending, skip + limit, bound, True)[skip:]
+        # Строки перед якорем читаются в обратном порядке от него и разворачиваются
+        before = min(limit, position - offset)
+        skip = position - offset - before
+        rows = self._select_after(where, params, key, not descending, skip + before, bound, False)[skip:]
+        rows.reverse()
+        if limit > before:
+            rows += self._select_after(where, params, key, descending, limit - before, bound, True)
+        return rows
+
+    def entry(self, game_id: int) -> Optional[Tuple[int, int]]:
+        with self._lock:
+            return self._db.execute("SELECT offset, length FROM games WHERE id = ?", (game_id,)).fetchone()
+
+    def read_game(self, game_id: int) -> Optional[chess.pgn.Game]:
+        found = self.entry(game_id)
+        return read_game_at(self.pgn_path, found[0], found[1]) if found else None
+
+    def close(self, finish_scan: bool = False) -> None:
+        # finish_scan: окно закрыто, но файл досканируется в фоне — следующее открытие будет мгновенным
+        if self.scanner is not None:
+            with self._lock:
+                if not self._scan_finished and finish_scan:
+                    self._close_after_scan = True
+                    return
+            self.scanner.cancel()
+            self.scanner.done.wait(2.0)
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._db.close()
@@ -0,0 +1,200 @@
+import queue
+import threading
+import time
+import concurrent.futures
+from typing import Optional, Callable, List
+
+import chess
+
+from engine_handler import EngineHandler, SearchLimits, log_error
+from engine_pool import EnginePool
+from engine_profiles import PROFILE_PLAY
+from opening_book import OpeningBook
+from uci_client import StopSignal
+from uci_info import InfoLine, MultiPVTable, parse_info_line
+
+MoveCallback = Callable[[str, str], None]
+
+
+def format_clock(ms: int) -> str:
+    ms = max(0, int(ms))
+    minutes, seconds = divmod(ms // 1000, 60)
+    if ms < 10000:
+        return f"{seconds}.{(ms % 1000) // 100}"
+    return f"{minutes}:{seconds:02d}"
+
+
+class GameClock:
+    def __init__(self, base_ms: int, increment_ms: int = 0) -> None:
+        self.increment_ms = int(increment_ms)
+        self._remaining = {chess.WHITE: int(base_ms), chess.BLACK: int(base_ms)}
+        self._running: Optional[bool] = None
+        self._started = 0.0
+        self._lock = threading.Lock()
+
+    def _elapsed_ms(self) -> int:
+        return int((time.monotonic() - self._started) * 1000)
+
+    def start(self, color: bool) -> None:
+        with self._lock:
+            self._running = color
+            self._started = time.monotonic()
+
+    def press(self, color: bool) -> None:
+        # Ход сделан: списываем потраченное, начисляем добавку и запускаем часы соперника
+        with self._lock:
+            if self._running == color:
+                self._remaining[color] -= self._elapsed_ms()
+            self._remaining[color] += self.increment_ms
+            self._running = not color
+            self._started = time.monotonic()
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._running is not None:
+                self._remaining[self._running] -= self._elapsed_ms()
+            self._running = None
+
+    def remaining_ms(self, color: bool) -> int:
+        with self._lock:
+            remaining = self._remaining[color]
+            if self._running == color:
+                remaining -= self._elapsed_ms()
+            return remaining
+
+    def flagged(self) -> Optional[bool]:
+        for color in (chess.WHITE, chess.BLACK):
+            if self.remaining_ms(color) <= 0:
+                return color
+        return None
+
+    def limits(self) -> SearchLimits:
+        return SearchLimits(wtime=self.remaining_ms(chess.WHITE), btime=self.remaining_ms(chess.BLACK),
+                            winc=self.increment_ms, binc=self.increment_ms)
+
+
+class PlaySession:
+    # Партия против движка: один движок из пула закреплён за игрой и думает на времени человека
+    def __init__(self, pool: EnginePool, engine_color: bool, on_move: MoveCallback,
+                 clock: Optional[GameClock] = None, movetime_ms: int = 1000,
+                 book: Optional[OpeningBook] = None) -> None:
+        self.pool = pool
+        self.engine_color = engine_color
+        self.on_move = on_move
+        self.clock = clock
+        self.movetime_ms = movetime_ms
+        self.book = book
+        self.ponder_hits = 0
+        self.ponder_misses = 0
+
+        self._requests: "queue.Queue[Optional[chess.Board]]" = queue.Queue()
+        self._closed = StopSignal()
+        # Позиция, которую движок ожидает после ответа человека, идущий поиск над ней и его линии
+        self._ponder_fen: Optional[str] = None
+        self._ponder_search: Optional["concurrent.futures.Future[Optional[str]]"] = None
+        self._ponder_table: Optional[MultiPVTable] = None
+        self._thread = threading.Thread(target=self._run, daemon=True, name="play-session")
+        self._thread.start()
+
+    def _limits(self) -> SearchLimits:
+        return self.clock.limits() if self.clock is not None else SearchLimits(movetime_ms=self.movetime_ms)
+
+    def request_move(self, board: chess.Board) -> None:
+        # Доска передаётся с историей ходов — движок получает её целиком, а не голый FEN
+        if not self._closed.is_set():
+            self._requests.put(board.copy())
+
+    def close(self) -> None:
+        self._closed.set()
+        self._requests.put(None)
+
+    def _run(self) -> None:
+        engine = self.pool.acquire()
+        if engine is None:
+            return
+        # Закрытие сессии останавливает любой текущий поиск, в том числе обдумывание
+        self._closed.add_callback(engine.stop_search)
+        try:
+            self.pool.apply_profile(engine, PROFILE_PLAY)
+            engine.set_ponder(True)
+            engine.new_game(self)
+            while True:
+                board = self._requests.get()
+                if board is None or self._closed.is_set():
+                    break
+                self._play(engine, board)
+        except Exception as e:
+            log_error(f"Ошибка игровой сессии: {e}")
+        finally:
+            self._closed.remove_callback(engine.stop_search)
+            self._drop_ponder(engine)
+            engine.set_ponder(False)
+            self.pool.release(engine)
+
+    def _drop_ponder(self, engine: EngineHandler) -> None:
+        search, self._ponder_search, self._ponder_fen = self._ponder_search, None, None
+        if search is not None:
+            engine.cancel_ponder(search)
+
+    def _play(self, engine: EngineHandler, board: chess.Board) -> None:
+        fen = board.fen()
+        book_move = self.book.choose(board) if self.book is not None else None
+        if book_move is not None:
+            # Пока партия в книге, движок не ищет и не обдумывает: ход берётся по весам книги
+            self._drop_ponder(engine)
+            if self.clock is not None:
+                self.clock.press(self.engine_color)
+            self.on_move(fen, book_move.uci())
+            return
+
+        best_move: Optional[str] = None
+        lines: List[InfoLine] = []
+        if self._ponder_search is not None and self._ponder_fen == fen:
+            # Человек сыграл предсказанный ход — движок уже давно думает над этой позицией
+            search, self._ponder_search, self._ponder_fen = self._ponder_search, None, None
+            self.ponder_hits += 1
+            best_move = engine.ponderhit(search, self._limits())
+            lines = self._ponder_table.lines() if self._ponder_table is not None else []
+        else:
+            if self._ponder_search is not None:
+                self.ponder_misses += 1
+            self._drop_ponder(engine)
+
+        if best_move is None:
+            engine.set_position_from_board(board, game_key=self)
+            lines, best_move = engine.get_analysis(limits=self._limits())
+
+        # Ответ, которого движок ждёт от человека, — второй ход его главной линии
+        ponder_move = None
+        if lines and len(lines[0].pv) >= 2 and lines[0].pv[0] == best_move:
+            ponder_move = lines[0].pv[1]
+
+        if self._closed.is_set() or best_move is None:
+            return
+        if self.clock is not None:
+            self.clock.press(self.engine_color)
+        self.on_move(fen, best_move)
+        self._start_ponder(engine, board, best_move, ponder_move)
+
+    def _start_ponder(self, engine: EngineHandler, board: chess.Board, best_move: str,
+                      ponder_move: Optional[str]) -> None:
+        if not ponder_move:
+            return
+        expected = board.copy(stack=False)
+        try:
+            expected.push_uci(best_move)
+            expected.push_uci(ponder_move)
+        except ValueError:
+            return
+        if expected.is_game_over():
+            return
+        table = MultiPVTable(1)
+
+        def on_info(line: str) -> None:
+            parsed = parse_info_line(line)
+            if parsed is not None:
+                table.update(parsed)
+
+        search = engine.start_ponder(board, [best_move, ponder_move], self._limits(), on_info)
+        if search is not None:
+            self._ponder_fen, self._ponder_search, self._ponder_table = expected.fen(), search, table
@@ -0,0 +1,59 @@
+from typing import Optional, Dict, List
+
+import chess
+import chess.pgn
+
+
+def _with_history(board: chess.Board, source: chess.Board) -> chess.Board:
+    # История ходов — общие со снимком объекты в новых списках. Board.copy() клонирует каждый ход,
+    # то есть стоит O(длины партии) на узел; списки ссылок копируются на порядки быстрее
+    board.move_stack = source.move_stack + board.move_stack
+    board._stack = source._stack + board._stack
+    return board
+
+
+class PositionTable:
+    # Позиция после каждого узла партии. Узел без записи достраивается от ближайшего известного предка —
+    # так новые вариации добавляются по одному ходу, а переход к любому узлу не переигрывает партию с начала
+    def __init__(self) -> None:
+        self.root: Optional[chess.pgn.GameNode] = None
+        self._boards: Dict[chess.pgn.GameNode, chess.Board] = {}
+
+    def reset(self, root: Optional[chess.pgn.GameNode] = None) -> None:
+        self._boards.clear()
+        self.root = root
+        if root is not None:
+            self._boards[root] = root.board()
+
+    def __len__(self) -> int:
+        return len(self._boards)
+
+    def _snapshot(self, node: chess.pgn.GameNode) -> chess.Board:
+        board = self._boards.get(node)
+        if board is not None:
+            return board
+        path: List[chess.pgn.GameNode] = []
+        walker = node
+        while walker not in self._boards:
+            if walker.parent is None:
+                # Дошли до корня другой партии — таблица начинается заново
+                self.reset(walker)
+                break
+            path.append(walker)
+            walker = walker.parent
+        board = self._boards[walker]
+        for child in reversed(path):
+            parent_board = board
+            board = parent_board.copy(stack=False)
+            board.push(child.move)
+            self._boards[child] = _with_history(board, parent_board)
+        return board
+
+    def board(self, node: chess.pgn.GameNode, stack: bool = True) -> chess.Board:
+        # Копия: снимки в таблице не меняются, а доска приложения живёт своей жизнью
+        snapshot = self._snapshot(node)
+        board = snapshot.copy(stack=False)
+        return _with_history(board, snapshot) if stack else board
+
+    def fen(self, node: chess.pgn.GameNode) -> str:
+        return self._snapshot(node).fen()
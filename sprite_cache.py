@@ -0,0 +1,96 @@
+import os
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple
+
+from PIL import Image, ImageTk, ImageDraw, ImageFont
+
+from config import IMAGE_DIR, PIECE_DIR, PIECE_SYMBOL_TO_FILE, SPRITE_CACHE_SIZES
+
+# Фильтр при живом изменении размера окна и после того, как размер устоялся
+FAST_FILTER = Image.BILINEAR
+QUALITY_FILTER = Image.LANCZOS
+
+
+def log_error(msg: str) -> None:
+    print(f"[SpriteCache ERROR] {msg}")
+
+
+def make_placeholder_image(symbol: str, size: int) -> Image.Image:
+    img = Image.new("RGBA", (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    try:
+        fnt = ImageFont.truetype("DejaVuSans-Bold.ttf", max(1, size // 2))
+    except Exception:
+        fnt = ImageFont.load_default()
+    try:
+        bbox = draw.textbbox((0, 0), symbol, font=fnt)
+        w, h = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    except Exception:
+        try:
+            w, h = fnt.getsize(symbol)
+        except Exception:
+            w, h = size // 2, size // 2
+
+    draw.rectangle([(0, 0), (size, size)], fill=(240, 240, 240, 255))
+    draw.text(((size - w) / 2, (size - h) / 2), symbol, font=fnt, fill="black")
+    return img
+
+
+class SpriteCache:
+    # Исходные PNG читаются один раз; масштабированные наборы хранятся LRU по размеру клетки.
+    # Быстрый набор (во время перетаскивания края окна) заменяется качественным, когда размер устоялся
+    def __init__(self, max_sizes: int = SPRITE_CACHE_SIZES) -> None:
+        self.max_sizes = max(2, max_sizes)
+        self._sets: "OrderedDict[Tuple[int, bool], Tuple[Dict[str, ImageTk.PhotoImage], Optional[ImageTk.PhotoImage]]]" = OrderedDict()
+        self._pieces: Dict[str, Optional[Image.Image]] = {}
+        self._board: Optional[Image.Image] = None
+        self._load_sources()
+
+    def _load_sources(self) -> None:
+        board_path = os.path.join(IMAGE_DIR, "board.png")
+        if os.path.exists(board_path):
+            try:
+                self._board = Image.open(board_path).convert("RGBA")
+            except Exception as e:
+                log_error(f"Не удалось загрузить {board_path}: {e}")
+        for symbol, filename in PIECE_SYMBOL_TO_FILE.items():
+            color_folder = "white" if symbol.isupper() else "black"
+            path = os.path.join(PIECE_DIR, color_folder, filename)
+            self._pieces[symbol] = None
+            if os.path.exists(path):
+                try:
+                    self._pieces[symbol] = Image.open(path).convert("RGBA")
+                except Exception as e:
+                    log_error(f"Не удалось загрузить {path}: {e}")
+
+    @property
+    def has_board(self) -> bool:
+        return self._board is not None
+
+    def _build(self, square_size: int, quality: bool) -> Tuple[Dict[str, ImageTk.PhotoImage], Optional[ImageTk.PhotoImage]]:
+        resample = QUALITY_FILTER if quality else FAST_FILTER
+        pieces: Dict[str, ImageTk.PhotoImage] = {}
+        for symbol, source in self._pieces.items():
+            if source is not None:
+                img = source.resize((square_size, square_size), resample)
+            else:
+                img = make_placeholder_image(symbol, square_size)
+            pieces[symbol] = ImageTk.PhotoImage(img)
+        board = None
+        if self._board is not None:
+            board = ImageTk.PhotoImage(self._board.resize((square_size * 8, square_size * 8), resample))
+        return pieces, board
+
+    def get(self, square_size: int, quality: bool = True) -> Tuple[Dict[str, ImageTk.PhotoImage], Optional[ImageTk.PhotoImage]]:
+        # Качественный набор подходит и там, где просили быстрый
+        for key in ((square_size, True), (square_size, quality)):
+            if key in self._sets:
+                self._sets.move_to_end(key)
+                return self._sets[key]
+        sprites = self._build(square_size, quality)
+        self._sets[(square_size, quality)] = sprites
+        if quality:
+            self._sets.pop((square_size, False), None)
+        while len(self._sets) > self.max_sizes:
+            self._sets.popitem(last=False)
+        return sprites
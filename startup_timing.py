@@ -0,0 +1,41 @@
+import os
+import time
+from datetime import datetime
+from typing import Optional, List, Tuple
+
+from config import STARTUP_LOG_PATH
+
+# Отсчёт от импорта этого модуля — main.py импортирует его первым, до tkinter и остальных
+PROCESS_T0 = time.perf_counter()
+
+
+def log_error(msg: str) -> None:
+    print(f"[Startup ERROR] {msg}")
+
+
+class StartupTimer:
+    # Вехи запуска в миллисекундах от старта: импорты, окно, первый кадр, готовность движка
+    def __init__(self, origin: float = PROCESS_T0) -> None:
+        self.origin = origin
+        self.marks: List[Tuple[str, float]] = []
+
+    def mark(self, name: str) -> float:
+        elapsed_ms = (time.perf_counter() - self.origin) * 1000.0
+        self.marks.append((name, elapsed_ms))
+        return elapsed_ms
+
+    def get(self, name: str) -> Optional[float]:
+        return next((ms for mark, ms in self.marks if mark == name), None)
+
+    def report(self) -> str:
+        return ", ".join(f"{name} {ms:.0f} мс" for name, ms in self.marks)
+
+    def save(self, path: str = STARTUP_LOG_PATH) -> None:
+        # Одна строка на запуск — чтобы следить за временем до первого кадра от версии к версии
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                marks = " ".join(f"{name.replace(' ', '_')}={ms:.0f}" for name, ms in self.marks)
+                f.write(f"{datetime.now().isoformat(timespec='seconds')} {marks}\n")
+        except OSError as e:
+            log_error(f"Не удалось записать {path}: {e}")
@@ -0,0 +1,139 @@
+import os
+import threading
+from typing import Optional, List, Tuple
+
+import chess
+import chess.syzygy
+
+from config import SYZYGY_PATH, TABLEBASE_PV_PLIES
+from uci_info import InfoLine
+
+# Выигрыш по базе ниже мата, но выше любой обычной оценки; быстрее реализуемый выигрыш — выше
+TABLEBASE_WIN_CP = 9000
+
+
+def log_error(msg: str) -> None:
+    print(f"[Tablebase ERROR] {msg}")
+
+
+def _table_pieces(filename: str) -> int:
+    # KQvKR.rtbw -> 4 фигуры
+    stem = os.path.splitext(filename)[0]
+    return sum(1 for ch in stem if ch.isalpha() and ch != "v")
+
+
+class Tablebase:
+    def __init__(self, path: Optional[str] = SYZYGY_PATH) -> None:
+        self.max_pieces = 0
+        self.hits = 0
+        self._tb: Optional[chess.syzygy.Tablebase] = None
+        self._lock = threading.Lock()
+        if path:
+            self._open(path)
+
+    def _open(self, path: str) -> None:
+        tb = chess.syzygy.Tablebase()
+        for directory in path.split(os.pathsep):
+            if not os.path.isdir(directory):
+                continue
+            try:
+                if tb.add_directory(directory):
+                    pieces = [_table_pieces(name) for name in os.listdir(directory) if name.endswith(".rtbw")]
+                    self.max_pieces = max([self.max_pieces] + pieces)
+            except OSError as e:
+                log_error(f"Не удалось открыть эндшпильные базы в {directory}: {e}")
+        if self.max_pieces:
+            self._tb = tb
+        else:
+            tb.close()
+
+    @property
+    def available(self) -> bool:
+        return self._tb is not None
+
+    def covers(self, board: chess.Board) -> bool:
+        return (self._tb is not None and not board.castling_rights
+                and chess.popcount(board.occupied) <= self.max_pieces)
+
+    def _probe_move(self, board: chess.Board, move: chess.Move) -> Optional[Tuple[int, int]]:
+        # WDL и DTZ после хода — с точки зрения соперника, поэтому знак меняется
+        board.push(move)
+        try:
+            if board.is_checkmate():
+                return 2, 0
+            wdl = self._tb.probe_wdl(board)
+            dtz = self._tb.probe_dtz(board)
+            return -wdl, -dtz
+        except (KeyError, chess.syzygy.MissingTableError):
+            return None
+        finally:
+            board.pop()
+
+    def _ranked_moves(self, board: chess.Board) -> Optional[List[Tuple[chess.Move, int, int]]]:
+        ranked = []
+        for move in board.legal_moves:
+            result = self._probe_move(board, move)
+            if result is None:
+                return None
+            ranked.append((move, result[0], result[1]))
+
+        def order(item: Tuple[chess.Move, int, int]) -> Tuple[int, int]:
+            _, wdl, dtz = item
+            # В выигрыше — кратчайший путь к обнулению счётчика, в проигрыше — самый долгий
+            if wdl > 0:
+                return -wdl, abs(dtz)
+            if wdl < 0:
+                return -wdl, -abs(dtz)
+            return 0, 0
+
+        ranked.sort(key=order)
+        return ranked
+
+    def _principal_variation(self, board: chess.Board, first: chess.Move) -> List[str]:
+        pv = [first.uci()]
+        board = board.copy(stack=False)
+        board.push(first)
+        while len(pv) < TABLEBASE_PV_PLIES and not board.is_game_over():
+            ranked = self._ranked_moves(board)
+            if not ranked:
+                break
+            board.push(ranked[0][0])
+            pv.append(ranked[0][0].uci())
+        return pv
+
+    def probe(self, board: chess.Board, multipv: int = 1) -> Optional[List[InfoLine]]:
+        if not self.covers(board) or board.is_game_over():
+            return None
+        with self._lock:
+            try:
+                ranked = self._ranked_moves(board.copy(stack=False))
+            except OSError as e:
+                log_error(f"Ошибка чтения эндшпильной базы: {e}")
+                return None
+            if not ranked:
+                return None
+
+            lines = []
+            for i, (move, wdl, dtz) in enumerate(ranked[:max(1, multipv)]):
+                line = InfoLine(multipv=i + 1, pv=self._principal_variation(board, move))
+                # Выигрыш или проигрыш, испорченный правилом 50 ходов, на доске — ничья
+                if wdl == 2:
+                    line.score_cp = TABLEBASE_WIN_CP - abs(dtz)
+                    line.wdl = (1000, 0, 0)
+                elif wdl == -2:
+                    line.score_cp = -TABLEBASE_WIN_CP + abs(dtz)
+                    line.wdl = (0, 0, 1000)
+                else:
+                    line.score_cp = 0
+                    line.wdl = (0, 1000, 0)
+                line.tbhits = 1
+                line.source = "tablebase"
+                lines.append(line)
+            self.hits += 1
+            return lines
+
+    def close(self) -> None:
+        with self._lock:
+            if self._tb is not None:
+                self._tb.close()
+                self._tb = None
@@ -0,0 +1,267 @@
+import asyncio
+import concurrent.futures
+import threading
+from typing import Optional, List, Dict, Callable, Coroutine, Any
+
+InfoCallback = Callable[[str], None]
+
+
+def log_error(msg: str) -> None:
+    print(f"[UCIClient ERROR] {msg}")
+
+
+class StopSignal(threading.Event):
+    # Event, который умеет сразу уведомлять подписчиков — так отмена доходит до движка без опроса
+    def __init__(self) -> None:
+        super().__init__()
+        self._callbacks: List[Callable[[], None]] = []
+        self._cb_lock = threading.Lock()
+
+    def set(self) -> None:
+        super().set()
+        with self._cb_lock:
+            callbacks, self._callbacks = self._callbacks, []
+        for cb in callbacks:
+            cb()
+
+    def add_callback(self, callback: Callable[[], None]) -> None:
+        with self._cb_lock:
+            if not self.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback: Callable[[], None]) -> None:
+        with self._cb_lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+class AsyncUCIClient:
+    def __init__(self, engine_path: str) -> None:
+        self.engine_path = engine_path
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.alive = False
+        self.id_name: Optional[str] = None
+        self.options: Dict[str, str] = {}
+
+        self._reader_task: Optional["asyncio.Task[None]"] = None
+        self._uciok: Optional["asyncio.Future[Optional[bool]]"] = None
+        self._ready_waiters: List["asyncio.Future[Optional[bool]]"] = []
+        self._search: Optional["asyncio.Future[Optional[str]]"] = None
+        self._on_info: Optional[InfoCallback] = None
+        # Брошенные поиски, чей bestmove ещё придёт: его и их info нельзя отдавать следующему поиску
+        self._stale_searches = 0
+
+    async def start(self, timeout: float = 3.0) -> bool:
+        try:
+            self.process = await asyncio.create_subprocess_exec(
+                self.engine_path,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+        except Exception as e:
+            log_error(f"Ошибка запуска движка: {e}")
+            self.process = None
+            return False
+
+        self.alive = True
+        self._reader_task = asyncio.ensure_future(self._read_loop())
+        self._uciok = asyncio.get_running_loop().create_future()
+        self.send("uci")
+        try:
+            return bool(await asyncio.wait_for(self._uciok, timeout))
+        except asyncio.TimeoutError:
+            return False
+
+    async def _read_loop(self) -> None:
+        assert self.process is not None and self.process.stdout is not None
+        try:
+            while True:
+                raw = await self.process.stdout.readline()
+                if not raw:
+                    break
+                line = raw.decode(errors="replace").strip()
+                if line:
+                    self._dispatch(line)
+        except Exception as e:
+            log_error(f"Reader loop exception: {e}")
+        finally:
+            self.alive = False
+            self._fail_pending()
+
+    def _dispatch(self, line: str) -> None:
+        if line.startswith("info"):
+            if self._on_info is not None and not self._stale_searches:
+                self._on_info(line)
+        elif line.startswith("bestmove"):
+            if self._stale_searches:
+                self._stale_searches -= 1
+                return
+            fut, self._search, self._on_info = self._search, None, None
+            if fut is not None and not fut.done():
+                fut.set_result(line)
+        elif line == "readyok":
+            waiters, self._ready_waiters = self._ready_waiters, []
+            for fut in waiters:
+                if not fut.done():
+                    fut.set_result(True)
+        elif line == "uciok":
+            if self._uciok is not None and not self._uciok.done():
+                self._uciok.set_result(True)
+        elif line.startswith("option name "):
+            name = line[len("option name "):].split(" type ")[0]
+            self.options[name] = line
+        elif line.startswith("id name "):
+            self.id_name = line[len("id name "):]
+
+    def _fail_pending(self) -> None:
+        # Процесс умер: все ожидающие получают None вместо ответа
+        pending = [self._uciok, self._search] + self._ready_waiters
+        self._search, self._on_info, self._ready_waiters = None, None, []
+        self._stale_searches = 0
+        for fut in pending:
+            if fut is not None and not fut.done():
+                fut.set_result(None)
+
+    def send(self, command: str) -> None:
+        if not self.alive or self.process is None or self.process.stdin is None:
+            return
+        try:
+            self.process.stdin.write((command + "\n").encode())
+        except Exception as e:
+            log_error(f"Failed to send command '{command}': {e}")
+
+    async def isready(self, timeout: float = 2.0) -> bool:
+        fut = asyncio.get_running_loop().create_future()
+        if not self.alive:
+            return False
+        self._ready_waiters.append(fut)
+        self.send("isready")
+        try:
+            return bool(await asyncio.wait_for(fut, timeout))
+        except asyncio.TimeoutError:
+            return False
+
+    def start_search(self, go_command: str, on_info: Optional[InfoCallback] = None) -> "asyncio.Future[Optional[str]]":
+        fut = asyncio.get_running_loop().create_future()
+        if not self.alive:
+            fut.set_result(None)
+            return fut
+        # Движок ведёт один поиск; незавершённый предыдущий останавливается и бросается
+        self.abandon_search()
+        self._search = fut
+        self._on_info = on_info
+        self.send(go_command)
+        return fut
+
+    def abandon_search(self) -> None:
+        # Поиск не дождался bestmove после stop: его ответ будет проглочен, ожидающий получает None
+        fut, self._search, self._on_info = self._search, None, None
+        if fut is None or fut.done():
+            return
+        self.send("stop")
+        self._stale_searches += 1
+        fut.set_result(None)
+
+    async def analyse(self, go_command: str, on_info: Optional[InfoCallback] = None,
+                      timeout: Optional[float] = None) -> Optional[str]:
+        fut = self.start_search(go_command, on_info)
+        try:
+            return await asyncio.wait_for(asyncio.shield(fut), timeout)
+        except asyncio.TimeoutError:
+            self.send("stop")
+            try:
+                return await asyncio.wait_for(asyncio.shield(fut), 1.0)
+            except asyncio.TimeoutError:
+                self.abandon_search()
+                return None
+
+    async def play(self, position_command: str, go_command: str,
+                   timeout: Optional[float] = None) -> Optional[str]:
+        self.send(position_command)
+        line = await self.analyse(go_command, timeout=timeout)
+        parts = line.split() if line else []
+        return parts[1] if len(parts) >= 2 else None
+
+    async def quit(self, timeout: float = 1.0) -> None:
+        if self.process is None:
+            return
+        self.send("quit")
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout)
+        except asyncio.TimeoutError:
+            try:
+                self.process.kill()
+            except ProcessLookupError:
+                pass
+            await self.process.wait()
+        self.alive = False
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    # Один фоновый цикл событий обслуживает все движки; в простое он спит в select без таймаута
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, daemon=True, name="uci-loop").start()
+        return _loop
+
+
+class UCIClient:
+    def __init__(self, engine_path: str) -> None:
+        self._loop = _get_loop()
+        self._client = AsyncUCIClient(engine_path)
+
+    def _run(self, coro: Coroutine[Any, Any, Any], timeout: Optional[float] = None) -> Any:
+        return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout)
+
+    @property
+    def alive(self) -> bool:
+        return self._client.alive
+
+    @property
+    def options(self) -> Dict[str, str]:
+        return self._client.options
+
+    def start(self, timeout: float = 3.0) -> bool:
+        return self._run(self._client.start(timeout))
+
+    def send(self, command: str) -> None:
+        self._loop.call_soon_threadsafe(self._client.send, command)
+
+    def isready(self, timeout: float = 2.0) -> bool:
+        return self._run(self._client.isready(timeout))
+
+    def start_search(self, go_command: str, on_info: Optional[InfoCallback] = None) -> "concurrent.futures.Future[Optional[str]]":
+        result: "concurrent.futures.Future[Optional[str]]" = concurrent.futures.Future()
+
+        def begin() -> None:
+            fut = self._client.start_search(go_command, on_info)
+            fut.add_done_callback(lambda f: result.set_result(f.result()))
+
+        self._loop.call_soon_threadsafe(begin)
+        return result
+
+    def abandon_search(self) -> None:
+        # Вызовы идут в цикл событий по порядку, так что бросается именно поиск, запущенный этим потоком
+        self._loop.call_soon_threadsafe(self._client.abandon_search)
+
+    def analyse(self, go_command: str, on_info: Optional[InfoCallback] = None,
+                timeout: Optional[float] = None) -> Optional[str]:
+        return self._run(self._client.analyse(go_command, on_info, timeout))
+
+    def play(self, position_command: str, go_command: str, timeout: Optional[float] = None) -> Optional[str]:
+        return self._run(self._client.play(position_command, go_command, timeout))
+
+    def quit(self, timeout: float = 1.0) -> None:
+        try:
+            self._run(self._client.quit(timeout), timeout + 1.0)
+        except Exception as e:
+            log_error(f"Ошибка остановки движка: {e}")
@@ -0,0 +1,123 @@
+from typing import Optional, List, Tuple, Dict, Any
+
+
+class InfoLine:
+    # source — откуда линия, если не от движка: "tablebase", "book"
+    __slots__ = ("multipv", "depth", "seldepth", "time_ms", "nodes", "nps", "hashfull", "tbhits",
+                 "score_cp", "score_mate", "bound", "wdl", "pv", "source")
+
+    def __init__(self, multipv: int = 1, depth: Optional[int] = None, score_cp: Optional[int] = None,
+                 score_mate: Optional[int] = None, pv: Optional[List[str]] = None) -> None:
+        self.multipv = multipv
+        self.depth = depth
+        self.seldepth: Optional[int] = None
+        self.time_ms: Optional[int] = None
+        self.nodes: Optional[int] = None
+        self.nps: Optional[int] = None
+        self.hashfull: Optional[int] = None
+        self.tbhits: Optional[int] = None
+        self.score_cp = score_cp
+        self.score_mate = score_mate
+        self.bound: Optional[str] = None
+        self.wdl: Optional[Tuple[int, int, int]] = None
+        self.pv: List[str] = pv if pv is not None else []
+        self.source: Optional[str] = None
+
+    @property
+    def move_uci(self) -> Optional[str]:
+        return self.pv[0] if self.pv else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "InfoLine":
+        info = cls()
+        for name in cls.__slots__:
+            if name in data:
+                setattr(info, name, data[name])
+        if info.wdl is not None:
+            info.wdl = tuple(info.wdl)
+        return info
+
+    def __repr__(self) -> str:
+        score = f"cp {self.score_cp}" if self.score_cp is not None else f"mate {self.score_mate}"
+        return f"InfoLine(multipv={self.multipv}, depth={self.depth}, {score}, pv={' '.join(self.pv[:6])})"
+
+
+def parse_info_line(line: str) -> Optional[InfoLine]:
+    # Один проход по токенам строки; регулярные выражения не нужны
+    tokens = line.split()
+    n = len(tokens)
+    if n < 2 or tokens[0] != "info":
+        return None
+
+    info = InfoLine()
+    i = 1
+    try:
+        while i < n:
+            tok = tokens[i]
+            if tok == "pv":
+                info.pv = tokens[i + 1:]
+                break
+            elif tok == "depth":
+                info.depth = int(tokens[i + 1]); i += 2
+            elif tok == "seldepth":
+                info.seldepth = int(tokens[i + 1]); i += 2
+            elif tok == "multipv":
+                info.multipv = int(tokens[i + 1]); i += 2
+            elif tok == "score":
+                kind, value = tokens[i + 1], int(tokens[i + 2])
+                if kind == "cp":
+                    info.score_cp = value
+                elif kind == "mate":
+                    info.score_mate = value
+                i += 3
+                if i < n and tokens[i] in ("lowerbound", "upperbound"):
+                    info.bound = tokens[i]
+                    i += 1
+            elif tok == "nodes":
+                info.nodes = int(tokens[i + 1]); i += 2
+            elif tok == "nps":
+                info.nps = int(tokens[i + 1]); i += 2
+            elif tok == "time":
+                info.time_ms = int(tokens[i + 1]); i += 2
+            elif tok == "hashfull":
+                info.hashfull = int(tokens[i + 1]); i += 2
+            elif tok == "tbhits":
+                info.tbhits = int(tokens[i + 1]); i += 2
+            elif tok == "wdl":
+                info.wdl = (int(tokens[i + 1]), int(tokens[i + 2]), int(tokens[i + 3])); i += 4
+            elif tok == "string":
+                break
+            else:
+                i += 1
+    except (IndexError, ValueError):
+        return None
+    return info
+
+
+class MultiPVTable:
+    # По одной, самой глубокой, линии на каждый слот multipv; промежуточные строки не копятся
+    __slots__ = ("slots",)
+
+    def __init__(self, size: int) -> None:
+        self.slots: List[Optional[InfoLine]] = [None] * max(1, size)
+
+    def update(self, info: InfoLine) -> bool:
+        idx = info.multipv - 1
+        if not info.pv or idx < 0 or idx >= len(self.slots):
+            return False
+        current = self.slots[idx]
+        if current is not None:
+            depth, current_depth = info.depth or 0, current.depth or 0
+            if depth < current_depth:
+                return False
+            # Оценка с lowerbound/upperbound не вытесняет точную оценку той же глубины
+            if depth == current_depth and info.bound is not None and current.bound is None:
+                return False
+        self.slots[idx] = info
+        return True
+
+    def lines(self) -> List[InfoLine]:
+        return [line for line in self.slots if line is not None]